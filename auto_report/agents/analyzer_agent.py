@@ -1,15 +1,20 @@
 # src/agents/analyzer_agent.py
 import os
-import smtplib
+import time
 import requests
 import json
 import logging
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
+from core.mail_outbox import EmailOutbox
+from core import metrics
 
 logger = logging.getLogger(__name__)
 
+PROMPT_SIZE = metrics.histogram('autoreport_llm_prompt_chars', "Size of prompts sent to the LLM (characters)",
+                                buckets=(1000, 5000, 10000, 50000, 100000, 250000, 500000, 1000000))
+LLM_LATENCY = metrics.histogram('autoreport_llm_request_seconds', "LLM API request latency (including failed requests)")
+LLM_FAILURES = metrics.counter('autoreport_llm_failures', "Failed LLM API calls")
+
 
 class AnalyzerAgent:
     """
@@ -17,15 +22,37 @@ class AnalyzerAgent:
     收集所有数据，调用大模型API进行分析，并生成/发送报告。
     """
 
-    def __init__(self, config, data_aggregator):
+    def __init__(self, config, data_aggregator, outbox=None, search_index=None, llm_client=None):
         self.config = config
         self.data_aggregator = data_aggregator
+        self.search_index = search_index  # 可选的全文索引 (core.search_index.ActivityIndex)
+        self.llm_client = llm_client  # 可选的共享大模型客户端 (core.llm_client.LLMClient)，多租户时限制全局并发
+        relevance_config = config.get('analysis', {}).get('relevance', {})
+        self.max_items_per_source = relevance_config.get('max_items_per_source', 0)  # 0 表示不筛选
+        self.max_topic_items = relevance_config.get('max_topic_items', 200)
+        digest_config = config.get('analysis', {}).get('digest', {})
+        self.digest_enabled = digest_config.get('enabled', False)
+        self.digest_min_items = digest_config.get('min_items', 2000)  # 数据量达到该值才聚类压缩
+        self.digest_max_clusters = digest_config.get('max_clusters', 30)
+        self.stats_config = config.get('analysis', {}).get('stats', {})
+        self.stats_enabled = self.stats_config.get('enabled', False)
+        self.stats_min_items = self.stats_config.get('min_items', 500)  # 数据量达到该值才附加数值统计
+        # 附加统计后不再逐条列出的来源 (其信息已由目录变更统计概括)
+        self.stats_replace_sources = set(self.stats_config.get('replace_sources', ['file']))
 
         # 配置
         self.output_dir = config.get('core', {}).get('report_output_dir', './reports')
         os.makedirs(self.output_dir, exist_ok=True)
 
         self.email_config = config.get('notifications', {}).get('email', {})
+        self.outbox = outbox
+        self.email_account = None
+        if self.email_config.get('enabled', False):
+            if self.outbox is None:
+                # 未注入共享发件箱时自行创建一个
+                self.outbox = EmailOutbox(self.email_config)
+                self.outbox.start()
+            self.email_account = self.outbox.register_account(self.email_config)
         self.llm_config = config.get('llm', {})
 
         # 检查大模型配置
@@ -40,9 +67,9 @@ class AnalyzerAgent:
         self.llm_timeout = self.llm_config.get('timeout', 120)
         logger.info(f"AnalyzerAgent initialized with LLM: {self.llm_model}")
 
-    def _get_time_range(self, report_type):
-        """根据报告类型确定数据时间范围"""
-        now = datetime.now()
+    def _get_time_range(self, report_type, now=None):
+        """根据报告类型确定数据时间范围的起点 (now 为窗口终点，默认当前时间；补跑历史报告时传入)"""
+        now = now or datetime.now()
         if report_type == 'daily':
             since = now - timedelta(days=1)
         elif report_type == 'weekly':
@@ -58,10 +85,147 @@ class AnalyzerAgent:
             since = now - timedelta(days=1)
         return since
 
-    def _build_llm_prompt(self, report_type, description, filtered_data):
+    @staticmethod
+    def _format_data_point(source, item):
+        """格式化单个数据点，只保留关键信息，避免token过长"""
+        text = ""
+        data_content = item.get('data', {})
+        timestamp = item.get('timestamp', 'N/A')
+
+        if source == 'screen':
+            text += f"  [屏幕截图分析 - {timestamp}]\n"
+            text += f"    文件: {data_content.get('filename', 'N/A')}\n"
+            text += f"    内容摘要: {data_content.get('extracted_text_snippet', 'N/A')}\n"
+        elif source == 'file':
+            text += f"  [文件变更 - {timestamp}]\n"
+            text += f"    事件: {data_content.get('event_type', 'N/A')}\n"
+            text += f"    路径: {data_content.get('src_path', 'N/A')}\n"
+        elif source == 'document':
+            text += f"  [文档内容 - {timestamp}]\n"
+            text += f"    文件: {data_content.get('filename', 'N/A')}\n"
+            text += f"    最后修改: {data_content.get('last_modified', 'N/A')}\n"
+            text += f"    内容摘要: {data_content.get('content_snippet', 'N/A')}\n"
+        elif source == 'lark_calendar':
+            text += f"  [飞书日程 - {timestamp}]\n"
+            text += f"    主题: {data_content.get('summary', 'N/A')}\n"
+            text += f"    描述: {data_content.get('description', 'N/A')}\n"
+            text += f"    时间: {data_content.get('start_time', 'N/A')} to {data_content.get('end_time', 'N/A')}\n"
+        elif source == 'lark_message':
+            text += f"  [飞书消息 - {timestamp}]\n"
+            text += f"    群组: {data_content.get('chat_name', 'N/A')}\n"
+            text += f"    内容: {data_content.get('content', 'N/A')}\n"
+        else:
+            # 通用处理
+            text += f"  [数据点 - {timestamp}]\n"
+            text += f"    内容: {str(data_content)[:200]}...\n"  # 限制长度
+        return text
+
+    def _build_digest(self, filtered_data):
+        """
+        把大量数据点在本地聚类成主题摘要 (core.topic_clustering)，每个主题给出数据量、时间跨度、关键词和一条代表性数据。
+        需要 numpy；不可用或聚类失败时返回 None，由调用方退回逐条列出。
+        """
+        try:
+            from core.topic_clustering import cluster_activity
+        except ImportError as e:
+            logger.warning(f"Topic digest unavailable ({e}), listing data points instead.")
+            return None
+        try:
+            clusters = cluster_activity(filtered_data, max_clusters=self.digest_max_clusters)
+        except Exception as e:
+            logger.error(f"Error clustering activity data: {e}")
+            return None
+        if not clusters:
+            return None
+
+        total = sum(cluster.count for cluster in clusters)
+        topics = [cluster for cluster in clusters if not cluster.unclustered]
+        digest = f"\n(共 {total} 条数据，已在本地按内容聚类为 {len(topics)} 个主题，按数据量从多到少排列)\n"
+        for i, cluster in enumerate(clusters, 1):
+            sources = ', '.join(f"{source} {count}" for source, count in cluster.sources.most_common())
+            title = "未归类 (没有可聚类的文本)" if cluster.unclustered else f"主题 {i}"
+            digest += f"\n--- {title}: {cluster.count} 条 ({sources}) ---\n"
+            digest += f"  时间跨度: {cluster.start[:16]} ~ {cluster.end[:16]}\n"
+            if cluster.keywords:
+                digest += f"  关键词: {', '.join(cluster.keywords)}\n"
+            source, timestamp, data = cluster.exemplar
+            digest += "  代表性数据:\n"
+            digest += self._format_data_point(source, {'timestamp': timestamp, 'data': data})
+        return digest
+
+    def _build_stats(self, filtered_data, since, until):
+        """
+        本地计算活动数值统计 (core.activity_stats)：活跃时长与高峰时段、专注时段、目录变更排行、逐周趋势。
+        需要 numpy；不可用或计算失败时返回 None。
+        """
+        try:
+            from core.activity_stats import compute_activity_stats
+        except ImportError as e:
+            logger.warning(f"Activity statistics unavailable ({e}).")
+            return None
+        options = {key: self.stats_config[key] for key in
+                   ('bin_minutes', 'idle_minutes', 'focus_minutes', 'top_directories', 'directory_depth', 'max_weeks')
+                   if key in self.stats_config}
+        try:
+            stats = compute_activity_stats(filtered_data, since, until, **options)
+        except Exception as e:
+            logger.error(f"Error computing activity statistics: {e}")
+            return None
+        if not stats.total:
+            return None
+
+        def delta(current, previous):
+            return f"{(current - previous) / previous:+.0%}" if previous else "-"
+
+        sources = ', '.join(f"{source} {count}" for source, count in
+                            sorted(stats.source_events.items(), key=lambda item: -item[1]))
+        peak_hours = sorted(range(24), key=lambda hour: -stats.hour_of_day[hour])[:3]
+        text = "\n=== 活动统计 (本地计算) ===\n"
+        text += f"数据点: {stats.total} ({sources})\n"
+        text += (f"活跃时长: {stats.active_hours:.1f} 小时，活跃 {stats.active_days} 天，"
+                 f"日均 {stats.active_hours / max(stats.active_days, 1):.1f} 小时；"
+                 f"最活跃时段: {', '.join(f'{hour:02d}:00' for hour in sorted(peak_hours))}\n")
+        text += "各来源活跃时长: " + ', '.join(
+            f"{source} {hours:.1f}h" for source, hours in sorted(stats.source_hours.items(), key=lambda item: -item[1])) + "\n"
+        if stats.active_days > 7:
+            text += "按星期活跃时长: " + ', '.join(
+                f"{name} {hours:.1f}h" for name, hours in zip('一二三四五六日', stats.weekday_hours)) + "\n"
+        text += (f"连续活动时段: {stats.session_count} 段 (中位数 {stats.median_session_hours:.1f} 小时)，"
+                 f"其中专注时段 (≥{self.stats_config.get('focus_minutes', 45)} 分钟) {stats.focus_count} 段，"
+                 f"共 {stats.focus_hours:.1f} 小时\n")
+        if stats.longest_sessions:
+            text += "最长的连续活动时段:\n"
+            for session in stats.longest_sessions:
+                directory = f"，主要目录 {session.top_directory}" if session.top_directory else ""
+                text += (f"  {session.start:%Y-%m-%d %H:%M} ~ {session.end:%H:%M} "
+                         f"({session.hours:.1f} 小时，{session.events} 条{directory})\n")
+        if stats.directories:
+            text += "目录变更排行 (目录 | 事件数 | 占比 | 活跃小时 | 活跃天数"
+            text += " | 最近7天 | 前7天 | 变化)\n" if stats.recent_window else ")\n"
+            for row in stats.directories:
+                text += f"  {row['directory']} | {row['events']} | {row['share']:.0%} | {row['hours']:.1f} | {row['days']}"
+                if stats.recent_window:
+                    text += f" | {row['recent']} | {row['previous']} | {delta(row['recent'], row['previous'])}"
+                text += "\n"
+        if len(stats.weeks) > 1:
+            text += "逐周趋势 (周一 | 活跃小时 | 环比 | 数据点 | 环比 | 专注小时 | 时段数；* 为不完整的周，不计算环比)\n"
+            previous = None
+            for week in stats.weeks:
+                # 不完整的周与完整的周相比会得到虚假的涨跌
+                compare = previous and not previous['partial'] and not week['partial']
+                text += (f"  {week['start']}{'*' if week['partial'] else ''} | {week['active_hours']:.1f} | "
+                         f"{delta(week['active_hours'], previous['active_hours']) if compare else '-'} | "
+                         f"{week['events']} | {delta(week['events'], previous['events']) if compare else '-'} | "
+                         f"{week['focus_hours']:.1f} | {week['sessions']}\n")
+                previous = week
+        return text
+
+    def _build_llm_prompt(self, report_type, description, filtered_data, now=None):
         """构建发送给大模型的提示词 (Prompt)"""
-        time_range_str = self._get_time_range(report_type).strftime('%Y-%m-%d %H:%M:%S')
-        now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        now = now or datetime.now()
+        since = self._get_time_range(report_type, now)
+        time_range_str = since.strftime('%Y-%m-%d %H:%M:%S')
+        now_str = now.strftime('%Y-%m-%d %H:%M:%S')
 
         prompt = f"""
 你是一个专业的工作总结助手。请根据用户在 {time_range_str} 到 {now_str} 期间的活动数据，为用户生成一份**{description}**。
@@ -71,41 +235,24 @@ class AnalyzerAgent:
         if not filtered_data:
             prompt += "\n- 无可用数据。\n"
         else:
-            for source, data_points in filtered_data.items():
-                if data_points:
-                    prompt += f"\n--- 来源: {source} ---\n"
-                    # 对于每个来源，我们只传递关键信息，避免token过长
-                    for item in data_points:
-                        data_content = item.get('data', {})
-                        timestamp = item.get('timestamp', 'N/A')
-
-                        if source == 'screen':
-                            prompt += f"  [屏幕截图分析 - {timestamp}]\n"
-                            prompt += f"    文件: {data_content.get('filename', 'N/A')}\n"
-                            prompt += f"    内容摘要: {data_content.get('extracted_text_snippet', 'N/A')}\n"
-                        elif source == 'file':
-                            prompt += f"  [文件变更 - {timestamp}]\n"
-                            prompt += f"    事件: {data_content.get('event_type', 'N/A')}\n"
-                            prompt += f"    路径: {data_content.get('src_path', 'N/A')}\n"
-                        elif source == 'document':
-                            prompt += f"  [文档内容 - {timestamp}]\n"
-                            prompt += f"    文件: {data_content.get('filename', 'N/A')}\n"
-                            prompt += f"    最后修改: {data_content.get('last_modified', 'N/A')}\n"
-                            prompt += f"    内容摘要: {data_content.get('content_snippet', 'N/A')}\n"
-                        elif source == 'lark_calendar':
-                            prompt += f"  [飞书日程 - {timestamp}]\n"
-                            prompt += f"    主题: {data_content.get('summary', 'N/A')}\n"
-                            prompt += f"    描述: {data_content.get('description', 'N/A')}\n"
-                            prompt += f"    时间: {data_content.get('start_time', 'N/A')} to {data_content.get('end_time', 'N/A')}\n"
-                        elif source == 'lark_message':
-                            prompt += f"  [飞书消息 - {timestamp}]\n"
-                            prompt += f"    群组: {data_content.get('chat_name', 'N/A')}\n"
-                            prompt += f"    内容: {data_content.get('content', 'N/A')}\n"
-                        else:
-                            # 通用处理
-                            prompt += f"  [数据点 - {timestamp}]\n"
-                            prompt += f"    内容: {str(data_content)[:200]}...\n"  # 限制长度
-                        prompt += "\n"  # 每个数据点后空一行
+            total = sum(len(data_points) for data_points in filtered_data.values())
+            stats = self._build_stats(filtered_data, since, now) if self.stats_enabled \
+                and total >= self.stats_min_items else None
+            if stats:
+                prompt += stats
+            digest = self._build_digest(filtered_data) if self.digest_enabled and total >= self.digest_min_items \
+                else None
+            if digest:
+                prompt += digest
+            else:
+                for source, data_points in filtered_data.items():
+                    if data_points and stats and source in self.stats_replace_sources:
+                        prompt += f"\n--- 来源: {source} ---\n  (共 {len(data_points)} 条，已汇总在上方活动统计中)\n"
+                    elif data_points:
+                        prompt += f"\n--- 来源: {source} ---\n"
+                        for item in data_points:
+                            prompt += self._format_data_point(source, item)
+                            prompt += "\n"  # 每个数据点后空一行
 
         prompt += f"""
 
@@ -124,8 +271,8 @@ class AnalyzerAgent:
 """
         return prompt
 
-    def _call_llm_api(self, prompt):
-        """调用大模型API"""
+    def _request_llm(self, prompt):
+        """调用大模型API并返回生成的内容，请求或解析失败时抛出异常"""
         headers = {
             'Authorization': f'Bearer {self.llm_api_key}',
             'Content-Type': 'application/json'
@@ -135,15 +282,28 @@ class AnalyzerAgent:
             "messages": [{"role": "user", "content": prompt}]
         }
 
+        PROMPT_SIZE.observe(len(prompt))
+        request_start = time.perf_counter()
+        logger.debug(f"Calling LLM API with prompt (first 500 chars): {prompt[:500]}...")
+        post = self.llm_client.post if self.llm_client else requests.post
         try:
-            logger.debug(f"Calling LLM API with prompt (first 500 chars): {prompt[:500]}...")
-            response = requests.post(self.llm_base_url, headers=headers, data=json.dumps(data),
-                                     timeout=self.llm_timeout)
+            try:
+                response = post(self.llm_base_url, headers=headers, data=json.dumps(data), timeout=self.llm_timeout)
+            finally:
+                # 超时与连接错误同样计入延迟分布
+                LLM_LATENCY.observe(time.perf_counter() - request_start)
             response.raise_for_status()
-            result = response.json()
-            report_content = result['choices'][0]['message']['content']
-            logger.info("LLM analysis completed successfully.")
-            return report_content
+            report_content = response.json()['choices'][0]['message']['content']
+        except (requests.exceptions.RequestException, KeyError, IndexError):
+            LLM_FAILURES.inc()
+            raise
+        logger.info("LLM analysis completed successfully.")
+        return report_content
+
+    def _call_llm_api(self, prompt):
+        """调用大模型API，失败时返回错误说明文本 (作为报告内容)"""
+        try:
+            return self._request_llm(prompt)
         except requests.exceptions.RequestException as e:
             logger.error(f"Error calling LLM API: {e}")
             return f"调用大模型分析时出错: {e}"
@@ -151,26 +311,66 @@ class AnalyzerAgent:
             logger.error(f"Error parsing LLM API response: {e}")
             return f"解析大模型响应时出错: {e}"
 
-    def analyze_and_report(self, report_type, description):
+    def _select_data(self, since, topic=None, until=None):
         """
-        核心方法：分析数据并生成报告。
-        :param report_type: 'daily', 'weekly', 'monthly' 等
-        :param description: 报告的中文描述，如 '日报', '周报'
+        选取送入大模型的数据：
+        - 指定 topic 时，从全文索引中检索与主题最相关的数据点；
+        - 配置了 max_items_per_source 时，数据量超出的来源只保留词项显著性最高的数据点；
+        - 否则返回时间范围内的全部数据。
+        """
+        if topic and self.search_index:
+            selected = {}
+            for item in self.search_index.search(topic, since=since, until=until, limit=self.max_topic_items):
+                selected.setdefault(item['source'], []).append({'timestamp': item['timestamp'], 'data': item['data']})
+            for items in selected.values():
+                items.sort(key=lambda item: item['timestamp'])
+            return selected
+
+        filtered_data = self.data_aggregator.get_raw_data_since(since, until)
+        if self.search_index and self.max_items_per_source:
+            crowded = [source for source, points in filtered_data.items() if len(points) > self.max_items_per_source]
+            if crowded:
+                top_items = self.search_index.top_items(since=since, until=until, sources=crowded,
+                                                        limit_per_source=self.max_items_per_source)
+                filtered_data.update(top_items)
+                logger.info(f"Selected high-signal items for sources: {crowded}")
+        return filtered_data
+
+    def generate_report(self, report_type, description, topic=None, now=None, strict=False):
+        """
+        生成报告内容 (不保存、不发送)，返回 (报告描述, 报告内容, 数据点数量)。
+        :param now: 时间窗口的终点，默认当前时间；补跑历史报告时传入
+        :param strict: 为 True 时大模型调用失败直接抛出异常，而不是把错误说明作为报告内容返回
         """
+        if topic:
+            if not self.search_index:
+                logger.warning(f"Topic '{topic}' requested but search index is disabled, using all data.")
+            description = f"{description}（主题：{topic}）"
         logger.info(f"Starting analysis for {description}...")
 
         # 1. 确定时间范围
-        since = self._get_time_range(report_type)
+        since = self._get_time_range(report_type, now)
 
-        # 2. 从 DataAggregator 获取该时间范围内的所有原始数据
-        filtered_data = self.data_aggregator.get_raw_data_since(since)
+        # 2. 从 DataAggregator (或全文索引) 获取该时间范围内的数据
+        filtered_data = self._select_data(since, topic, now)
         logger.debug(f"Data collected for analysis: {list(filtered_data.keys())}")
+        count = sum(len(data_points) for data_points in filtered_data.values())
 
         # 3. 构建提示词
-        prompt = self._build_llm_prompt(report_type, description, filtered_data)
+        prompt = self._build_llm_prompt(report_type, description, filtered_data, now)
 
         # 4. 调用大模型API进行分析
-        report_content = self._call_llm_api(prompt)
+        report_content = self._request_llm(prompt) if strict else self._call_llm_api(prompt)
+        return description, report_content, count
+
+    def analyze_and_report(self, report_type, description, topic=None):
+        """
+        核心方法：分析数据并生成报告。
+        :param report_type: 'daily', 'weekly', 'monthly' 等
+        :param description: 报告的中文描述，如 '日报', '周报'
+        :param topic: 可选的主题 (如项目名)，指定时只分析与该主题相关的数据
+        """
+        description, report_content, _ = self.generate_report(report_type, description, topic)
 
         # 5. 保存报告
         filename = self.save_report(report_content, f"{report_type}_report")
@@ -179,11 +379,12 @@ class AnalyzerAgent:
         if filename:
             subject = f"【自动报告】{description} - {datetime.now().strftime('%Y-%m-%d')}"
             # 可以选择发送内容或附件
-            success = self.send_email(subject, report_content)
+            attachments = [filename] if self.email_config.get('attach_report', False) else None
+            success = self.send_email(subject, report_content, attachments)
             if success:
-                logger.info(f"{description} generated and sent successfully.")
+                logger.info(f"{description} generated and queued for delivery.")
             else:
-                logger.error(f"Failed to send {description} email.")
+                logger.error(f"Failed to queue {description} email.")
         else:
             logger.error(f"Failed to save {description}.")
 
@@ -201,7 +402,7 @@ class AnalyzerAgent:
             return None
 
     def send_email(self, subject, body, attachments=None):
-        """发送邮件"""
+        """将邮件放入发件箱，由后台线程异步发送"""
         if not self.email_config.get('enabled', False):
             logger.info("Email sending is disabled in config.")
             return True
@@ -209,29 +410,10 @@ class AnalyzerAgent:
         smtp_server = self.email_config.get('smtp_server')
         smtp_port = self.email_config.get('smtp_port')
         sender_email = self.email_config.get('sender_email')
-        sender_password = self.email_config.get('sender_password')
         recipient_email = self.email_config.get('recipient_email')
 
-        if not all([smtp_server, smtp_port, sender_email, sender_password, recipient_email]):
+        if not all([smtp_server, smtp_port, sender_email, recipient_email]):
             logger.error("Email configuration incomplete.")
             return False
 
-        try:
-            msg = MIMEMultipart()
-            msg['From'] = sender_email
-            msg['To'] = recipient_email
-            msg['Subject'] = subject
-
-            msg.attach(MIMEText(body, 'plain', 'utf-8'))
-
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            text = msg.as_string()
-            server.sendmail(sender_email, recipient_email, text)
-            server.quit()
-            logger.info(f"Email sent to {recipient_email}")
-            return True
-        except Exception as e:
-            logger.error(f"Error sending email: {e}")
-            return False
+        return self.outbox.enqueue(self.email_account, recipient_email, subject, body, attachments)
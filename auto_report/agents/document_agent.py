@@ -1,11 +1,18 @@
 # src/agents/document_agent.py
 import os
+import time
 import logging
 from datetime import datetime
 import mimetypes
+from core import metrics
 
 logger = logging.getLogger(__name__)
 
+SCAN_DURATION = metrics.histogram('autoreport_document_scan_seconds', "Duration of a document directory scan")
+FILES_PER_SCAN = metrics.histogram('autoreport_document_files_per_scan', "Changed documents aggregated per scan",
+                                   buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000))
+FILES_SEEN = metrics.counter('autoreport_document_files_seen', "Supported documents visited by scans")
+
 
 class DocumentReaderAgent:
     """
@@ -47,7 +54,7 @@ class DocumentReaderAgent:
             try:
                 with open(filepath, 'r', encoding=encoding) as f:
                     content = f.read()
-                logger.debug(f"Successfully read {filepath} with encoding {encoding}")
+                logger.debug("Successfully read %s with encoding %s", filepath, encoding)
                 return content
             except UnicodeDecodeError:
                 continue
@@ -65,19 +72,22 @@ class DocumentReaderAgent:
 
         current_time = datetime.now()
         logger.info(f"Starting document scan in {self.watch_path}...")
+        scan_start = time.perf_counter()
+        aggregated_count = 0
 
         try:
             for root, _, files in os.walk(self.watch_path):
                 for file in files:
                     filepath = os.path.join(root, file)
                     if self._is_supported_file(filepath):
+                        FILES_SEEN.inc()
                         try:
                             # 检查文件是否已存在且未修改
                             stat = os.stat(filepath)
                             mtime = stat.st_mtime
 
                             if filepath in self._scanned_files and self._scanned_files[filepath] == mtime:
-                                logger.debug(f"File {filepath} unchanged, skipping.")
+                                logger.debug("File %s unchanged, skipping.", filepath)
                                 continue
 
                             content = self._read_file_content(filepath)
@@ -94,7 +104,8 @@ class DocumentReaderAgent:
                             }
                             self.data_aggregator.add_data('document', doc_info)
                             self._scanned_files[filepath] = mtime
-                            logger.debug(f"Document content aggregated from: {filepath}")
+                            aggregated_count += 1
+                            logger.debug("Document content aggregated from: %s", filepath)
 
                         except Exception as e:
                             logger.error(f"Error processing file {filepath}: {e}")
@@ -104,12 +115,16 @@ class DocumentReaderAgent:
 
         except Exception as e:
             logger.error(f"Error during document scan: {e}")
+        finally:
+            SCAN_DURATION.observe(time.perf_counter() - scan_start)
+            FILES_PER_SCAN.observe(aggregated_count)
 
-    def start_periodic_scan(self, scheduler):
-        """通过调度器启动周期性扫描任务"""
+    def start_periodic_scan(self, scheduler, job_id='document_scan_job', **job_options):
+        """通过调度器启动周期性扫描任务 (job_options 为线程池及重叠策略等调度参数)"""
         if self.scan_interval > 0 and self.watch_path:
             logger.info(f"Starting periodic document scan task every {self.scan_interval} seconds.")
-            scheduler.add_job(self.scan_and_aggregate, 'interval', seconds=self.scan_interval, id='document_scan_job')
+            scheduler.add_job(self.scan_and_aggregate, 'interval', seconds=self.scan_interval, id=job_id,
+                              **job_options)
         elif self.watch_path:
             # 如果间隔<=0，只在启动时扫描一次
             logger.info("Document scan task will run once at startup only.")
@@ -4,15 +4,20 @@ import logging
 import json
 from datetime import datetime
 from watchdog.observers import Observer
+from watchdog.observers.api import ObservedWatch
 from watchdog.events import FileSystemEventHandler
+from core import metrics
 
 logger = logging.getLogger(__name__)
 
+RAW_EVENTS = metrics.counter('autoreport_file_raw_events', "Raw filesystem events received from watchdog", ['event_type'])
+
 class LogFileHandler(FileSystemEventHandler):
     def __init__(self, log_callback):
         self.log_callback = log_callback
 
     def on_any_event(self, event):
+        RAW_EVENTS.labels(event.event_type).inc()
         if not event.is_directory:
             # 记录事件信息
             event_info = {
@@ -24,7 +29,7 @@ class LogFileHandler(FileSystemEventHandler):
             self.log_callback(event_info)
 
 class FileMonitorAgent:
-    def __init__(self, config, data_aggregator):
+    def __init__(self, config, data_aggregator, observer=None):
         self.config = config
         self.watch_path = config.get('watch_path')
         self.data_aggregator = data_aggregator
@@ -32,7 +37,13 @@ class FileMonitorAgent:
              logger.error(f"Invalid or non-existent watch path: {self.watch_path}")
              raise ValueError(f"Invalid or non-existent watch path: {self.watch_path}")
 
-        self.observer = Observer()
+        # 多租户时共用一个 Observer (一个监听线程)，由所有者负责启动和停止
+        self.shared_observer = observer is not None
+        self.observer = observer if observer is not None else Observer()
+        self._watch = None
+        # recursive: 对 watch_path 整体递归监控；scalable: 超大目录树按优先级分配监控，其余子树快照轮询 (core.tree_watcher)
+        self.mode = config.get('mode', 'recursive')
+        self.tree_watcher = None
         self.log_file_handler = LogFileHandler(self._log_event_to_aggregator)
         self.log_file_path = os.path.join('data', 'file_logs', 'file_events.log')
         os.makedirs(os.path.dirname(self.log_file_path), exist_ok=True)
@@ -43,16 +54,59 @@ class FileMonitorAgent:
         # 直接添加到数据聚合器
         # 注意：这里调用的是 DataAggregator 的 add_data 方法
         self.data_aggregator.add_data('file', event_info)
-        logger.info(f"File event logged to aggregator: {event_info['event_type']} - {event_info['src_path']}")
+        logger.info("File event logged to aggregator: %s - %s", event_info['event_type'], event_info['src_path'])
+
+    def _fits_watch_budget(self):
+        """
+        recursive 模式注册前先统计目录数：watchdog 的 inotify 后端在注册到一半达到系统上限时不会释放已添加的监控，
+        因此不能依赖注册失败来发现目录树过大
+        """
+        from core.tree_watcher import count_dirs, default_watch_budget
+        budget = self.config.get('max_watches') or default_watch_budget()
+        n_dirs = count_dirs(self.watch_path, budget)
+        if n_dirs > budget:
+            logger.warning(f"{self.watch_path} has more than {budget} directories, switching to scalable mode.")
+            return False
+        return True
+
+    def _start_tree_watcher(self):
+        from core.tree_watcher import TreeWatcher
+        self.tree_watcher = TreeWatcher(self.watch_path, self.observer, self.log_file_handler, self.config,
+                                        self.shared_observer)
+        self.tree_watcher.start()
 
     def start_monitoring(self):
         """启动文件监控"""
-        self.observer.schedule(self.log_file_handler, self.watch_path, recursive=True)
-        self.observer.start()
+        if not self.shared_observer:
+            # 先启动 Observer 再添加监控，注册失败 (如达到 inotify 上限) 时在 schedule 中即可发现
+            self.observer.start()
+        if self.mode == 'scalable' or not self._fits_watch_budget():
+            self._start_tree_watcher()
+        else:
+            try:
+                self._watch = self.observer.schedule(self.log_file_handler, self.watch_path, recursive=True)
+            except OSError as e:
+                # 最后的兜底 (如其他程序同时占用了监控)：失败前已注册的目录监控在进程重启前不会释放
+                logger.error(f"Recursive watch on {self.watch_path} failed ({e}), switching to scalable mode. "
+                             f"Watches registered before the failure stay in use until restart.")
+                try:
+                    self.observer.remove_handler_for_watch(self.log_file_handler,
+                                                           ObservedWatch(self.watch_path, recursive=True))
+                except KeyError:
+                    pass
+                self._start_tree_watcher()
         logger.info("File monitoring started.")
 
     def stop_monitoring(self):
         """停止文件监控"""
-        self.observer.stop()
-        self.observer.join()
+        if self.tree_watcher:
+            self.tree_watcher.stop()
+        if self.shared_observer:
+            # 多个租户可能监控同一目录 (共用同一个 watch)，只移除自己的处理器
+            if self._watch is not None:
+                self.observer.remove_handler_for_watch(self.log_file_handler, self._watch)
+                self._watch = None
+        else:
+            self.observer.stop()
+            self.observer.join()
         logger.info("File monitoring stopped.")
@@ -0,0 +1,100 @@
+# src/agents/registry.py
+import logging
+import importlib
+from core.scheduler import job_options
+
+logger = logging.getLogger(__name__)
+
+
+class AgentSpec:
+    """
+    数据采集Agent的声明。
+    factory 使用 'module:ClassName' 形式的字符串，只有在对应数据源启用时才会导入该模块，
+    这样未启用的数据源不会加载 PIL/pytesseract/watchdog/lark_oapi 等重量级依赖。
+    """
+
+    def __init__(self, name, config_path, factory, start=None, stop=None, job_id=None, executor='default',
+                 resources=()):
+        self.name = name
+        self.config_path = tuple(config_path)  # data_sources 下的配置路径
+        self.factory = factory
+        self.start = start  # 启动方法名
+        self.stop = stop  # 停止方法名
+        self.job_id = job_id  # 若启动方法需要调度器，则为其任务ID
+        self.executor = executor  # 任务所属线程池
+        self.resources = tuple(resources)  # 可注入的共享资源 (多租户时由 core.tenancy 提供)，作为同名关键字参数传入
+
+    def get_config(self, config):
+        section = config.get('data_sources', {})
+        for key in self.config_path:
+            section = section.get(key, {})
+        return section
+
+    def is_enabled(self, config):
+        return self.get_config(config).get('enabled', False)
+
+    def load_factory(self):
+        module_name, attr = self.factory.split(':')
+        return getattr(importlib.import_module(module_name), attr)
+
+    def create(self, config, data_aggregator, resources=None):
+        resources = resources or {}
+        kwargs = {name: resources[name] for name in self.resources if resources.get(name) is not None}
+        return self.load_factory()(self.get_config(config), data_aggregator, **kwargs)
+
+
+AGENT_REGISTRY = {}
+
+
+def register_agent(spec):
+    """注册数据源Agent (同名覆盖)"""
+    AGENT_REGISTRY[spec.name] = spec
+    return spec
+
+
+register_agent(AgentSpec(
+    'screen_capture', ['screen_capture'], 'agents.screen_agent:ScreenCaptureAgent',
+    start='start_periodic_capture', job_id='screen_capture_job', executor='capture', resources=['ocr_pool']
+))
+register_agent(AgentSpec(
+    'file_monitor', ['file_monitor'], 'agents.file_agent:FileMonitorAgent',
+    start='start_monitoring', stop='stop_monitoring', resources=['observer']
+))
+register_agent(AgentSpec(
+    'document_reader', ['document_reader'], 'agents.document_agent:DocumentReaderAgent',
+    start='start_periodic_scan', job_id='document_scan_job', executor='io'
+))
+register_agent(AgentSpec(
+    'lark', ['third_party_apis', 'lark'], 'agents.api_agent:LarkDataAgent'
+))
+
+
+def create_agents(config, data_aggregator, resources=None):
+    """按配置创建所有启用的数据源Agent，返回 {name: agent} (resources 为可选的共享资源 {name: obj})"""
+    agents = {}
+    for name, spec in AGENT_REGISTRY.items():
+        if spec.is_enabled(config):
+            agents[name] = spec.create(config, data_aggregator, resources)
+            logger.info(f"Agent '{name}' enabled.")
+    return agents
+
+
+def start_agents(agents, scheduler, config, job_prefix=''):
+    """启动各Agent的持续任务 (定时任务或监控线程)，job_prefix 用于区分不同租户的同名任务"""
+    for name, agent in agents.items():
+        spec = AGENT_REGISTRY[name]
+        if not spec.start:
+            continue
+        start = getattr(agent, spec.start)
+        if spec.job_id:
+            start(scheduler, job_id=f"{job_prefix}{spec.job_id}", **job_options(config, spec.job_id, spec.executor))
+        else:
+            start()
+
+
+def stop_agents(agents):
+    """停止各Agent的持续任务"""
+    for name, agent in agents.items():
+        spec = AGENT_REGISTRY[name]
+        if spec.stop:
+            getattr(agent, spec.stop)()
@@ -1,22 +1,27 @@
 # src/agents/report_agent.py
 import os
-import smtplib
 import requests
 import json
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from jinja2 import Environment, FileSystemLoader
 import logging
 from datetime import datetime, timedelta
+from core.mail_outbox import EmailOutbox
 
 logger = logging.getLogger(__name__)
 
 class ReportGeneratorAgent:
-    def __init__(self, config, data_aggregator):
+    def __init__(self, config, data_aggregator, outbox=None):
         self.config = config
         self.output_dir = config.get('output_dir', './reports')
         os.makedirs(self.output_dir, exist_ok=True)
         self.email_config = config.get('email', {})
+        self.outbox = outbox
+        self.email_account = None
+        if self.email_config.get('enabled', False):
+            if self.outbox is None:
+                self.outbox = EmailOutbox(self.email_config)
+                self.outbox.start()
+            self.email_account = self.outbox.register_account(self.email_config)
         self.llm_config = config.get('llm', {})
         self.data_aggregator = data_aggregator
 
@@ -149,7 +154,7 @@ class ReportGeneratorAgent:
             return None
 
     def send_email(self, subject, body, attachments=None):
-        """发送邮件"""
+        """将邮件放入发件箱，由后台线程异步发送"""
         if not self.email_config.get('enabled', False):
             logger.info("Email sending is disabled in config.")
             return True
@@ -157,32 +162,13 @@ class ReportGeneratorAgent:
         smtp_server = self.email_config.get('smtp_server')
         smtp_port = self.email_config.get('smtp_port')
         sender_email = self.email_config.get('sender_email')
-        sender_password = self.email_config.get('sender_password')
         recipient_email = self.email_config.get('recipient_email')
 
-        if not all([smtp_server, smtp_port, sender_email, sender_password, recipient_email]):
+        if not all([smtp_server, smtp_port, sender_email, recipient_email]):
             logger.error("Email configuration incomplete.")
             return False
 
-        try:
-            msg = MIMEMultipart()
-            msg['From'] = sender_email
-            msg['To'] = recipient_email
-            msg['Subject'] = subject
-
-            msg.attach(MIMEText(body, 'plain', 'utf-8'))
-
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            text = msg.as_string()
-            server.sendmail(sender_email, recipient_email, text)
-            server.quit()
-            logger.info(f"Email sent to {recipient_email}")
-            return True
-        except Exception as e:
-            logger.error(f"Error sending email: {e}")
-            return False
+        return self.outbox.enqueue(self.email_account, recipient_email, subject, body, attachments)
 
     def generate_and_send_daily(self):
         """生成并发送日报"""
@@ -1,19 +1,29 @@
 # src/agents/screen_agent.py
 import os
 import time
+import hashlib
 import logging
 from PIL import ImageGrab # 或使用 DXcam
 import pytesseract
 from datetime import datetime
+from core import metrics
 
 logger = logging.getLogger(__name__)
 
+CAPTURES = metrics.counter('autoreport_screen_captures', "Screenshots taken")
+OCR_SKIPPED = metrics.counter('autoreport_screen_ocr_skipped', "Screenshots whose OCR was skipped because the screen was unchanged")
+OCR_DURATION = metrics.histogram('autoreport_screen_ocr_seconds', "Duration of OCR on one screenshot")
+
 class ScreenCaptureAgent:
-    def __init__(self, config, data_aggregator):
+    def __init__(self, config, data_aggregator, ocr_pool=None):
         self.config = config
+        self.ocr_pool = ocr_pool  # 可选的共享OCR进程池 (core.ocr_pool.OCRPool)，多租户时使用
         self.interval = config.get('interval', 300)
         self.output_dir = config.get('output_dir', './data/screenshots')
         self.data_aggregator = data_aggregator
+        self.skip_unchanged = config.get('skip_unchanged', False)  # 可选：屏幕未变化时复用上一次的截图和OCR结果
+        self._last_digest = None
+        self._last_result = None
         os.makedirs(self.output_dir, exist_ok=True)
         logger.info(f"ScreenCaptureAgent initialized with interval {self.interval}s, output to {self.output_dir}")
 
@@ -22,14 +32,28 @@ class ScreenCaptureAgent:
         try:
             # 截屏
             screenshot = ImageGrab.grab()
-            timestamp = int(time.time())
-            filename = os.path.join(self.output_dir, f"screenshot_{timestamp}.png")
-            screenshot.save(filename)
-            logger.debug(f"Screenshot saved: {filename}")
+            CAPTURES.inc()
+            digest = hashlib.blake2b(screenshot.tobytes(), digest_size=16).digest() if self.skip_unchanged else None
+            if digest is not None and digest == self._last_digest:
+                # 屏幕内容与上次完全相同：不再保存截图和OCR，只记录一次活动
+                OCR_SKIPPED.inc()
+                logger.debug("Screen unchanged since last capture, skipping OCR.")
+                filename, text = self._last_result
+            else:
+                timestamp = int(time.time())
+                filename = os.path.join(self.output_dir, f"screenshot_{timestamp}.png")
+                screenshot.save(filename)
+                logger.debug("Screenshot saved: %s", filename)
 
-            # OCR (简化处理)
-            text = pytesseract.image_to_string(screenshot)
-            logger.debug(f"OCR Text extracted (first 100 chars): {text[:100]}...")
+                # OCR (简化处理)
+                with OCR_DURATION.time():
+                    if self.ocr_pool:
+                        text = self.ocr_pool.image_to_string(filename)
+                    else:
+                        text = pytesseract.image_to_string(screenshot)
+                logger.debug("OCR Text extracted (first 100 chars): %.100s...", text)
+                self._last_digest = digest
+                self._last_result = (filename, text)
 
             # 将分析结果存入数据聚合器
             # 注意：这里调用的是 DataAggregator 的 add_data 方法
@@ -43,7 +67,7 @@ class ScreenCaptureAgent:
         except Exception as e:
             logger.error(f"Error in screen capture/analysis: {e}")
 
-    def start_periodic_capture(self, scheduler):
-        """通过调度器启动周期性任务"""
+    def start_periodic_capture(self, scheduler, job_id='screen_capture_job', **job_options):
+        """通过调度器启动周期性任务 (job_options 为线程池及重叠策略等调度参数)"""
         logger.info("Starting periodic screen capture task.")
-        scheduler.add_job(self.capture_and_analyze, 'interval', seconds=self.interval, id='screen_capture_job')
+        scheduler.add_job(self.capture_and_analyze, 'interval', seconds=self.interval, id=job_id, **job_options)
@@ -0,0 +1,296 @@
+# src/backfill.py
+"""
+历史报告补跑：按报告类型的调度表 (cron) 为任意历史时间段批量生成报告，例如上个季度的全部日报，
+或修改提示词后重新生成。数据来自持久化的全文索引 (analysis.search_index) 或中心节点的接入日志 (core.ingest)；
+从接入日志补跑时与运行中的中心节点一致：开启多租户 (core.tenancy) 时每个采集端 (租户) 分别生成报告，
+写入 <output_dir>/<collector_id>/；单用户中心节点把所有采集端的数据合并为一份报告。
+--collector 只补跑其中一个采集端，写入 <output_dir>/<collector_id>/。
+
+- 并发生成，大模型并发数由 --concurrency 限制；
+- 已存在的报告直接跳过，报告文件原子写入，中断后重新运行即可从断点继续；
+- --force 重新生成已存在的报告，中断后再次以 --force 运行只会重做本轮尚未完成的窗口。
+
+用法 (在 auto_report 目录下):
+    python backfill.py daily --start 2026-07-01 --end 2026-10-01
+    python backfill.py weekly --start 2026-01-01 --concurrency 8 --force
+"""
+import os
+import re
+import sys
+import copy
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from apscheduler.triggers.cron import CronTrigger
+
+from core.data_aggregator import DataAggregator
+from core.llm_client import LLMClient
+from agents.analyzer_agent import AnalyzerAgent
+from main import load_config
+from utils.logger import setup_logger
+
+logger = logging.getLogger('backfill')
+
+STATE_FILE = '.backfill_state.json'
+
+
+def report_windows(schedule, start, end):
+    """返回 cron 调度表在 (start, end] 内的全部触发时间，即各报告窗口的终点"""
+    minute, hour, day, month, day_of_week = schedule.split()
+    trigger = CronTrigger(minute=minute, hour=hour, day=day, month=month, day_of_week=day_of_week)
+    start = start.astimezone(trigger.timezone) if start.tzinfo else start.replace(tzinfo=trigger.timezone)
+    end = end.astimezone(trigger.timezone) if end.tzinfo else end.replace(tzinfo=trigger.timezone)
+    windows = []
+    fire_time = trigger.get_next_fire_time(None, start)
+    while fire_time and fire_time <= end:
+        windows.append(fire_time.replace(tzinfo=None))
+        fire_time = trigger.get_next_fire_time(fire_time, fire_time)
+    return windows
+
+
+def report_path(output_dir, report_type, window_end, topic=None):
+    suffix = f"_{re.sub(r'[^0-9A-Za-z_-]+', '-', topic).strip('-')}" if topic else ''
+    return os.path.join(output_dir, f"{report_type}{suffix}_{window_end.strftime('%Y%m%d_%H%M')}.txt")
+
+
+def history_source(config, source='auto'):
+    """auto：中心节点且接入日志非空时读取日志，否则读取全文索引"""
+    if source != 'auto':
+        return source
+    journal_dir = config.get('core', {}).get('ingest', {}).get('journal_dir', './data/ingest')
+    central = config.get('core', {}).get('role') == 'central'
+    return 'journal' if central and os.path.isdir(journal_dir) and os.listdir(journal_dir) else 'index'
+
+
+def journal_store(config):
+    from core.ingest import IngestStore
+    ingest_config = config.get('core', {}).get('ingest', {})
+    return IngestStore(lambda collector_id: None, ingest_config.get('journal_dir', './data/ingest'))
+
+
+def load_history(aggregator, config, source, since, until, collectors=None):
+    """
+    把 [since, until) 内的持久化数据载入聚合器，返回 (数据点数量, 全文索引或 None)。
+    source 为 journal 时载入 collectors 中各采集端的日志 (默认全部采集端)。
+    """
+    count = 0
+    if source == 'journal':
+        store = journal_store(config)
+        collectors = collectors if collectors is not None else store.collectors()
+        since_ts, until_ts = since.timestamp(), until.timestamp()
+        for collector in collectors:
+            for _, points in store.iter_journal(collector, since_ts=since_ts):
+                for point_source, ts, data_point in points:
+                    if since_ts <= ts < until_ts:
+                        aggregator.add_data(point_source, data_point, timestamp=datetime.fromtimestamp(ts))
+                        count += 1
+        logger.info(f"Loaded {count} data points for collector(s) {', '.join(collectors)} "
+                    f"from ingest journal {store.journal_dir}.")
+        return count, None
+
+    from core.search_index import ActivityIndex
+    index_config = config.get('analysis', {}).get('search_index', {})
+    path = index_config.get('path', './data/index/activity.db')
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Search index {path} not found; enable analysis.search_index to persist activity.")
+    search_index = ActivityIndex(path)
+    for point_source, ts, data_point in search_index.iter_range(since, until):
+        aggregator.add_data(point_source, data_point, timestamp=datetime.fromtimestamp(ts))
+        count += 1
+    logger.info(f"Loaded {count} data points from search index {path}.")
+    return count, search_index
+
+
+class BackfillRun:
+    """一次补跑：为每个窗口生成报告并原子写入输出目录"""
+
+    def __init__(self, analyzer, report_type, description, topic, output_dir, force=False, retries=2):
+        self.analyzer = analyzer
+        self.report_type = report_type
+        self.description = description
+        self.topic = topic
+        self.output_dir = output_dir
+        self.retries = retries
+        self.state_path = os.path.join(output_dir, STATE_FILE)
+        # --force 时记录本轮开始时间：之后写出的报告视为本轮已完成，中断后重跑时跳过
+        self.force_since = self._load_force_since() if force else None
+
+    def _load_force_since(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)['force_since']
+        except (OSError, ValueError, KeyError):
+            force_since = time.time()
+            with open(self.state_path, 'w', encoding='utf-8') as f:
+                json.dump({'force_since': force_since, 'report_type': self.report_type}, f)
+            return force_since
+
+    def finish(self):
+        if self.force_since is not None and os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def is_done(self, path):
+        if not os.path.exists(path):
+            return False
+        return self.force_since is None or os.path.getmtime(path) >= self.force_since
+
+    def run_window(self, window_end):
+        """生成一个窗口的报告，返回 'done' / 'skipped' / 'empty'"""
+        path = report_path(self.output_dir, self.report_type, window_end, self.topic)
+        if self.is_done(path):
+            return 'skipped'
+        since = self.analyzer._get_time_range(self.report_type, window_end)
+        if not self.analyzer.data_aggregator.get_raw_data_since(since, window_end):
+            return 'empty'
+
+        for attempt in range(self.retries + 1):
+            try:
+                _, content, _ = self.analyzer.generate_report(self.report_type, self.description, self.topic,
+                                                              now=window_end, strict=True)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = 5 * 2 ** attempt
+                logger.warning(f"Report for {window_end} failed (attempt {attempt + 1}), retrying in {delay}s: {e}")
+                time.sleep(delay)
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return 'done'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate reports for historical windows")
+    parser.add_argument('report_type', help="Report type from analysis.report_types (daily, weekly, ...)")
+    parser.add_argument('--start', required=True, type=datetime.fromisoformat, help="Window ends after this time")
+    parser.add_argument('--end', type=datetime.fromisoformat, default=None, help="Window ends up to this time (default: now)")
+    parser.add_argument('--config', default='../config/config.yaml')
+    parser.add_argument('--schedule', help="Cron expression overriding the report type's schedule")
+    parser.add_argument('--topic', help="Topic overriding the report type's topic")
+    parser.add_argument('--source', choices=['auto', 'index', 'journal'], default='auto',
+                        help="Where persisted activity is read from")
+    parser.add_argument('--collector', help="Only backfill this collector into <output-dir>/<collector> (journal source; "
+                                            "default: every collector, per collector when core.tenancy is enabled)")
+    parser.add_argument('--concurrency', type=int, default=4, help="Reports generated (LLM requests) in parallel")
+    parser.add_argument('--output-dir', help="Default: <report_output_dir>/backfill/<report_type>")
+    parser.add_argument('--force', action='store_true', help="Regenerate reports that already exist")
+    parser.add_argument('--retries', type=int, default=2, help="Retries per window after an LLM error")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = load_config(args.config)
+    setup_logger(config.get('core', {}).get('logging', {}))
+
+    report_config = config.get('analysis', {}).get('report_types', {}).get(args.report_type, {})
+    schedule = args.schedule or report_config.get('schedule')
+    if not schedule or len(schedule.split()) != 5:
+        logger.error(f"No valid cron schedule for report type '{args.report_type}'; use --schedule.")
+        return 2
+    description = report_config.get('description', args.report_type)
+    topic = args.topic or report_config.get('topic')
+    end = args.end or datetime.now()
+    windows = report_windows(schedule, args.start, end)
+    if not windows:
+        logger.warning("No report windows in the given range.")
+        return 0
+
+    output_dir = args.output_dir or os.path.join(
+        config.get('core', {}).get('report_output_dir', './reports'), 'backfill', args.report_type)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 与运行中的中心节点一致：多租户时每个采集端是一个用户，分别写入 <output_dir>/<collector_id>/；
+    # 单用户中心节点的所有采集端汇入同一个聚合器，合并为一份报告
+    source = history_source(config, args.source)
+    if source == 'journal':
+        collectors = journal_store(config).collectors()
+        if args.collector and args.collector not in collectors:
+            logger.error(f"Collector '{args.collector}' has no ingest journal; known: {', '.join(collectors) or 'none'}.")
+            return 2
+        if not collectors:
+            logger.error("The ingest journal is empty.")
+            return 2
+        if args.collector:
+            targets = [([args.collector], os.path.join(output_dir, args.collector))]
+        elif config.get('core', {}).get('tenancy', {}).get('enabled', False):
+            targets = [([collector], os.path.join(output_dir, collector)) for collector in collectors]
+        else:
+            targets = [(collectors, output_dir)]
+    else:
+        if args.collector:
+            logger.warning("--collector only applies to the ingest journal source, ignored.")
+        targets = [(None, output_dir)]
+
+    # 大模型并发由共享客户端统一限制
+    llm_client = LLMClient(dict(config.get('llm', {}), max_concurrency=args.concurrency))
+    totals = {'done': 0, 'skipped': 0, 'empty': 0, 'failed': 0}
+    started = time.perf_counter()
+    try:
+        for collectors, target_dir in targets:
+            results = backfill_target(config, args, source, collectors, target_dir, windows, description, topic,
+                                      llm_client)
+            for key, value in results.items():
+                totals[key] += value
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; completed reports are kept, rerun the same command to resume.")
+        return 130
+    finally:
+        llm_client.close()
+
+    logger.info(f"Backfill finished in {time.perf_counter() - started:.1f}s: {totals}")
+    return 1 if totals['failed'] else 0
+
+
+def backfill_target(config, args, source, collectors, output_dir, windows, description, topic, llm_client):
+    """为一个数据集 (全文索引，或接入日志中的一个或全部采集端) 补跑全部窗口，返回各结果的数量"""
+    os.makedirs(output_dir, exist_ok=True)
+    # 补跑不发送邮件
+    backfill_config = copy.deepcopy(config)
+    backfill_config.setdefault('notifications', {})['email'] = {'enabled': False}
+    backfill_config.setdefault('core', {})['report_output_dir'] = output_dir
+
+    aggregator = DataAggregator()
+    analyzer = AnalyzerAgent(backfill_config, aggregator, llm_client=llm_client)
+    first_since = min(analyzer._get_time_range(args.report_type, window_end) for window_end in windows)
+    _, search_index = load_history(aggregator, config, source, first_since, windows[-1], collectors)
+    analyzer.search_index = search_index
+
+    run = BackfillRun(analyzer, args.report_type, description, topic, output_dir, args.force, args.retries)
+    results = {'done': 0, 'skipped': 0, 'empty': 0, 'failed': 0}
+    label = f" for collector {collectors[0]}" if collectors and len(collectors) == 1 else ''
+    logger.info(f"Backfilling {len(windows)} {args.report_type} report(s){label} into {output_dir} "
+                f"with concurrency {args.concurrency}...")
+    executor = ThreadPoolExecutor(max_workers=args.concurrency)
+    try:
+        futures = {executor.submit(run.run_window, window_end): window_end for window_end in windows}
+        for future in as_completed(futures):
+            window_end = futures[future]
+            try:
+                results[future.result()] += 1
+            except Exception as e:
+                results['failed'] += 1
+                logger.error(f"Report{label} for window ending {window_end} failed: {e}")
+            finished = sum(results.values())
+            if finished % 10 == 0 or finished == len(windows):
+                logger.info(f"Progress{label} {finished}/{len(windows)}: {results}")
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    if search_index:
+        search_index.close()
+
+    if not results['failed']:
+        run.finish()
+    return results
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# src/benchmarks/__main__.py
+"""
+运行基准测试并写出 JSON 结果，便于跨版本对比。
+
+用法 (在 auto_report 目录下):
+    python -m benchmarks --days 30
+    python -m benchmarks --days 365 --output ./data/benchmarks/year.json --startup
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+from benchmarks.suite import run_suite
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AutoReport benchmark suite")
+    parser.add_argument('--days', type=int, default=30, help="Days of synthetic activity to generate")
+    parser.add_argument('--doc-files', type=int, default=2000, help="Files in the generated document tree")
+    parser.add_argument('--flood-events', type=int, default=50000, help="Events in the file event flood")
+    parser.add_argument('--startup', action='store_true', help="Also run the startup time benchmark")
+    parser.add_argument('--output', help="Result file (default: ./data/benchmarks/benchmark_<time>.json)")
+    args = parser.parse_args()
+
+    started_at = datetime.now()
+    results = {
+        'meta': {
+            'started_at': started_at.isoformat(),
+            'git_revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+        'results': run_suite(args.days, args.doc_files, args.flood_events, args.startup),
+    }
+    results['meta']['total_seconds'] = (datetime.now() - started_at).total_seconds()
+
+    output = args.output or os.path.join('./data/benchmarks', f"benchmark_{started_at.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(json.dumps(results['results'], ensure_ascii=False, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
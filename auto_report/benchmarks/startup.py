@@ -0,0 +1,90 @@
+# src/benchmarks/startup.py
+"""
+启动耗时与内存基准。
+在独立子进程中分别以"延迟导入" (通过 agents.registry，只加载已启用的数据源) 和
+"全部导入" (旧版 main.py 的行为) 两种方式完成启动，比较耗时与峰值RSS。
+
+用法 (在 auto_report 目录下):
+    python -m benchmarks.startup [--runs 5] [--output result.json]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# 子进程中执行的启动代码：{mode} 为 'lazy' 或 'eager'
+CHILD_CODE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+if '{mode}' == 'eager':
+    import agents.screen_agent, agents.file_agent, agents.document_agent, agents.api_agent
+from agents.registry import create_agents
+from core.data_aggregator import DataAggregator
+config = json.loads(sys.argv[1])
+agents = create_agents(config, DataAggregator())
+elapsed = time.perf_counter() - t0
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = [m for m in ('PIL', 'pytesseract', 'watchdog', 'lark_oapi') if m in sys.modules]
+print(json.dumps({{'seconds': elapsed, 'max_rss_kb': rss_kb, 'agents': sorted(agents), 'heavy_modules': heavy}}))
+"""
+
+
+def minimal_config(workdir):
+    """仅启用文件监控和文档读取的最小部署配置"""
+    return {
+        'data_sources': {
+            'file_monitor': {'enabled': True, 'watch_path': workdir},
+            'document_reader': {'enabled': True, 'watch_path': workdir, 'scan_interval': 0},
+        }
+    }
+
+
+def run_child(mode, config, cwd):
+    out = subprocess.run(
+        [sys.executable, '-c', CHILD_CODE.format(mode=mode), json.dumps(config)],
+        cwd=cwd, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    return {
+        'seconds_median': statistics.median(s['seconds'] for s in samples),
+        'max_rss_kb_median': statistics.median(s['max_rss_kb'] for s in samples),
+        'heavy_modules': samples[0]['heavy_modules'],
+        'agents': samples[0]['agents'],
+    }
+
+
+def run(runs=5):
+    """返回 lazy 与 eager 两种启动方式的结果"""
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as workdir:
+        config = minimal_config(workdir)
+        results = {}
+        for mode in ('eager', 'lazy'):
+            results[mode] = summarize([run_child(mode, config, package_dir) for _ in range(runs)])
+    results['speedup'] = results['eager']['seconds_median'] / max(results['lazy']['seconds_median'], 1e-9)
+    results['rss_saved_kb'] = results['eager']['max_rss_kb_median'] - results['lazy']['max_rss_kb_median']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time / RSS benchmark for minimal deployments")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help="Write JSON result to this file")
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
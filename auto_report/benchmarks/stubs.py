@@ -0,0 +1,120 @@
+# src/benchmarks/stubs.py
+"""
+本地 LLM / SMTP 替身服务，供基准测试在无外网、无真实邮箱的环境下运行完整流程。
+"""
+import json
+import threading
+import socketserver
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class LLMStub:
+    """兼容 chat/completions 接口的本地HTTP服务，返回固定报告内容"""
+
+    def __init__(self, reply="这是一份由本地替身服务生成的测试报告。", delay=0.0, record_prompts=False):
+        self.reply = reply
+        self.delay = delay
+        self.requests = 0
+        self.prompt_chars = 0
+        self.prompts = [] if record_prompts else None  # 测试时记录每个请求的提示词
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                payload = json.loads(body)
+                stub.requests += 1
+                stub.prompt_chars += sum(len(m.get('content', '')) for m in payload.get('messages', []))
+                if stub.prompts is not None:
+                    stub.prompts.append('\n'.join(m.get('content', '') for m in payload.get('messages', [])))
+                if stub.delay:
+                    threading.Event().wait(stub.delay)
+                data = json.dumps({"choices": [{"message": {"role": "assistant", "content": stub.reply}}]})
+                encoded = data.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/v4/chat/completions"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SMTPStub:
+    """只实现投递所需命令的最小SMTP服务 (不支持STARTTLS，使用时需配置 use_tls: false)"""
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode('ascii') + b'\r\n')
+
+            def handle(self):
+                stub.connections += 1
+                self.reply('220 stub ESMTP')
+                mail_from, rcpt_to = None, []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode('utf-8', 'replace').strip()
+                    verb = command[:4].upper()
+                    if verb in ('EHLO', 'HELO'):
+                        self.reply('250 stub')
+                    elif verb == 'MAIL':
+                        mail_from, rcpt_to = command[10:], []
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        rcpt_to.append(command[8:])
+                        self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        chunks = []
+                        while True:
+                            data_line = self.rfile.readline()
+                            if not data_line or data_line in (b'.\r\n', b'.\n'):
+                                break
+                            chunks.append(data_line)
+                        stub.messages.append((mail_from, rcpt_to, b''.join(chunks)))
+                        self.reply('250 OK')
+                    elif verb in ('RSET', 'NOOP'):
+                        self.reply('250 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    else:
+                        self.reply('502 Command not implemented')
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
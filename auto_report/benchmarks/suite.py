@@ -0,0 +1,271 @@
+# src/benchmarks/suite.py
+"""
+热点路径微基准与端到端基准。
+每个基准返回一个可 JSON 序列化的字典，由 benchmarks.__main__ 汇总写入结果文件。
+"""
+import os
+import gc
+import time
+import logging
+import tracemalloc
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+from core.data_aggregator import DataAggregator
+from benchmarks.workload import WorkloadGenerator, populate_aggregator, generate_document_tree
+from benchmarks.stubs import LLMStub, SMTPStub
+
+
+def measure(func, repeat=5, number=1):
+    """运行 func repeat 轮 (每轮 number 次)，返回单次调用耗时统计 (秒)"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+def analyzer_config(output_dir, llm_url='http://127.0.0.1:9/', email=None):
+    return {
+        'core': {'report_output_dir': output_dir},
+        'llm': {'enabled': True, 'api_key': 'benchmark', 'base_url': llm_url, 'timeout': 30},
+        'notifications': {'email': email or {'enabled': False}},
+    }
+
+
+def bench_add_data(days):
+    """DataAggregator.add_data 吞吐"""
+    points = list(WorkloadGenerator().generate(days))
+
+    def run():
+        aggregator = DataAggregator()
+        for source, ts, data_point in points:
+            aggregator.add_data(source, data_point, timestamp=ts)
+
+    result = measure(run, repeat=3)
+    result['points'] = len(points)
+    result['points_per_second'] = len(points) / result['median']
+    return result
+
+
+def bench_memory(days):
+    """DataAggregator 中每个数据点占用的内存 (字节，包含数据内容本身)"""
+    generator = WorkloadGenerator()
+    by_source = {}
+    for source, ts, _ in generator.generate(days):
+        by_source.setdefault(source, []).append(ts)
+
+    results = {}
+    for source, timestamps in by_source.items():
+        gc.collect()
+        tracemalloc.start()
+        aggregator = DataAggregator()
+        for ts in timestamps:
+            aggregator.add_data(source, generator._make(source, ts), timestamp=ts)
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[source] = {'points': len(timestamps), 'bytes_per_point': used / len(timestamps)}
+    return results
+
+
+def bench_get_raw_data_since(aggregator, days):
+    """按最近一天/一周/全部窗口做范围查询"""
+    now = datetime.now()
+    results = {}
+    for label, delta in (('1d', timedelta(days=1)), ('7d', timedelta(days=7)), ('all', timedelta(days=days + 1))):
+        since = now - delta
+        results[label] = measure(lambda: aggregator.get_raw_data_since(since), repeat=5)
+        results[label]['points'] = sum(len(v) for v in aggregator.get_raw_data_since(since).values())
+    return results
+
+
+def bench_build_prompt(aggregator, days, digest=False):
+    """AnalyzerAgent._build_llm_prompt 在周报/全部数据上的耗时与提示词长度 (digest=True 时启用本地主题聚类)"""
+    from agents.analyzer_agent import AnalyzerAgent
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        config = analyzer_config(output_dir)
+        if digest:
+            config['analysis'] = {'digest': {'enabled': True, 'min_items': 0}}
+        analyzer = AnalyzerAgent(config, aggregator)
+        results = {}
+        for report_type in ('weekly', 'yearly' if days > 90 else 'monthly'):
+            data = aggregator.get_raw_data_since(analyzer._get_time_range(report_type))
+            results[report_type] = measure(lambda: analyzer._build_llm_prompt(report_type, report_type, data), repeat=3)
+            results[report_type]['prompt_chars'] = len(analyzer._build_llm_prompt(report_type, report_type, data))
+        return results
+
+
+def bench_activity_stats(aggregator, days):
+    """core.activity_stats.compute_activity_stats 在最近一天/一周/全部数据上的耗时"""
+    from core.activity_stats import compute_activity_stats
+
+    now = datetime.now()
+    results = {}
+    for label, delta in (('1d', timedelta(days=1)), ('7d', timedelta(days=7)), ('all', timedelta(days=days + 1))):
+        since = now - delta
+        data = aggregator.get_raw_data_since(since, now)
+        results[label] = measure(lambda: compute_activity_stats(data, since, now), repeat=5)
+        results[label]['points'] = sum(len(v) for v in data.values())
+    return results
+
+
+def bench_document_scan(n_files):
+    """DocumentReaderAgent.scan_and_aggregate：首次全量扫描与无变化的重复扫描"""
+    from agents.document_agent import DocumentReaderAgent
+
+    with tempfile.TemporaryDirectory() as root:
+        generate_document_tree(root, n_files)
+        config = {'enabled': True, 'watch_path': root, 'supported_extensions': ['.txt', '.md', '.py']}
+        agent = DocumentReaderAgent(config, DataAggregator())
+        start = time.perf_counter()
+        agent.scan_and_aggregate()
+        cold = time.perf_counter() - start
+        warm = measure(agent.scan_and_aggregate, repeat=3)
+    return {'files': n_files, 'cold_seconds': cold, 'warm': warm}
+
+
+def bench_file_event_flood(n_events):
+    """LogFileHandler 在事件洪峰下的处理速率"""
+    from watchdog.events import FileModifiedEvent, DirModifiedEvent
+    from agents.file_agent import FileMonitorAgent
+
+    with tempfile.TemporaryDirectory() as root:
+        agent = FileMonitorAgent({'watch_path': root}, DataAggregator())
+        events = [
+            DirModifiedEvent(os.path.join(root, f"dir_{i % 50}")) if i % 10 == 0
+            else FileModifiedEvent(os.path.join(root, f"dir_{i % 50}", f"file_{i % 500}.py"))
+            for i in range(n_events)
+        ]
+        handler = agent.log_file_handler
+
+        def run():
+            for event in events:
+                handler.on_any_event(event)
+
+        result = measure(run, repeat=3)
+    result['events'] = n_events
+    result['events_per_second'] = n_events / result['median']
+    return result
+
+
+def bench_end_to_end(aggregator, report_type='weekly', llm_delay=0.0):
+    """完整的 analyze_and_report：本地LLM替身 + 本地SMTP替身 + 发件箱投递"""
+    from agents.analyzer_agent import AnalyzerAgent
+    from core.mail_outbox import EmailOutbox
+
+    with LLMStub(delay=llm_delay) as llm, SMTPStub() as smtp, tempfile.TemporaryDirectory() as workdir:
+        email = {
+            'enabled': True, 'smtp_server': '127.0.0.1', 'smtp_port': smtp.port, 'use_tls': False,
+            'sender_email': 'bench@localhost', 'recipient_email': 'user@localhost',
+            'outbox_dir': os.path.join(workdir, 'outbox'), 'attach_report': True,
+        }
+        outbox = EmailOutbox(email)  # 不启动后台线程，投递耗时单独测量
+        analyzer = AnalyzerAgent(analyzer_config(os.path.join(workdir, 'reports'), llm.url, email), aggregator, outbox)
+
+        start = time.perf_counter()
+        analyzer.analyze_and_report(report_type, report_type)
+        report_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        outbox.flush()
+        delivery_seconds = time.perf_counter() - start
+        outbox.stop()
+
+        return {
+            'report_type': report_type,
+            'analyze_and_report_seconds': report_seconds,
+            'outbox_delivery_seconds': delivery_seconds,
+            'llm_requests': llm.requests,
+            'prompt_chars': llm.prompt_chars,
+            'emails_delivered': len(smtp.messages),
+        }
+
+
+def bench_ingest(days, collectors=4):
+    """采集端 → 中心节点的本地回环接入吞吐：collectors 个 RemoteAggregator 并发推送同一份工作负载"""
+    import threading
+    from core.ingest import IngestStore, start_ingest_server
+    from core.remote_aggregator import RemoteAggregator
+
+    points = list(WorkloadGenerator().generate(days))
+    with tempfile.TemporaryDirectory() as workdir:
+        aggregators = {f"collector{i}": DataAggregator() for i in range(collectors)}
+        store = IngestStore(aggregators.get, os.path.join(workdir, 'journal'))
+        server = start_ingest_server({'port': 0}, store)
+        clients = [
+            RemoteAggregator({
+                'collector_id': collector_id, 'spool_dir': os.path.join(workdir, 'spool', collector_id),
+                'central_url': f"http://127.0.0.1:{server.server_port}/ingest", 'batch_size': 1000,
+            })
+            for collector_id in aggregators
+        ]
+
+        def push(client):
+            for source, ts, data_point in points:
+                client.add_data(source, data_point, timestamp=ts)
+            client.flush()
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=push, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+        server.shutdown()
+        server.server_close()
+        delivered = sum(sum(len(column) for column in aggregator.data_store.values())
+                        for aggregator in aggregators.values())
+        journal_bytes = sum(os.path.getsize(os.path.join(directory, name))
+                            for directory, _, names in os.walk(store.journal_dir) for name in names)
+    return {
+        'collectors': collectors,
+        'points': len(points) * collectors,
+        'delivered': delivered,
+        'seconds': seconds,
+        'points_per_second': delivered / seconds,
+        'journal_bytes': journal_bytes,
+    }
+
+
+def run_suite(days=30, doc_files=2000, flood_events=50000, include_startup=False):
+    """运行全部基准，返回结果字典"""
+    logging.getLogger().setLevel(logging.WARNING)
+    results = {}
+
+    results['add_data'] = bench_add_data(days)
+    results['memory'] = bench_memory(days)
+
+    aggregator = DataAggregator()
+    load_start = time.perf_counter()
+    results['workload'] = {'days': days, 'points': populate_aggregator(aggregator, days)}
+    results['workload']['load_seconds'] = time.perf_counter() - load_start
+
+    results['get_raw_data_since'] = bench_get_raw_data_since(aggregator, days)
+    results['build_llm_prompt'] = bench_build_prompt(aggregator, days)
+    try:
+        import numpy  # noqa: F401
+        results['build_llm_prompt_digest'] = bench_build_prompt(aggregator, days, digest=True)
+        results['activity_stats'] = bench_activity_stats(aggregator, days)
+    except ImportError:
+        pass
+    results['document_scan'] = bench_document_scan(doc_files)
+    results['file_event_flood'] = bench_file_event_flood(flood_events)
+    results['end_to_end'] = bench_end_to_end(aggregator)
+    results['ingest'] = bench_ingest(min(days, 30))
+
+    if include_startup:
+        from benchmarks import startup
+        results['startup'] = startup.run(runs=3)
+    return results
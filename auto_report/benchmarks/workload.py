@@ -0,0 +1,137 @@
+# src/benchmarks/workload.py
+"""
+合成工作负载生成器。
+按"工作日 9:00-19:00 活跃"的作息，生成与真实使用量级相近的屏幕OCR、文件事件、文档与飞书数据，
+可覆盖从一天到一年的时间范围。同一个 seed 总是生成相同的数据。
+"""
+import os
+import random
+from datetime import datetime, timedelta
+
+# 每个工作日的大致数据量
+DAILY_VOLUME = {
+    'screen': 120,  # 每5分钟截屏一次
+    'file': 400,  # 编辑器保存、构建产物等文件事件
+    'document': 25,
+    'lark_calendar': 3,
+    'lark_message': 40,
+}
+
+PROJECTS = ['billing-service', 'auto-report', 'data-pipeline', 'mobile-app', 'infra', '客户门户', '内部工具']
+MODULES = ['api', 'core', 'utils', 'models', 'views', 'tests', 'docs', 'scripts', 'migrations', 'config']
+EXTENSIONS = ['.py', '.md', '.js', '.sql', '.txt', '.yaml', '.java', '.html']
+WORDS = (
+    'refactor handler timeout retry cache query index schema migration deploy review release '
+    'latency throughput memory config parser client server request response token session '
+    'dashboard metrics alert invoice payment order customer report summary meeting design '
+    '需求 评审 上线 测试 修复 优化 接口 数据库 性能 文档 会议 进度 发布 监控 告警 客户 报表'
+).split()
+APPS = ['VS Code', 'PyCharm', 'Chrome', 'Terminal', '飞书', 'Excel', 'Confluence', 'Jira']
+EVENT_TYPES = ['modified'] * 8 + ['created', 'deleted', 'moved']
+CHATS = ['项目A讨论组', '技术分享', '后端组', '产品需求群', 'oncall']
+
+
+class WorkloadGenerator:
+    """按时间顺序生成 (source, timestamp, data_point) 三元组"""
+
+    def __init__(self, seed=42, root='/home/user/workspace', volume=None):
+        self.random = random.Random(seed)
+        self.root = root
+        self.volume = dict(DAILY_VOLUME, **(volume or {}))
+        # 固定的文件集合，事件集中在少数"热点"文件上，更接近真实编辑行为
+        self.paths = [self._random_path() for _ in range(2000)]
+
+    def _words(self, n):
+        return ' '.join(self.random.choice(WORDS) for _ in range(n))
+
+    def _random_path(self):
+        depth = self.random.randint(1, 4)
+        parts = [self.random.choice(PROJECTS), self.random.choice(MODULES)]
+        parts += [self.random.choice(MODULES) for _ in range(depth - 1)]
+        name = f"{self.random.choice(WORDS)}_{self.random.randint(0, 99)}{self.random.choice(EXTENSIONS)}"
+        return os.path.join(self.root, *parts, name)
+
+    def _hot_path(self):
+        # 约 80% 的事件落在 10% 的文件上
+        if self.random.random() < 0.8:
+            return self.paths[self.random.randrange(len(self.paths) // 10)]
+        return self.random.choice(self.paths)
+
+    def _make(self, source, ts):
+        if source == 'screen':
+            project = self.random.choice(PROJECTS)
+            return {
+                "filename": f"./data/screenshots/screenshot_{int(ts.timestamp())}.png",
+                "timestamp": ts.isoformat(),
+                "extracted_text_snippet": f"{self.random.choice(APPS)} - {project} {self._words(60)}"[:500],
+            }
+        if source == 'file':
+            return {
+                "event_type": self.random.choice(EVENT_TYPES),
+                "src_path": self._hot_path(),
+                "is_directory": False,
+                "timestamp": ts.isoformat(),
+            }
+        if source == 'document':
+            path = self._hot_path()
+            content = self._words(200)
+            return {
+                "filename": os.path.relpath(path, self.root),
+                "full_path": path,
+                "size": len(content.encode('utf-8')),
+                "last_modified": ts.isoformat(),
+                "content_snippet": content[:1000],
+            }
+        if source == 'lark_calendar':
+            start = ts.replace(minute=0, second=0, microsecond=0)
+            return {
+                "summary": f"{self.random.choice(PROJECTS)} {self.random.choice(['评审', '周会', '同步', '复盘'])}",
+                "description": self._words(10),
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+            }
+        return {
+            "chat_name": self.random.choice(CHATS),
+            "content": self._words(self.random.randint(5, 30)),
+            "create_time": ts.isoformat(),
+        }
+
+    def generate(self, days, end=None):
+        """生成截至 end (默认当前时间) 的 days 天数据，按时间排序"""
+        end = end or datetime.now()
+        start_day = (end - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        for day_offset in range(days + 1):
+            day = start_day + timedelta(days=day_offset)
+            if day.weekday() >= 5:
+                continue
+            events = []
+            for source, count in self.volume.items():
+                for _ in range(count):
+                    seconds = self.random.uniform(9 * 3600, 19 * 3600)
+                    events.append((day + timedelta(seconds=seconds), source))
+            events.sort()
+            for ts, source in events:
+                if ts > end:
+                    return
+                yield source, ts, self._make(source, ts)
+
+
+def populate_aggregator(aggregator, days, seed=42, end=None):
+    """向 DataAggregator 填充 days 天的合成数据，返回数据点数量"""
+    count = 0
+    for source, ts, data_point in WorkloadGenerator(seed).generate(days, end):
+        aggregator.add_data(source, data_point, timestamp=ts)
+        count += 1
+    return count
+
+
+def generate_document_tree(root, n_files=2000, seed=42, extensions=('.txt', '.md', '.py')):
+    """在 root 下生成多层目录的文本文件树，供文档扫描基准使用"""
+    rnd = random.Random(seed)
+    for i in range(n_files):
+        directory = os.path.join(root, rnd.choice(PROJECTS), rnd.choice(MODULES), rnd.choice(MODULES))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"file_{i}{rnd.choice(extensions)}")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(50, 2000))))
+    return n_files
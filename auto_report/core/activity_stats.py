@@ -0,0 +1,281 @@
+# src/core/activity_stats.py
+"""
+活动数据的数值统计：为长周期报告提供量化摘要，代替逐条列出大量原始数据。
+把时间窗口内所有来源的数据点按固定时长分箱 (默认 5 分钟)，得到 时间×来源、时间×目录 的活动矩阵 (NumPy 向量化)，
+据此计算活跃时长与高峰时段、专注时段 (连续活动)、按变更量排序的目录及其近期变化、逐周趋势与环比。
+时间按本地时区统计；目录取文件事件/文档路径相对于公共根目录的前 directory_depth 级。
+"""
+import os
+import time
+import logging
+from array import array
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from core.records import RecordView
+
+logger = logging.getLogger(__name__)
+
+# 可归属到目录的来源及其路径字段
+PATH_KEYS = {
+    'file': 'src_path',
+    'document': 'full_path',
+}
+
+_EPOCH = datetime(1970, 1, 1)
+_WEEK_OFFSET = 3  # 1970-01-01 为星期四，(day + 3) // 7 得到以星期一开始的周序号
+
+
+class FocusSession:
+    """一段连续活动 (相邻活跃分箱的间隔不超过 idle_minutes)"""
+    __slots__ = ('start', 'end', 'active_hours', 'events', 'top_directory')
+
+    def __init__(self, start, end, active_hours, events, top_directory):
+        self.start = start  # 本地时间 datetime
+        self.end = end
+        self.active_hours = active_hours
+        self.events = events
+        self.top_directory = top_directory
+
+    @property
+    def hours(self):
+        return (self.end - self.start).total_seconds() / 3600
+
+
+class ActivityStats:
+    """compute_activity_stats 的结果，均为普通 Python 类型，便于格式化"""
+
+    def __init__(self):
+        self.total = 0
+        self.source_events = {}  # {source: 数据点数}
+        self.source_hours = {}  # {source: 有该来源活动的时长 (小时)}
+        self.active_hours = 0.0
+        self.active_days = 0
+        self.hour_of_day = [0.0] * 24  # 各整点小时内的活跃时长合计 (小时)
+        self.weekday_hours = [0.0] * 7  # 星期一 ~ 星期日的活跃时长合计 (小时)
+        self.session_count = 0
+        self.focus_count = 0
+        self.focus_hours = 0.0
+        self.median_session_hours = 0.0
+        self.longest_sessions = []  # [FocusSession]
+        self.directories = []  # [{'directory', 'events', 'share', 'hours', 'days', 'recent', 'previous'}]
+        self.weeks = []  # [{'start', 'partial', 'events', 'active_hours', 'focus_hours', 'sessions', 'sources'}]
+        self.recent_window = False  # 数据是否覆盖两个完整的 7 天 (目录的 recent/previous 是否有意义)
+
+
+def _column(items):
+    """返回 (浮点时间戳 ndarray, 数据列表)；RecordView 直接使用其时间戳列"""
+    if isinstance(items, RecordView):
+        timestamps = items.timestamps
+        if isinstance(timestamps, array) and timestamps.typecode == 'd':
+            return np.frombuffer(timestamps, dtype=np.float64), items.records
+        return np.asarray(timestamps, dtype=np.float64), items.records
+    timestamps, records = [], []
+    for item in items:
+        try:
+            timestamps.append(datetime.fromisoformat(item.get('timestamp')).timestamp())
+        except (TypeError, ValueError):
+            continue
+        records.append(item.get('data', {}))
+    return np.asarray(timestamps, dtype=np.float64), records
+
+
+def _directory_codes(source, records, directories):
+    """每条记录所在目录的编号 (目录 -> 编号 记录在 directories 中)，无法归属目录的来源返回 -1"""
+    key = PATH_KEYS.get(source)
+    if key is None:
+        return np.full(len(records), -1, dtype=np.int64)
+    # 记录对象的目录前缀已驻留，先取出目录再整体编号，比逐条 setdefault 快得多
+    paths = [os.path.dirname(str(record.get(key, ''))) if type(record) is dict else record.directory
+             for record in records]
+    for path in dict.fromkeys(paths):
+        directories.setdefault(path, len(directories))
+    return np.fromiter(map(directories.__getitem__, paths), dtype=np.int64, count=len(paths))
+
+
+def _directory_labels(directories, depth):
+    """把完整目录归并为公共根目录下的前 depth 级，返回 (标签列表, 完整目录编号 -> 标签编号)"""
+    paths = list(directories)
+    try:
+        root = os.path.commonpath(paths) if len(paths) > 1 else os.path.dirname(paths[0])
+    except ValueError:
+        root = ''  # 绝对路径与相对路径混杂
+    labels, label_ids = [], {}
+    mapping = np.empty(len(paths), dtype=np.int64)
+    for code, path in enumerate(paths):
+        relative = path[len(root):] if root else path  # commonpath 保证 path 以 root 开头
+        parts = [part for part in relative.split(os.sep) if part and part != '.']
+        label = os.path.join(*parts[:depth]) if parts else (os.path.basename(root) or root or '.')
+        mapping[code] = label_ids.setdefault(label, len(labels))
+        if mapping[code] == len(labels):
+            labels.append(label)
+    return labels, mapping
+
+
+def _sorted_unique(values):
+    """已排序数组的 (去重值, 每个元素对应的去重值下标)，比 np.unique 少一次排序"""
+    if not len(values):
+        return values, np.zeros(0, dtype=np.int64)
+    change = np.empty(len(values), dtype=bool)
+    change[0] = True
+    np.not_equal(values[1:], values[:-1], out=change[1:])
+    return values[change], np.cumsum(change) - 1
+
+
+def _local_seconds(ts):
+    """
+    已排序的 UTC 时间戳 -> 本地挂钟秒数。
+    按 UTC 日取时区偏移；当天首末偏移不同 (夏令时切换) 时，该日的数据点逐个取偏移。
+    """
+    unique_days, inverse = _sorted_unique(np.floor_divide(ts, 86400))
+    days = unique_days.tolist()
+    offsets = np.array([time.localtime(day * 86400).tm_gmtoff for day in days], dtype=np.float64)
+    point_offsets = offsets[inverse]
+    for i, day in enumerate(days):
+        if time.localtime(day * 86400 + 86399).tm_gmtoff != offsets[i]:
+            in_day = inverse == i
+            point_offsets[in_day] = [time.localtime(t).tm_gmtoff for t in ts[in_day].tolist()]
+    return ts + point_offsets
+
+
+def _local_datetime(seconds):
+    return _EPOCH + timedelta(seconds=int(seconds))
+
+
+def _count_pairs(keys, values, n_keys):
+    """每个 key 对应的不同 value 个数 (keys、values 为非负整数)"""
+    if not len(keys):
+        return np.zeros(n_keys, dtype=np.int64)
+    base = int(values.max()) + 1
+    pairs = np.sort(keys * base + values)
+    return np.bincount(_sorted_unique(pairs)[0] // base, minlength=n_keys)
+
+
+def compute_activity_stats(filtered_data, since=None, until=None, bin_minutes=5, idle_minutes=15,
+                           focus_minutes=45, top_directories=10, directory_depth=2, max_weeks=8, top_sessions=5):
+    """
+    统计 {source: RecordView 或 [{'timestamp', 'data'}]} 中的活动数据。
+    :param since, until: 报告窗口 (datetime)，用于判断首尾两周是否完整及"最近 7 天"的终点，默认取数据的首末时间
+    :param bin_minutes: 分箱时长，箱内有任意数据点即视为活跃
+    :param idle_minutes: 活跃分箱之间超过该间隔即视为新的时段
+    :param focus_minutes: 持续时间达到该值的时段计为专注时段
+    """
+    stats = ActivityStats()
+    sources, ts_parts, source_parts, directory_parts = [], [], [], []
+    directories = {}
+    for source, items in filtered_data.items():
+        ts, records = _column(items)
+        if not len(ts):
+            continue
+        ts_parts.append(ts)
+        source_parts.append(np.full(len(ts), len(sources), dtype=np.int64))
+        directory_parts.append(_directory_codes(source, records, directories))
+        sources.append(source)
+    if not sources:
+        return stats
+
+    ts = np.concatenate(ts_parts)
+    order = np.argsort(ts, kind='stable')
+    local = _local_seconds(ts[order])
+    source_codes = np.concatenate(source_parts)[order]
+    directory_codes = np.concatenate(directory_parts)[order]
+
+    bin_seconds = bin_minutes * 60
+    bin_hours = bin_seconds / 3600
+    bins = np.floor_divide(local, bin_seconds).astype(np.int64)
+    days = np.floor_divide(local, 86400).astype(np.int64)
+    stats.total = int(len(ts))
+    stats.source_events = {source: int(count) for source, count in
+                           zip(sources, np.bincount(source_codes, minlength=len(sources)))}
+    source_bins = _count_pairs(source_codes, bins - bins[0], len(sources))
+    stats.source_hours = {source: float(count * bin_hours) for source, count in zip(sources, source_bins)}
+
+    # --- 活跃时长：有任意数据点的分箱 ---
+    active = _sorted_unique(bins)[0]
+    active_seconds = active * bin_seconds
+    active_days = active_seconds // 86400
+    stats.active_hours = float(len(active) * bin_hours)
+    stats.active_days = int(len(_sorted_unique(active_days)[0]))
+    stats.hour_of_day = (np.bincount((active_seconds % 86400) // 3600, minlength=24) * bin_hours).tolist()
+    stats.weekday_hours = (np.bincount((active_days + _WEEK_OFFSET) % 7, minlength=7) * bin_hours).tolist()
+
+    # --- 时段：相邻活跃分箱间隔不超过 idle_minutes 的连续活动 ---
+    gap_bins = max(1, int(np.ceil(idle_minutes * 60 / bin_seconds)))
+    breaks = np.flatnonzero(np.diff(active) > gap_bins)
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [len(active) - 1]))
+    session_start = active[starts] * bin_seconds
+    session_end = (active[ends] + 1) * bin_seconds
+    durations = session_end - session_start
+    focus = durations >= focus_minutes * 60
+    session_ids = np.searchsorted(active[starts], bins, side='right') - 1
+    session_events = np.bincount(session_ids, minlength=len(starts))
+    stats.session_count = int(len(starts))
+    stats.focus_count = int(focus.sum())
+    stats.focus_hours = float(durations[focus].sum() / 3600)
+    stats.median_session_hours = float(np.median(durations) / 3600)
+
+    labels, label_of = _directory_labels(directories, directory_depth) if directories else ([], None)
+    has_directory = directory_codes >= 0
+    label_codes = label_of[directory_codes[has_directory]] if labels else np.zeros(0, dtype=np.int64)
+
+    for i in np.argsort(-durations, kind='stable')[:top_sessions]:
+        in_session = has_directory & (session_ids == i)
+        top_directory = None
+        if labels and in_session.any():
+            top_directory = labels[int(np.bincount(label_of[directory_codes[in_session]]).argmax())]
+        stats.longest_sessions.append(FocusSession(
+            _local_datetime(session_start[i]), _local_datetime(session_end[i]),
+            float((ends[i] - starts[i] + 1) * bin_hours), int(session_events[i]), top_directory))
+
+    # --- 目录：变更量 (数据点数)、活跃时长、活跃天数、最近 7 天与之前 7 天的对比 ---
+    end_seconds = _local_seconds(np.array([until.timestamp()]))[0] if until else local[-1]
+    start_seconds = _local_seconds(np.array([since.timestamp()]))[0] if since else local[0]
+    stats.recent_window = end_seconds - start_seconds >= 14 * 86400
+    if labels:
+        directory_bins = bins[has_directory]
+        directory_local = local[has_directory]
+        events = np.bincount(label_codes, minlength=len(labels))
+        hours = _count_pairs(label_codes, directory_bins - bins[0], len(labels)) * bin_hours
+        active_day_counts = _count_pairs(label_codes, days[has_directory] - days[0], len(labels))
+        recent_mask = directory_local >= end_seconds - 7 * 86400
+        previous_mask = ~recent_mask & (directory_local >= end_seconds - 14 * 86400)
+        recent = np.bincount(label_codes[recent_mask], minlength=len(labels))
+        previous = np.bincount(label_codes[previous_mask], minlength=len(labels))
+        total_events = max(int(events.sum()), 1)
+        for i in np.argsort(-events, kind='stable')[:top_directories]:
+            stats.directories.append({
+                'directory': labels[i], 'events': int(events[i]), 'share': float(events[i] / total_events),
+                'hours': float(hours[i]), 'days': int(active_day_counts[i]),
+                'recent': int(recent[i]), 'previous': int(previous[i]),
+            })
+
+    # --- 逐周趋势 (以星期一为一周开始)：最近 max_weeks 周 ---
+    weeks = (days + _WEEK_OFFSET) // 7
+    first_week = int((start_seconds // 86400 + _WEEK_OFFSET) // 7)
+    last_week = int((end_seconds // 86400 + _WEEK_OFFSET) // 7)
+    if last_week > first_week:
+        week0 = max(first_week, last_week - max_weeks + 1)
+        n_weeks = last_week - week0 + 1
+        in_range = weeks >= week0
+        week_events = np.bincount(weeks[in_range] - week0, minlength=n_weeks)
+        week_sources = np.bincount((weeks[in_range] - week0) * len(sources) + source_codes[in_range],
+                                   minlength=n_weeks * len(sources)).reshape(n_weeks, len(sources))
+        active_weeks = (active_days + _WEEK_OFFSET) // 7 - week0
+        week_active = np.bincount(active_weeks[active_weeks >= 0], minlength=n_weeks) * bin_hours
+        session_weeks = (session_start // 86400 + _WEEK_OFFSET) // 7 - week0
+        valid = session_weeks >= 0
+        week_sessions = np.bincount(session_weeks[valid], minlength=n_weeks)
+        week_focus = np.bincount(session_weeks[valid & focus], weights=durations[valid & focus] / 3600,
+                                 minlength=n_weeks)
+        for w in range(n_weeks):
+            week_start = ((week0 + w) * 7 - _WEEK_OFFSET) * 86400
+            stats.weeks.append({
+                'start': _local_datetime(week_start).date(),
+                'partial': week_start < start_seconds or week_start + 7 * 86400 > end_seconds,
+                'events': int(week_events[w]), 'active_hours': float(week_active[w]),
+                'focus_hours': float(week_focus[w]), 'sessions': int(week_sessions[w]),
+                'sources': {source: int(count) for source, count in zip(sources, week_sources[w])},
+            })
+    return stats
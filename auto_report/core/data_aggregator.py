@@ -1,42 +1,90 @@
 # src/core/data_aggregator.py
 import logging
-from collections import defaultdict
+import weakref
+import threading
 from datetime import datetime
+from core import metrics
+from core.records import SourceColumn, RecordView, pack_record
 
 logger = logging.getLogger(__name__)
 
+DATA_POINTS_ADDED = metrics.counter('autoreport_data_points_added', "Data points added to the aggregator", ['source'])
+STORE_SIZE = metrics.gauge('autoreport_data_store_size', "Data points currently held per source (all aggregators)",
+                           ['source'])
+
+# 存活的聚合器：多租户时每个租户一个，存量指标在抓取时对所有聚合器求和，而不是由最后写入的租户覆盖
+_AGGREGATORS = weakref.WeakSet()
+
+
+def _store_size(source):
+    return sum(len(aggregator.data_store.get(source, ())) for aggregator in list(_AGGREGATORS))
+
+
 class DataAggregator:
-    """数据聚合中心，收集来自不同Agent的数据"""
+    """
+    数据聚合中心，收集来自不同Agent的数据。
+    每个来源按时间排序存储为紧凑的列式结构 (见 core.records)，
+    对外仍以 {'timestamp': iso, 'data': {...}} 的形式按需生成字典。
+    """
     def __init__(self):
-        self.data_store = defaultdict(list) # 使用列表存储历史数据
+        self.data_store = {} # {source: SourceColumn}
+        self._lock = threading.Lock()
+        self._listeners = [] # 新数据点的监听器 (如全文索引)
+        _AGGREGATORS.add(self)
 
-    def add_data(self, source, data_point):
-        """添加数据点"""
-        timestamp = datetime.now().isoformat()
-        self.data_store[source].append({'timestamp': timestamp, 'data': data_point})
-        logger.debug(f"Data added from {source}: {str(data_point)[:100]}...") # 打印前100字符
+    def add_listener(self, listener):
+        """注册监听器，每次 add_data 后以 listener(source, data_point, ts) 调用 (ts 为浮点时间戳)"""
+        self._listeners.append(listener)
+
+    def add_data(self, source, data_point, timestamp=None, notify=True):
+        """
+        添加数据点 (timestamp 默认为当前时间，导入历史数据时可传入 datetime)。
+        notify=False 时不通知监听器，用于重放监听器已经处理过的数据 (如持久化索引中已有的数据)。
+        """
+        ts = (timestamp or datetime.now()).timestamp()
+        record = pack_record(source, data_point)
+        with self._lock:
+            column = self.data_store.get(source)
+            if column is None:
+                column = self.data_store[source] = SourceColumn()
+                STORE_SIZE.labels(source).set_function(lambda: _store_size(source))
+            column.append(ts, record)
+        DATA_POINTS_ADDED.labels(source).inc()
+        for listener in (self._listeners if notify else ()):
+            try:
+                listener(source, data_point, ts)
+            except Exception as e:
+                logger.error(f"Error in data listener {listener}: {e}")
+        logger.debug("Data added from %s: %.100s...", source, data_point) # 打印前100字符；未开启DEBUG时不做格式化
+
+    def _view(self, source, since_datetime=None, until_datetime=None, data_only=False):
+        column = self.data_store.get(source)
+        if column is None:
+            return RecordView([], [], data_only)
+        since = since_datetime.timestamp() if since_datetime else None
+        until = until_datetime.timestamp() if until_datetime else None
+        with self._lock:
+            timestamps, records = column.range(since, until)
+        return RecordView(timestamps, records, data_only)
 
     def get_data_since(self, source, since_datetime):
         """获取自某个时间点以来的特定来源数据"""
-        filtered_data = []
-        for item in self.data_store.get(source, []):
-            if datetime.fromisoformat(item['timestamp']) >= since_datetime:
-                filtered_data.append(item['data'])
-        return filtered_data
+        return list(self._view(source, since_datetime, data_only=True))
 
     def get_all_data(self):
-        """获取所有数据 (用于报告生成) - 保持不变"""
-        return dict(self.data_store) # 返回副本
+        """获取所有数据 (用于报告生成) - 返回各来源的只读视图"""
+        return {source: self._view(source) for source in list(self.data_store)}
 
     # --- 新增方法：获取原始存储数据，包含时间戳 ---
-    def get_raw_data_since(self, since_datetime):
+    def get_raw_data_since(self, since_datetime, until_datetime=None):
         """
         获取自某个时间点以来的所有原始数据（包含时间戳）。
         这对于 AnalyzerAgent 进行时间范围内的统一分析非常有用。
+        返回 {source: RecordView}，视图中的元素为 {'timestamp', 'data'} 字典，访问时才生成。
         """
-        filtered_data = defaultdict(list)
-        for source, data_points in self.data_store.items():
-            for item in data_points:
-                if datetime.fromisoformat(item['timestamp']) >= since_datetime:
-                    filtered_data[source].append(item) # 包含 {'timestamp', 'data'}
-        return dict(filtered_data)
+        filtered_data = {}
+        for source in list(self.data_store):
+            view = self._view(source, since_datetime, until_datetime)
+            if len(view):
+                filtered_data[source] = view
+        return filtered_data
@@ -0,0 +1,395 @@
+# src/core/ingest.py
+"""
+采集端 → 中心节点的批量数据接入协议。
+采集端 (core.remote_aggregator.RemoteAggregator) 把数据点攒成批次，gzip 压缩后 POST 到中心节点的 /ingest：
+
+    {"collector_id": "alice", "seq": 42, "points": [[source, ts, data_point], ...]}
+
+seq 为每个采集端严格递增的批次序号，采集端收到确认前会重发同一批次。
+中心节点为每个采集端记录已接收的最大序号 (高水位)，序号不大于高水位的批次直接确认而不重复写入，
+因此重发是幂等的。接收的批次追加写入按采集端划分的日志文件，重启时重放以恢复数据和高水位。
+
+日志按段轮转：<journal_dir>/<collector_id>.jsonl 为当前段，超过 segment_bytes 或 segment_hours 后
+移入 <journal_dir>/<collector_id>/<最后序号>.jsonl，轮转前把高水位写入 high_watermarks.json；
+最后写入时间早于 retention_days 的旧段被删除，重放时也只载入保留期内的数据点。
+"""
+import os
+import re
+import gzip
+import json
+import hmac
+import time
+import zlib
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+INGEST_BATCHES = metrics.counter('autoreport_ingest_batches', "Batches received from collectors", ['result'])
+INGEST_POINTS = metrics.counter('autoreport_ingest_points', "Data points ingested from collectors")
+INGEST_BYTES = metrics.counter('autoreport_ingest_bytes', "Compressed bytes received from collectors")
+
+MAX_BATCH_BYTES = 64 * 1024 * 1024  # 单个请求体上限 (压缩后)
+MAX_DECODED_BYTES = 256 * 1024 * 1024  # 单个批次解压后的上限，防止高压缩比的请求耗尽内存
+_COLLECTOR_ID_RE = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_.-]*$')  # 同时用作日志文件名
+
+
+def encode_batch(collector_id, seq, points):
+    """编码一个批次：points 为 [(source, ts, data_point)]，ts 为浮点时间戳"""
+    payload = {'collector_id': collector_id, 'seq': seq, 'points': [list(point) for point in points]}
+    return gzip.compress(json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8'), compresslevel=6)
+
+
+class BatchTooLarge(ValueError):
+    """批次解压后超出大小上限"""
+
+
+def decode_batch(body, max_bytes=None):
+    """解码批次，格式不正确时抛出 ValueError，解压后超过 max_bytes (默认 MAX_DECODED_BYTES) 时抛出 BatchTooLarge"""
+    max_bytes = max_bytes or MAX_DECODED_BYTES
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)  # 只接受 gzip 格式
+    try:
+        data = decompressor.decompress(body, max_bytes + 1)
+        if len(data) > max_bytes:
+            raise BatchTooLarge(f"batch exceeds {max_bytes} bytes when decompressed")
+        if not decompressor.eof:
+            raise ValueError("invalid batch encoding: truncated gzip stream")
+        payload = json.loads(data)
+    except (zlib.error, UnicodeDecodeError) as e:
+        raise ValueError(f"invalid batch encoding: {e}")
+    if not isinstance(payload, dict) or not isinstance(payload.get('collector_id'), str) \
+            or not isinstance(payload.get('seq'), int) or not isinstance(payload.get('points'), list):
+        raise ValueError("batch must contain collector_id, seq and points")
+    if not _COLLECTOR_ID_RE.match(payload['collector_id']):
+        raise ValueError(f"invalid collector_id '{payload['collector_id']}'")
+    for point in payload['points']:
+        if not isinstance(point, list) or len(point) != 3 or not isinstance(point[0], str) \
+                or not isinstance(point[1], (int, float)):
+            raise ValueError("each point must be [source, ts, data_point]")
+    return payload
+
+
+class IngestStore:
+    """
+    中心节点的接入存储：按采集端加锁，校验序号后写日志并写入对应的 DataAggregator。
+    resolve(collector_id) 返回该采集端数据应写入的 DataAggregator，未知采集端返回 None。
+    """
+
+    def __init__(self, resolve, journal_dir='./data/ingest', fsync=False, segment_bytes=64 * 1024 * 1024,
+                 segment_hours=24, retention_days=400):
+        self.resolve = resolve
+        self.journal_dir = journal_dir
+        self.fsync = fsync
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_hours * 3600
+        self.retention_seconds = retention_days * 86400 if retention_days else None  # None 表示永久保留
+        self.state_file = os.path.join(journal_dir, 'high_watermarks.json')
+        self._lock = threading.Lock()
+        self._collector_locks = {}
+        self._high_watermarks = self._load_high_watermarks()  # {collector_id: 最大已接收序号}
+        self._segment_started = {}  # {collector_id: 当前段首次写入的时间}
+        self._repaired = set()  # 本次运行中已检查过末尾的当前段
+        os.makedirs(journal_dir, exist_ok=True)
+
+    def _collector_lock(self, collector_id):
+        with self._lock:
+            lock = self._collector_locks.get(collector_id)
+            if lock is None:
+                lock = self._collector_locks[collector_id] = threading.Lock()
+            return lock
+
+    def _journal_path(self, collector_id):
+        return os.path.join(self.journal_dir, f"{collector_id}.jsonl")
+
+    def _segment_dir(self, collector_id):
+        return os.path.join(self.journal_dir, collector_id)
+
+    def _segments(self, collector_id):
+        """已轮转的旧段，按序号排序"""
+        segment_dir = self._segment_dir(collector_id)
+        if not os.path.isdir(segment_dir):
+            return []
+        return sorted(os.path.join(segment_dir, name) for name in os.listdir(segment_dir) if name.endswith('.jsonl'))
+
+    def _load_high_watermarks(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return {collector_id: int(seq) for collector_id, seq in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, AttributeError) as e:
+            logger.error(f"Error loading ingest high watermarks from {self.state_file}: {e}")
+            return {}
+
+    def _save_high_watermarks(self):
+        with self._lock:
+            high_watermarks = dict(self._high_watermarks)
+        tmp_path = self.state_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(high_watermarks, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_file)
+
+    def _rotate(self, collector_id, seq):
+        """当前段移入旧段目录 (调用方持有该采集端的锁)，并删除超出保留期的旧段"""
+        # 先持久化高水位：之后即使旧段被删除，重发的批次仍能识别为重复
+        self._save_high_watermarks()
+        os.makedirs(self._segment_dir(collector_id), exist_ok=True)
+        os.replace(self._journal_path(collector_id), os.path.join(self._segment_dir(collector_id), f"{seq:016d}.jsonl"))
+        self._segment_started.pop(collector_id, None)
+        self._prune(collector_id)
+
+    def _repair_journal(self, collector_id):
+        """
+        把当前段截断到最后一个换行符 (调用方持有该采集端的锁或尚未开始接收)。
+        崩溃时写了一半的最后一行若留在文件中，下一个批次会接在它后面，两者合成一行无法解析的记录。
+        """
+        self._repaired.add(collector_id)
+        path = self._journal_path(collector_id)
+        try:
+            f = open(path, 'rb+')
+        except FileNotFoundError:
+            return
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 65536)
+                f.seek(start)
+                chunk = f.read(position - start)
+                if position == end and chunk.endswith(b'\n'):
+                    return
+                newline = chunk.rfind(b'\n')
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position == end:
+                return
+            f.truncate(position)
+        logger.warning(f"Truncated {end - position} bytes of an incomplete record at the end of {path}")
+
+    def _prune(self, collector_id):
+        if self.retention_seconds is None:
+            return
+        cutoff = time.time() - self.retention_seconds
+        for path in self._segments(collector_id):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    logger.info(f"Removed ingest journal segment {path} past retention.")
+            except OSError as e:
+                logger.error(f"Error removing ingest journal segment {path}: {e}")
+
+    @staticmethod
+    def _apply(aggregator, points, notify=True):
+        for source, ts, data_point in points:
+            aggregator.add_data(source, data_point, timestamp=datetime.fromtimestamp(ts), notify=notify)
+
+    def high_watermark(self, collector_id):
+        return self._high_watermarks.get(collector_id, 0)
+
+    def ingest(self, collector_id, seq, points):
+        """
+        接收一个批次，返回 (是否为重复批次, 当前高水位)。
+        未知采集端抛出 LookupError。
+        """
+        aggregator = self.resolve(collector_id)
+        if aggregator is None:
+            raise LookupError(f"unknown collector '{collector_id}'")
+        with self._collector_lock(collector_id):
+            high_watermark = self._high_watermarks.get(collector_id, 0)
+            if seq <= high_watermark:
+                return True, high_watermark
+            if collector_id not in self._repaired:
+                self._repair_journal(collector_id)
+            # 先写日志再写内存：确认过的批次在中心节点重启后一定能恢复
+            line = json.dumps({'seq': seq, 'points': points}, ensure_ascii=False, default=str)
+            with open(self._journal_path(collector_id), 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+                segment_size = f.tell()
+            with self._lock:
+                self._high_watermarks[collector_id] = seq
+            self._apply(aggregator, points)
+            now = time.time()
+            started = self._segment_started.setdefault(collector_id, now)
+            if segment_size >= self.segment_bytes or now - started >= self.segment_seconds:
+                try:
+                    self._rotate(collector_id, seq)
+                except OSError as e:
+                    # 批次已写入当前段，轮转失败不影响确认，下一个批次再试
+                    logger.error(f"Error rotating ingest journal for {collector_id}: {e}")
+        return False, seq
+
+    def iter_journal(self, collector_id, since_ts=None):
+        """
+        按写入顺序遍历某个采集端日志中的批次 (seq, points)，跳过无法解析的行 (如崩溃时写了一半的最后一行)。
+        since_ts 不为空时跳过最后写入时间早于它的旧段 (其中数据点的时间不会晚于写入时间)。
+        """
+        paths = self._segments(collector_id) + [self._journal_path(collector_id)]
+        for path in paths:
+            try:
+                if since_ts is not None and os.path.getmtime(path) < since_ts:
+                    continue
+                f = open(path, 'r', encoding='utf-8')
+            except FileNotFoundError:
+                continue
+            with f:
+                for line_number, line in enumerate(f, 1):
+                    try:
+                        batch = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping corrupt journal line {line_number} in {path}")
+                        continue
+                    yield batch['seq'], batch['points']
+
+    def collectors(self):
+        """日志目录中已有数据的采集端ID"""
+        collectors = set()
+        for name in os.listdir(self.journal_dir):
+            if name.endswith('.jsonl'):
+                collectors.add(name[:-len('.jsonl')])
+            elif _COLLECTOR_ID_RE.match(name) and os.path.isdir(os.path.join(self.journal_dir, name)):
+                collectors.add(name)
+        return sorted(collectors)
+
+    def replay(self, notify=False):
+        """
+        启动时重放保留期内的日志，恢复各采集端的数据与高水位。
+        重放前先截掉当前段末尾不完整的记录，之后追加的批次从新的一行开始。
+        默认不通知聚合器的监听器：持久化的全文索引在上次运行时已经收录过这些数据。
+        """
+        total = 0
+        cutoff = time.time() - self.retention_seconds if self.retention_seconds else None
+        for collector_id in self.collectors():
+            aggregator = self.resolve(collector_id)
+            if aggregator is None:
+                logger.warning(f"Journal for unknown collector '{collector_id}' not replayed.")
+                continue
+            with self._collector_lock(collector_id):
+                self._repair_journal(collector_id)
+            self._prune(collector_id)
+            last_seq = 0
+            for seq, points in self.iter_journal(collector_id, since_ts=cutoff):
+                if seq <= last_seq:
+                    continue
+                last_seq = seq
+                if cutoff is not None:
+                    points = [point for point in points if point[1] >= cutoff]
+                self._apply(aggregator, points, notify)
+                total += len(points)
+            self._high_watermarks[collector_id] = max(self._high_watermarks.get(collector_id, 0), last_seq)
+        logger.info(f"Replayed {total} ingested data points from {self.journal_dir}.")
+        return total
+
+
+class _IngestHandler(BaseHTTPRequestHandler):
+    store = None
+    token = None
+    timeout = 60  # 读取请求的超时 (秒)，避免慢客户端长期占用工作线程
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.split('?', 1)[0] != '/ingest':
+            self.send_error(404)
+            return
+        if self.token and not hmac.compare_digest(self.headers.get('Authorization', '').encode('utf-8'),
+                                                 f"Bearer {self.token}".encode('utf-8')):
+            INGEST_BATCHES.labels('unauthorized').inc()
+            self._reply(401, {'error': 'unauthorized'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > MAX_BATCH_BYTES:
+            self._reply(413 if length > 0 else 400, {'error': 'invalid content length'})
+            return
+        body = self.rfile.read(length)
+        INGEST_BYTES.inc(length)
+        try:
+            batch = decode_batch(body)
+            duplicate, high_watermark = self.store.ingest(batch['collector_id'], batch['seq'], batch['points'])
+        except BatchTooLarge as e:
+            INGEST_BATCHES.labels('too_large').inc()
+            self._reply(413, {'error': str(e)})
+            return
+        except ValueError as e:
+            INGEST_BATCHES.labels('invalid').inc()
+            self._reply(400, {'error': str(e)})
+            return
+        except LookupError as e:
+            INGEST_BATCHES.labels('rejected').inc()
+            self._reply(403, {'error': str(e)})
+            return
+        except OSError as e:
+            logger.error(f"Error writing ingest journal: {e}")
+            self._reply(503, {'error': 'journal unavailable'})
+            return
+        if duplicate:
+            INGEST_BATCHES.labels('duplicate').inc()
+        else:
+            INGEST_BATCHES.labels('accepted').inc()
+            INGEST_POINTS.inc(len(batch['points']))
+        self._reply(200, {'accepted': 0 if duplicate else len(batch['points']), 'duplicate': duplicate,
+                          'high_watermark': high_watermark})
+
+    def log_message(self, format, *args):
+        logger.debug("Ingest request from %s: " + format, self.client_address[0], *args)
+
+
+class _PooledHTTPServer(HTTPServer):
+    """
+    由固定大小的线程池处理请求 (ThreadingHTTPServer 每个请求新建一个线程)。
+    处理中与排队的请求总数达到上限后，接受循环暂停，新连接留在监听队列中，形成背压。
+    """
+
+    def __init__(self, server_address, handler_class, workers=4, max_pending=None):
+        super().__init__(server_address, handler_class)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest-worker')
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 2)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            self._pool.submit(self._process_request, request, client_address)
+        except RuntimeError:  # 线程池已关闭
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+
+def start_ingest_server(config, store):
+    """在后台线程中启动 /ingest HTTP 端点，返回 server"""
+    host = config.get('host', '127.0.0.1')
+    port = config.get('port', 9110)
+    handler = type('IngestHandler', (_IngestHandler,), {'store': store, 'token': config.get('token') or None})
+    server = _PooledHTTPServer((host, port), handler, config.get('workers', 4), config.get('max_pending'))
+    threading.Thread(target=server.serve_forever, name='ingest-server', daemon=True).start()
+    logger.info(f"Ingest endpoint listening on http://{host}:{server.server_port}/ingest")
+    return server
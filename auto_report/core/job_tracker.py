@@ -0,0 +1,209 @@
+# src/core/job_tracker.py
+import os
+import json
+import time
+import logging
+import functools
+import threading
+from datetime import datetime
+
+from apscheduler.events import (
+    EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
+)
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from core import metrics
+from core.scheduler import OffsetTrigger
+
+logger = logging.getLogger(__name__)
+
+JOB_LAG = metrics.histogram('autoreport_job_lag_seconds', "Delay between a job's scheduled and submitted time", ['job'])
+JOB_DURATION = metrics.histogram('autoreport_job_duration_seconds', "Job run time", ['job'])
+JOB_SKIPPED = metrics.counter('autoreport_job_skipped', "Job runs skipped because the previous run was still active", ['job'])
+JOB_MISSED = metrics.counter('autoreport_job_missed', "Job runs missed beyond misfire_grace_time", ['job'])
+
+CATCH_UP_SUFFIX = '_catch_up'
+
+
+class JobTracker:
+    """
+    调度任务运行状态跟踪器。
+    记录每个任务的运行次数、耗时、延迟、失败/错过/重叠跳过次数，并持久化到磁盘，
+    以便重启后补跑停机期间错过的定时任务。
+    统计只在内存中更新，每 save_interval 秒 (有变化时) 写一次状态文件；
+    定时报告任务 (cron) 的 last_scheduled_run 决定重启后是否补跑，变化时立即写入。
+    """
+
+    def __init__(self, state_file, save_interval=60):
+        self.state_file = state_file
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._state = self._load()  # {job_id: {...}}
+        self._dirty = False
+        self._cron_jobs = set()  # 需要立即持久化 last_scheduled_run 的任务ID
+        self._stop_event = threading.Event()
+        self._thread = None
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading job state from {self.state_file}: {e}")
+            return {}
+
+    def _save(self):
+        """写入状态文件，调用方需持有 self._lock"""
+        self._dirty = False
+        tmp_path = self.state_file + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except OSError as e:
+            logger.error(f"Error saving job state to {self.state_file}: {e}")
+
+    @staticmethod
+    def _base_id(job_id):
+        # 补跑任务的统计归入原任务
+        if job_id.endswith(CATCH_UP_SUFFIX):
+            return job_id[:-len(CATCH_UP_SUFFIX)]
+        return job_id
+
+    def _entry(self, job_id):
+        return self._state.setdefault(self._base_id(job_id), {
+            "runs": 0, "failures": 0, "missed": 0, "skipped_overlap": 0,
+            "total_duration": 0.0, "max_duration": 0.0, "last_duration": None,
+            "last_lag": None, "last_start": None, "last_scheduled_run": None, "last_error": None,
+        })
+
+    def get_stats(self):
+        """返回所有任务的运行统计副本"""
+        with self._lock:
+            stats = {}
+            for job_id, entry in self._state.items():
+                stats[job_id] = dict(entry)
+                runs = entry.get('runs', 0)
+                stats[job_id]['avg_duration'] = entry.get('total_duration', 0.0) / runs if runs else None
+            return stats
+
+    def wrap(self, job_id, func):
+        """包装任务函数以记录每次运行的耗时"""
+        if getattr(func, '_tracked_job_id', None) is not None:
+            return func
+
+        duration_metric = JOB_DURATION.labels(job_id)
+
+        @functools.wraps(func)
+        def tracked(*args, **kwargs):
+            start = time.perf_counter()
+            with self._lock:
+                self._entry(job_id)['last_start'] = datetime.now().isoformat()
+                self._dirty = True
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                duration_metric.observe(duration)
+                with self._lock:
+                    entry = self._entry(job_id)
+                    entry['last_duration'] = duration
+                    entry['total_duration'] = entry.get('total_duration', 0.0) + duration
+                    entry['max_duration'] = max(entry.get('max_duration', 0.0), duration)
+                    self._dirty = True
+
+        tracked._tracked_job_id = job_id
+        return tracked
+
+    def _on_event(self, event):
+        with self._lock:
+            entry = self._entry(event.job_id)
+            if event.code == EVENT_JOB_SUBMITTED:
+                lag = (datetime.now(event.scheduled_run_times[0].tzinfo) - event.scheduled_run_times[0]).total_seconds()
+                entry['last_lag'] = lag
+                self._dirty = True
+                JOB_LAG.labels(event.job_id).observe(lag)
+                return
+            if event.code == EVENT_JOB_MAX_INSTANCES:
+                entry['skipped_overlap'] = entry.get('skipped_overlap', 0) + 1
+                JOB_SKIPPED.labels(event.job_id).inc()
+                logger.warning(f"Job {event.job_id} is still running, skipped overlapping run.")
+            elif event.code == EVENT_JOB_MISSED:
+                entry['missed'] = entry.get('missed', 0) + 1
+                JOB_MISSED.labels(event.job_id).inc()
+                logger.warning(f"Job {event.job_id} missed its run time {event.scheduled_run_time}.")
+            else:
+                entry['runs'] = entry.get('runs', 0) + 1
+                entry['last_scheduled_run'] = event.scheduled_run_time.isoformat()
+                if event.code == EVENT_JOB_ERROR:
+                    entry['failures'] = entry.get('failures', 0) + 1
+                    entry['last_error'] = str(event.exception)
+                if self._base_id(event.job_id) in self._cron_jobs:
+                    # 补跑依据：立即落盘，避免重启后重复补跑已完成的报告
+                    self._save()
+                    return
+            self._dirty = True
+
+    def flush(self):
+        """有未保存的变化时写入状态文件"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _run(self):
+        while not self._stop_event.wait(self.save_interval):
+            self.flush()
+
+    def stop(self):
+        """停止定时保存并写入最终状态"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+
+    def attach(self, scheduler, catch_up_grace=0):
+        """为调度器中已添加的所有任务启用跟踪，并补跑重启前错过的定时任务"""
+        for job in scheduler.get_jobs():
+            job.modify(func=self.wrap(job.id, job.func))
+            if isinstance(job.trigger, (CronTrigger, OffsetTrigger)):
+                self._cron_jobs.add(job.id)
+        scheduler.add_listener(
+            self._on_event,
+            EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES
+        )
+        if catch_up_grace > 0:
+            self._catch_up(scheduler, catch_up_grace)
+        if self.save_interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='job-tracker', daemon=True)
+            self._thread.start()
+
+    def _catch_up(self, scheduler, grace):
+        with self._lock:
+            for job in scheduler.get_jobs():
+                if not isinstance(job.trigger, (CronTrigger, OffsetTrigger)):
+                    continue
+                entry = self._entry(job.id)
+                now = datetime.now(job.trigger.timezone)
+                last_run = entry.get('last_scheduled_run') or entry.get('registered_at')
+                if not last_run:
+                    # 首次注册时记录基准时间，之后的停机期间可据此判断是否错过
+                    entry['registered_at'] = now.isoformat()
+                    continue
+
+                missed_at = job.trigger.get_next_fire_time(datetime.fromisoformat(last_run), now)
+                if missed_at is None or missed_at >= now:
+                    continue
+                if (now - missed_at).total_seconds() > grace:
+                    logger.warning(f"Job {job.id} missed run at {missed_at}, beyond catch-up grace, not replaying.")
+                    continue
+
+                logger.info(f"Job {job.id} missed run at {missed_at} while stopped, scheduling catch-up run.")
+                scheduler.add_job(
+                    job.func, DateTrigger(run_date=now), id=f"{job.id}{CATCH_UP_SUFFIX}",
+                    args=job.args, kwargs=job.kwargs, executor=job.executor,
+                    misfire_grace_time=None, replace_existing=True
+                )
+            self._save()
@@ -0,0 +1,76 @@
+# src/core/llm_client.py
+import time
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+LLM_IN_FLIGHT = metrics.gauge('autoreport_llm_in_flight', "LLM requests currently in flight")
+LLM_QUEUE_WAIT = metrics.histogram('autoreport_llm_queue_wait_seconds',
+                                   "Time spent waiting for an LLM concurrency/rate-limit slot")
+
+
+class LLMClient:
+    """
+    多个 AnalyzerAgent 共享的大模型 HTTP 客户端。
+    复用 HTTP 连接池，并对所有调用方施加全局并发上限 (max_concurrency) 与速率上限 (requests_per_minute，令牌桶)，
+    避免多租户同时生成报告时压垮大模型服务或触发限流。
+    """
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.max_concurrency = config.get('max_concurrency', 4)
+        self.requests_per_minute = config.get('requests_per_minute', 0)  # 0 表示不限速
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._in_flight = 0
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_concurrency)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+        self._bucket_lock = threading.Lock()
+        self._tokens = float(self.requests_per_minute or 0)
+        self._refilled_at = time.monotonic()
+        logger.info(f"LLMClient initialized: max_concurrency={self.max_concurrency}, "
+                    f"requests_per_minute={self.requests_per_minute or 'unlimited'}")
+
+    def _acquire_rate(self):
+        """令牌桶：桶容量为每分钟请求数，按时间匀速补充，取不到令牌时等待"""
+        if not self.requests_per_minute:
+            return
+        rate = self.requests_per_minute / 60.0
+        while True:
+            with self._bucket_lock:
+                now = time.monotonic()
+                self._tokens = min(self.requests_per_minute, self._tokens + (now - self._refilled_at) * rate)
+                self._refilled_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / rate
+            time.sleep(wait)
+
+    def post(self, url, **kwargs):
+        """与 requests.post 参数一致，在拿到并发槽位和速率令牌后发出请求"""
+        wait_start = time.perf_counter()
+        with self._slots:
+            self._acquire_rate()
+            LLM_QUEUE_WAIT.observe(time.perf_counter() - wait_start)
+            self._track(1)
+            try:
+                return self._session.post(url, **kwargs)
+            finally:
+                self._track(-1)
+
+    def _track(self, delta):
+        with self._bucket_lock:
+            self._in_flight += delta
+            LLM_IN_FLIGHT.set(self._in_flight)
+
+    def close(self):
+        self._session.close()
@@ -0,0 +1,251 @@
+# src/core/mail_outbox.py
+import os
+import json
+import time
+import uuid
+import smtplib
+import logging
+import mimetypes
+import threading
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from datetime import datetime
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+SMTP_SEND_TIME = metrics.histogram('autoreport_smtp_send_seconds', "Time to hand one message to the SMTP server")
+EMAILS_SENT = metrics.counter('autoreport_emails_sent', "Emails delivered to the SMTP server")
+EMAIL_FAILURES = metrics.counter('autoreport_email_failures', "Failed email delivery attempts")
+OUTBOX_PENDING = metrics.gauge('autoreport_outbox_pending', "Emails waiting in the outbox")
+
+
+def account_key(email_config):
+    """根据SMTP配置生成稳定的账户标识 (重启后不变，且不包含密码)"""
+    return f"{email_config.get('sender_email')}@{email_config.get('smtp_server')}:{email_config.get('smtp_port')}"
+
+
+class EmailOutbox:
+    """
+    持久化邮件发件箱。
+    报告任务只负责把邮件写入磁盘队列，后台线程负责发送：
+    复用已认证的SMTP连接、失败按指数退避重试、超过重试次数后移入 failed 目录。
+    """
+
+    def __init__(self, config):
+        self.outbox_dir = config.get('outbox_dir', './data/outbox')
+        self.failed_dir = os.path.join(self.outbox_dir, 'failed')
+        self.max_retries = config.get('max_retries', 5)
+        self.retry_backoff = config.get('retry_backoff', 30)  # 首次重试间隔 (秒)，之后指数递增
+        self.max_backoff = config.get('max_backoff', 3600)
+        self.idle_timeout = config.get('smtp_idle_timeout', 60)  # 空闲多久后关闭SMTP连接 (秒)
+        self.poll_interval = config.get('poll_interval', 5)
+        os.makedirs(self.failed_dir, exist_ok=True)
+
+        self._accounts = {}  # {account_key: email_config} 仅保存在内存中，密码不落盘
+        self._sessions = {}  # {account_key: [smtp, last_used]}
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        OUTBOX_PENDING.set_function(self.pending_count)
+        logger.info(f"EmailOutbox initialized. Outbox dir: {self.outbox_dir}")
+
+    def register_account(self, email_config):
+        """注册发件账户，返回账户标识"""
+        key = account_key(email_config)
+        self._accounts[key] = email_config
+        self._wakeup.set()  # 可能有重启前遗留的该账户邮件
+        return key
+
+    def enqueue(self, account, recipients, subject, body, attachments=None):
+        """将邮件写入发件箱，立即返回；实际发送由后台线程完成"""
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        sender_email = self._accounts.get(account, {}).get('sender_email')
+        message = {
+            "id": uuid.uuid4().hex,
+            "account": account,
+            "sender": sender_email,
+            "recipients": list(recipients),
+            "subject": subject,
+            "body": body,
+            "attachments": [os.path.abspath(p) for p in (attachments or [])],
+            "created_at": datetime.now().isoformat(),
+            "attempts": 0,
+            "next_attempt": 0,
+            "last_error": None,
+        }
+        path = os.path.join(self.outbox_dir, f"{int(time.time() * 1000)}_{message['id']}.json")
+        try:
+            self._write_message(path, message)
+        except OSError as e:
+            logger.error(f"Error writing email to outbox: {e}")
+            return False
+        logger.info(f"Email queued for {', '.join(message['recipients'])}: {subject}")
+        self._wakeup.set()
+        return True
+
+    def pending_count(self):
+        """待发送邮件数量"""
+        return len(self._list_messages())
+
+    def start(self):
+        """启动后台发送线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+        self._thread.start()
+        logger.info("Email outbox sender started.")
+
+    def stop(self, timeout=10):
+        """停止后台发送线程并关闭所有SMTP连接 (未发送的邮件保留在磁盘上)"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._close_sessions(force=True)
+        logger.info("Email outbox sender stopped.")
+
+    def flush(self):
+        """同步发送所有到期邮件 (用于测试或关闭前)"""
+        for path, message in self._due_messages():
+            self._deliver(path, message)
+
+    # --- 内部实现 ---
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Unexpected error in email outbox sender: {e}")
+            self._close_sessions()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    @staticmethod
+    def _write_message(path, message):
+        """原子写入：先写临时文件再替换，避免崩溃时留下半个文件"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(message, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _list_messages(self):
+        try:
+            names = os.listdir(self.outbox_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(os.path.join(self.outbox_dir, n) for n in names if n.endswith('.json'))
+
+    def _due_messages(self):
+        now = time.time()
+        for path in self._list_messages():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    message = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error reading outbox message {path}: {e}")
+                continue
+            if message.get('next_attempt', 0) > now:
+                continue
+            if message.get('account') not in self._accounts:
+                continue  # 账户尚未注册 (例如重启后对应配置未加载)，暂不处理
+            yield path, message
+
+    def _build_mime(self, message):
+        msg = MIMEMultipart()
+        msg['From'] = message['sender']
+        msg['To'] = ', '.join(message['recipients'])
+        msg['Subject'] = message['subject']
+        msg.attach(MIMEText(message['body'], 'plain', 'utf-8'))
+
+        for filepath in message.get('attachments', []):
+            ctype, encoding = mimetypes.guess_type(filepath)
+            if ctype is None or encoding is not None:
+                ctype = 'application/octet-stream'
+            maintype, subtype = ctype.split('/', 1)
+            with open(filepath, 'rb') as f:
+                part = MIMEBase(maintype, subtype)
+                part.set_payload(f.read())
+            encoders.encode_base64(part)
+            part.add_header('Content-Disposition', 'attachment', filename=os.path.basename(filepath))
+            msg.attach(part)
+        return msg
+
+    def _open_session(self, account):
+        cfg = self._accounts[account]
+        server = smtplib.SMTP(cfg.get('smtp_server'), cfg.get('smtp_port'), timeout=cfg.get('timeout', 30))
+        if cfg.get('use_tls', True):
+            server.starttls()
+        if cfg.get('sender_password'):
+            server.login(cfg.get('sender_email'), cfg.get('sender_password'))
+        logger.debug(f"SMTP session opened for {account}")
+        return server
+
+    def _get_session(self, account):
+        session = self._sessions.get(account)
+        if session is None:
+            session = [self._open_session(account), 0]
+            self._sessions[account] = session
+        session[1] = time.monotonic()
+        return session[0]
+
+    def _drop_session(self, account):
+        session = self._sessions.pop(account, None)
+        if session:
+            try:
+                session[0].quit()
+            except Exception:
+                session[0].close()
+
+    def _close_sessions(self, force=False):
+        now = time.monotonic()
+        for account, (_, last_used) in list(self._sessions.items()):
+            if force or now - last_used >= self.idle_timeout:
+                self._drop_session(account)
+
+    def _send(self, message, mime):
+        account = message['account']
+        try:
+            self._get_session(account).sendmail(message['sender'], message['recipients'], mime.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # 复用的连接可能已被服务器关闭，重连后再试一次
+            self._drop_session(account)
+            self._get_session(account).sendmail(message['sender'], message['recipients'], mime.as_string())
+
+    def _deliver(self, path, message):
+        try:
+            mime = self._build_mime(message)
+            with SMTP_SEND_TIME.time():
+                self._send(message, mime)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+            self._fail(path, message, e, permanent=True)
+        except OSError as e:  # 包含 smtplib.SMTPException 和附件读取错误
+            self._drop_session(message['account'])
+            permanent = isinstance(e, smtplib.SMTPResponseException) and e.smtp_code >= 500 \
+                and not isinstance(e, smtplib.SMTPAuthenticationError)
+            self._fail(path, message, e, permanent=permanent)
+        else:
+            os.remove(path)
+            EMAILS_SENT.inc()
+            logger.info(f"Email sent to {', '.join(message['recipients'])}: {message['subject']}")
+
+    def _fail(self, path, message, error, permanent=False):
+        EMAIL_FAILURES.inc()
+        message['attempts'] = message.get('attempts', 0) + 1
+        message['last_error'] = str(error)
+        if permanent or message['attempts'] >= self.max_retries:
+            logger.error(f"Giving up on email '{message['subject']}' after {message['attempts']} attempt(s): {error}")
+            # 保留最后一次的错误信息与尝试次数，便于排查
+            self._write_message(os.path.join(self.failed_dir, os.path.basename(path)), message)
+            os.remove(path)
+            return
+        delay = min(self.retry_backoff * 2 ** (message['attempts'] - 1), self.max_backoff)
+        message['next_attempt'] = time.time() + delay
+        logger.warning(f"Error sending email '{message['subject']}' (attempt {message['attempts']}), "
+                       f"retrying in {delay}s: {error}")
+        self._write_message(path, message)
@@ -0,0 +1,276 @@
+# src/core/metrics.py
+import time
+import bisect
+import logging
+import weakref
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+# 默认的耗时直方图分桶 (秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class _CellOwner:
+    """与计数单元一起保存在线程局部存储中，线程结束时随之释放，用于触发计数单元的回收"""
+    __slots__ = ('__weakref__',)
+
+
+class _Metric:
+    """
+    指标基类。
+    热路径上不加锁：每个线程写自己的计数单元 (只有该线程会修改它)，
+    抓取时再把所有线程的计数单元求和。只有线程首次写入时才需要加锁登记。
+    线程结束后其计数单元并入共享的 _retired 单元，短生命周期线程 (如每个请求一个线程) 不会使单元无限增长。
+    """
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=(), labelvalues=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.labelvalues = tuple(labelvalues)
+        self._children = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cells = {}  # {id(cell): cell} 存活线程的计数单元
+        self._retired = None  # 已结束线程的计数合计
+
+    def labels(self, *labelvalues):
+        """返回带标签值的子指标 (调用方可缓存返回值以省去字典查找)"""
+        labelvalues = tuple(str(v) for v in labelvalues)
+        child = self._children.get(labelvalues)
+        if child is None:
+            with self._lock:
+                child = self._children.get(labelvalues)
+                if child is None:
+                    child = self._new_child(labelvalues)
+                    self._children[labelvalues] = child
+        return child
+
+    def _new_child(self, labelvalues):
+        return type(self)(self.name, self.documentation, self.labelnames, labelvalues)
+
+    def _new_cell(self):
+        raise NotImplementedError
+
+    def _cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._new_cell()
+            owner = _CellOwner()
+            with self._lock:
+                self._cells[id(cell)] = cell
+            weakref.finalize(owner, self._retire, cell)
+            self._local.owner = owner
+            self._local.cell = cell
+            return cell
+
+    def _retire(self, cell):
+        """线程结束 (其线程局部存储被释放) 时把计数单元并入 _retired"""
+        with self._lock:
+            if self._retired is None:
+                self._retired = self._new_cell()
+            for i, value in enumerate(cell):
+                self._retired[i] += value
+            del self._cells[id(cell)]
+
+    def _total(self):
+        """所有计数单元逐项求和；加锁以免与 _retire 交错导致重复计数"""
+        with self._lock:
+            total = self._new_cell()
+            cells = list(self._cells.values())
+            if self._retired is not None:
+                cells.append(self._retired)
+            for cell in cells:
+                for i, value in enumerate(cell):
+                    total[i] += value
+        return total
+
+    def _samples(self):
+        """返回 [(后缀, 额外标签, 值)]"""
+        raise NotImplementedError
+
+    def _label_str(self, extra=()):
+        pairs = list(zip(self.labelnames, self.labelvalues)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        metrics = list(self._children.values()) if self.labelnames else [self]
+        for metric in metrics:
+            for suffix, extra, value in metric._samples():
+                lines.append(f"{self.name}{suffix}{metric._label_str(extra)} {value}")
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+    type_name = 'counter'
+
+    def _new_cell(self):
+        return [0]
+
+    def inc(self, amount=1):
+        self._cell()[0] += amount
+
+    @property
+    def value(self):
+        return self._total()[0]
+
+    def _samples(self):
+        return [('_total', (), self.value)]
+
+
+class Gauge(_Metric):
+    """瞬时值 (直接赋值，或由回调函数在抓取时计算)"""
+    type_name = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._value = 0
+        self._function = None
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, function):
+        self._function = function
+
+    @property
+    def value(self):
+        return self._function() if self._function else self._value
+
+    def _samples(self):
+        return [('', (), self.value)]
+
+
+class Histogram(_Metric):
+    """分桶直方图，记录分布、总和与次数"""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), labelvalues=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, labelvalues)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self, labelvalues):
+        return Histogram(self.name, self.documentation, self.labelnames, labelvalues, self.buckets)
+
+    def _new_cell(self):
+        # [各分桶计数..., +Inf 分桶计数, 总和]
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value):
+        cell = self._cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self):
+        """以上下文管理器形式记录代码块耗时"""
+        return _Timer(self)
+
+    def snapshot(self):
+        """返回 (各分桶非累计计数, 总和, 次数)"""
+        cell = self._total()
+        counts = cell[:-1]
+        return counts, cell[-1], sum(counts)
+
+    def _samples(self):
+        counts, total, count = self.snapshot()
+        samples = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            samples.append(('_bucket', (('le', repr(float(bound))),), cumulative))
+        samples.append(('_bucket', (('le', '+Inf'),), count))
+        samples.append(('_sum', (), total))
+        samples.append(('_count', (), count))
+        return samples
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed)
+
+
+class MetricsRegistry:
+    """指标注册表，同名指标只创建一次 (多个实例共享同一指标)"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """生成 Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("Metrics request from %s: " + format, self.client_address[0], *args)
+
+
+def start_metrics_server(config, registry=REGISTRY):
+    """按配置在后台线程中启动 /metrics HTTP 端点，返回 server (未启用时返回 None)"""
+    if not config.get('enabled', False):
+        return None
+    host = config.get('host', '127.0.0.1')
+    port = config.get('port', 9108)
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{server.server_port}/metrics")
+    return server
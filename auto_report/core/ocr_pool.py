@@ -0,0 +1,51 @@
+# src/core/ocr_pool.py
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def _image_to_string(filename):
+    # 在子进程中执行：按文件名读取已保存的截图，避免在进程间传输整张位图
+    import pytesseract
+    from PIL import Image
+    with Image.open(filename) as image:
+        return pytesseract.image_to_string(image)
+
+
+def _mp_context():
+    # 主进程中已运行调度器、watchdog 与 HTTP 线程，fork 会把这些线程持有的锁原样复制到子进程；
+    # forkserver 从干净的服务进程派生工作进程，不支持的平台 (Windows) 使用 spawn
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+class OCRPool:
+    """
+    多个 ScreenCaptureAgent 共享的 OCR 进程池。
+    同一时刻最多运行 max_workers 个 tesseract，截图解码与识别都不占用调度器线程的 GIL。
+    进程池在第一次使用时才创建 (各租户的截屏任务在不同的调度器线程中调用，创建时加锁)。
+    """
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_mp_context())
+                logger.info(f"OCR process pool started with {self.max_workers} workers.")
+            return self._executor
+
+    def image_to_string(self, filename, timeout=None):
+        return self._get_executor().submit(_image_to_string, filename).result(timeout=timeout)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,239 @@
+# src/core/profiling.py
+"""
+按需剖析调度任务。
+运行中通过以下任一方式为指定任务开启剖析，之后该任务的 N 次运行在 cProfile 与 tracemalloc 下执行：
+  - 控制文件：写入 core.profiling.control_file (每行 "<任务ID或函数名> [次数]"，支持通配符)，读取后删除；
+  - 信号：kill -USR1 <pid> 立即检查控制文件，并重新读取配置中的 core.profiling.jobs；
+  - 配置：core.profiling.jobs 中列出的任务在启动 (或收到 SIGUSR1) 时开启。
+每次运行在 profile_dir 下写出 <任务ID>_<时间>.prof (pstats 格式，可用 snakeviz 等查看)、
+.snapshot (tracemalloc 快照) 与 .txt (耗时最多的函数及分配最多的代码行)。
+只有开启剖析期间任务函数才被替换为剖析包装，未开启时任务运行没有任何额外开销。
+"""
+import io
+import os
+import re
+import time
+import pstats
+import signal
+import cProfile
+import fnmatch
+import logging
+import functools
+import threading
+import tracemalloc
+from datetime import datetime
+
+from apscheduler.jobstores.base import JobLookupError
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILES_WRITTEN = metrics.counter('autoreport_profiles_written', "Profiled job runs written to the profile directory", ['job'])
+
+
+class JobProfiler:
+    """
+    config.yaml 中 core.profiling 的配置：
+      profile_dir: 剖析结果目录
+      control_file: 控制文件路径；poll_interval: 检查控制文件的间隔 (秒)
+      jobs: {任务ID或函数名: 次数}，启动时开启剖析
+      memory: 是否同时用 tracemalloc 记录内存分配；memory_frames: 每个分配记录的调用栈深度
+      top: 摘要中列出的函数/代码行数
+    """
+
+    def __init__(self, config, reload_config=None):
+        self.profile_dir = config.get('profile_dir', './data/profiles')
+        self.control_file = config.get('control_file', os.path.join(self.profile_dir, 'request'))
+        self.poll_interval = config.get('poll_interval', 10)
+        self.jobs = config.get('jobs') or {}
+        self.memory = config.get('memory', True)
+        self.memory_frames = config.get('memory_frames', 10)
+        self.top = config.get('top', 30)
+        self.reload_config = reload_config  # 返回最新 core.profiling 配置的函数，收到 SIGUSR1 时调用
+        self.scheduler = None
+        self._lock = threading.Lock()
+        self._armed = {}  # {job_id: [剩余次数, 原任务函数]}
+        # cProfile/tracemalloc 为全局状态，同一时刻只剖析一个任务
+        self._run_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # --- 开启与恢复 ---
+
+    def arm(self, pattern, runs=1):
+        """为任务ID或任务函数名匹配 pattern 的所有任务开启接下来 runs 次运行的剖析，返回匹配的任务ID"""
+        matched = []
+        with self._lock:
+            for job in self.scheduler.get_jobs():
+                if not (fnmatch.fnmatchcase(job.id, pattern)
+                        or fnmatch.fnmatchcase(getattr(job.func, '__name__', ''), pattern)):
+                    continue
+                matched.append(job.id)
+                if job.id in self._armed:
+                    self._armed[job.id][0] = runs
+                    continue
+                self._armed[job.id] = [runs, job.func]
+                job.modify(func=self._wrap(job.id, job.func))
+        if matched:
+            logger.info(f"Profiling armed for next {runs} run(s) of: {', '.join(matched)}")
+        else:
+            logger.warning(f"No scheduled job matches profiling request '{pattern}'.")
+        return matched
+
+    def disarm(self, job_id):
+        """恢复任务的原函数"""
+        with self._lock:
+            armed = self._armed.pop(job_id, None)
+        if armed is None:
+            return
+        try:
+            self.scheduler.modify_job(job_id, func=armed[1])
+        except JobLookupError:
+            pass
+        logger.info(f"Profiling finished for job {job_id}.")
+
+    def _wrap(self, job_id, func):
+        @functools.wraps(func)
+        def profiled(*args, **kwargs):
+            if not self._run_lock.acquire(blocking=False):
+                logger.warning(f"Another job is being profiled, job {job_id} runs without profiling.")
+                return func(*args, **kwargs)
+            try:
+                return self._profile_run(job_id, func, args, kwargs)
+            finally:
+                self._run_lock.release()
+                with self._lock:
+                    armed = self._armed.get(job_id)
+                    if armed:
+                        armed[0] -= 1
+                    finished = armed is not None and armed[0] <= 0
+                if finished:
+                    self.disarm(job_id)
+
+        return profiled
+
+    # --- 剖析一次运行 ---
+
+    def _profile_run(self, job_id, func, args, kwargs):
+        # tracemalloc 已被其他工具开启时不接管，只做 cProfile
+        trace_memory = self.memory and not tracemalloc.is_tracing()
+        if trace_memory:
+            tracemalloc.start(self.memory_frames)
+        profiler = cProfile.Profile()
+        started_at = datetime.now()
+        start = time.perf_counter()
+        error = None
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - start
+            snapshot, peak = None, None
+            if trace_memory:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            try:
+                self._write(job_id, started_at, duration, error, profiler, snapshot, peak)
+            except Exception as e:
+                logger.error(f"Error writing profile for job {job_id}: {e}")
+
+    def _write(self, job_id, started_at, duration, error, profiler, snapshot, peak):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = f"{re.sub(r'[^0-9A-Za-z_.-]+', '_', job_id)}_{started_at.strftime('%Y%m%d_%H%M%S')}"
+        base = os.path.join(self.profile_dir, name)
+        profiler.dump_stats(base + '.prof')
+
+        summary = io.StringIO()
+        summary.write(f"Job: {job_id}\nStarted: {started_at.isoformat(timespec='seconds')}\n"
+                      f"Duration: {duration:.3f}s\nResult: {'error: ' + repr(error) if error else 'ok'}\n")
+        for sort_key in ('cumulative', 'tottime'):
+            summary.write(f"\n=== Top {self.top} functions by {sort_key} time ===\n")
+            pstats.Stats(profiler, stream=summary).sort_stats(sort_key).print_stats(self.top)
+
+        if snapshot is not None:
+            snapshot.dump(base + '.snapshot')
+            # 快照包含剖析期间所有线程分配且尚未释放的内存
+            statistics = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            ]).statistics('lineno')
+            total = sum(stat.size for stat in statistics)
+            summary.write(f"\n=== Memory: peak {peak / 1024 / 1024:.1f} MiB, "
+                          f"{total / 1024 / 1024:.1f} MiB still allocated at end of run (all threads) ===\n")
+            for stat in statistics[:self.top]:
+                summary.write(f"{stat}\n")
+
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        PROFILES_WRITTEN.labels(job_id).inc()
+        logger.info(f"Profile of job {job_id} ({duration:.1f}s) written to {base}.txt")
+
+    # --- 控制文件与信号 ---
+
+    def check_requests(self):
+        """读取并删除控制文件，为其中列出的任务开启剖析"""
+        try:
+            with open(self.control_file, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            os.remove(self.control_file)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.error(f"Error reading profiling control file {self.control_file}: {e}")
+            return
+        for line in lines:
+            parts = line.split('#', 1)[0].split()
+            if not parts:
+                continue
+            try:
+                runs = int(parts[1]) if len(parts) > 1 else 1
+            except ValueError:
+                logger.error(f"Invalid profiling request '{line}', expected '<job> [runs]'.")
+                continue
+            self.arm(parts[0], runs)
+
+    def arm_configured(self):
+        for pattern, runs in self.jobs.items():
+            self.arm(pattern, runs or 1)
+
+    def _on_signal(self, signum, frame):
+        # 信号处理函数在主线程中执行，主线程正阻塞在调度器中，实际工作交给新线程
+        threading.Thread(target=self._handle_signal, name='profiling-signal', daemon=True).start()
+
+    def _handle_signal(self):
+        logger.info("Received SIGUSR1, checking profiling requests.")
+        if self.reload_config:
+            try:
+                self.jobs = self.reload_config().get('jobs') or {}
+            except Exception as e:
+                logger.error(f"Error reloading profiling config: {e}")
+        self.arm_configured()
+        self.check_requests()
+
+    def _poll(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.check_requests()
+            except Exception as e:
+                logger.error(f"Error checking profiling requests: {e}")
+
+    def attach(self, scheduler):
+        """在所有任务添加完成后调用：开启配置中的剖析任务，安装 SIGUSR1 处理函数并开始检查控制文件"""
+        self.scheduler = scheduler
+        self.arm_configured()
+        self.check_requests()
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, self._on_signal)
+        if self.poll_interval > 0:
+            self._thread = threading.Thread(target=self._poll, name='profiling-control', daemon=True)
+            self._thread.start()
+        logger.info(f"Job profiling available: write '<job> [runs]' to {self.control_file} or send SIGUSR1.")
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,211 @@
+# src/core/records.py
+"""
+数据点的紧凑内存表示。
+常见来源 (screen/file/document) 的数据点用 __slots__ 记录类保存，路径前缀、事件类型等重复字符串做驻留 (intern)，
+ISO 时间字符串改存为浮点时间戳；需要时再通过 to_dict() 还原成与原来完全一致的字典。
+无法无损压缩的数据点 (字段不同、时间带时区等) 原样保存字典。
+"""
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from datetime import datetime
+
+_intern = sys.intern
+
+
+def _pack_time(value):
+    """ISO 时间字符串 -> 浮点时间戳；无法无损还原时返回 None"""
+    if not isinstance(value, str):
+        return None
+    try:
+        ts = datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+    return ts if datetime.fromtimestamp(ts).isoformat() == value else None
+
+
+def _unpack_time(ts):
+    return datetime.fromtimestamp(ts).isoformat()
+
+
+def _split_path(path):
+    """路径 -> (驻留的目录前缀, 文件名)；无法无损还原时返回 None"""
+    if not isinstance(path, str):
+        return None
+    directory, name = os.path.split(path)
+    if os.path.join(directory, name) != path:
+        return None
+    return _intern(directory), name
+
+
+class ScreenRecord:
+    __slots__ = ('directory', 'name', 'captured_at', 'snippet')
+    keys = ('filename', 'timestamp', 'extracted_text_snippet')
+
+    @classmethod
+    def pack(cls, data):
+        captured_at = _pack_time(data['timestamp'])
+        path = _split_path(data['filename'])
+        if captured_at is None or path is None:
+            return None
+        record = cls()
+        record.directory, record.name = path
+        record.captured_at = captured_at
+        record.snippet = data['extracted_text_snippet']
+        return record
+
+    def to_dict(self):
+        return {
+            "filename": os.path.join(self.directory, self.name),
+            "timestamp": _unpack_time(self.captured_at),
+            "extracted_text_snippet": self.snippet,
+        }
+
+
+class FileRecord:
+    __slots__ = ('event_type', 'directory', 'name', 'is_directory', 'event_time')
+    keys = ('event_type', 'src_path', 'is_directory', 'timestamp')
+
+    @classmethod
+    def pack(cls, data):
+        event_time = _pack_time(data['timestamp'])
+        path = _split_path(data['src_path'])
+        if event_time is None or path is None or not isinstance(data['event_type'], str):
+            return None
+        record = cls()
+        record.event_type = _intern(data['event_type'])
+        # 文件事件高度集中在少数文件上，文件名同样驻留
+        record.directory, record.name = path[0], _intern(path[1])
+        record.is_directory = data['is_directory']
+        record.event_time = event_time
+        return record
+
+    @property
+    def src_path(self):
+        return os.path.join(self.directory, self.name)
+
+    def to_dict(self):
+        return {
+            "event_type": self.event_type,
+            "src_path": self.src_path,
+            "is_directory": self.is_directory,
+            "timestamp": _unpack_time(self.event_time),
+        }
+
+
+class DocumentRecord:
+    __slots__ = ('filename', 'directory', 'name', 'size', 'last_modified', 'snippet')
+    keys = ('filename', 'full_path', 'size', 'last_modified', 'content_snippet')
+
+    @classmethod
+    def pack(cls, data):
+        last_modified = _pack_time(data['last_modified'])
+        path = _split_path(data['full_path'])
+        if last_modified is None or path is None:
+            return None
+        record = cls()
+        record.filename = data['filename']
+        record.directory, record.name = path
+        record.size = data['size']
+        record.last_modified = last_modified
+        record.snippet = data['content_snippet']
+        return record
+
+    def to_dict(self):
+        return {
+            "filename": self.filename,
+            "full_path": os.path.join(self.directory, self.name),
+            "size": self.size,
+            "last_modified": _unpack_time(self.last_modified),
+            "content_snippet": self.snippet,
+        }
+
+
+RECORD_TYPES = {
+    'screen': ScreenRecord,
+    'file': FileRecord,
+    'document': DocumentRecord,
+}
+
+
+def pack_record(source, data_point):
+    """尽可能把数据点压缩成记录对象，否则原样返回"""
+    record_type = RECORD_TYPES.get(source)
+    if record_type is None or not isinstance(data_point, dict) or tuple(data_point) != record_type.keys:
+        return data_point
+    try:
+        return record_type.pack(data_point) or data_point
+    except (TypeError, ValueError):
+        return data_point
+
+
+def unpack_record(record):
+    return record if isinstance(record, dict) else record.to_dict()
+
+
+class SourceColumn:
+    """单个来源的按时间排序的数据列：时间戳存放在 array('d') 中，便于二分查找范围"""
+    __slots__ = ('timestamps', 'records')
+
+    def __init__(self):
+        self.timestamps = array('d')
+        self.records = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def append(self, ts, record):
+        if not self.timestamps or ts >= self.timestamps[-1]:
+            self.timestamps.append(ts)
+            self.records.append(record)
+        else:
+            # 乱序到达 (例如导入的历史数据)：插入到正确位置以保持有序
+            index = bisect_right(self.timestamps, ts)
+            self.timestamps.insert(index, ts)
+            self.records.insert(index, record)
+
+    def range(self, since=None, until=None):
+        """返回 [since, until) 范围内的 (时间戳切片, 记录切片)"""
+        start = bisect_left(self.timestamps, since) if since is not None else 0
+        stop = bisect_left(self.timestamps, until) if until is not None else len(self.timestamps)
+        return self.timestamps[start:stop], self.records[start:stop]
+
+
+class RecordView(Sequence):
+    """
+    数据点的只读视图，访问时才生成 {'timestamp': iso, 'data': {...}} 字典，
+    与原先列表中保存的结构一致。
+    """
+    __slots__ = ('timestamps', 'records', 'data_only')
+
+    def __init__(self, timestamps, records, data_only=False):
+        self.timestamps = timestamps
+        self.records = records
+        self.data_only = data_only
+
+    def __len__(self):
+        return len(self.records)
+
+    def _item(self, i):
+        data = unpack_record(self.records[i])
+        if self.data_only:
+            return data
+        return {'timestamp': _unpack_time(self.timestamps[i]), 'data': data}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RecordView(self.timestamps[index], self.records[index], self.data_only)
+        if index < 0:
+            index += len(self.records)
+        if not 0 <= index < len(self.records):
+            raise IndexError('RecordView index out of range')
+        return self._item(index)
+
+    def __iter__(self):
+        for i in range(len(self.records)):
+            yield self._item(i)
+
+    def __repr__(self):
+        return f"RecordView({len(self)} items)"
@@ -0,0 +1,212 @@
+# src/core/remote_aggregator.py
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+
+import requests
+
+from core import metrics
+from core.ingest import encode_batch
+
+logger = logging.getLogger(__name__)
+
+BATCHES_SENT = metrics.counter('autoreport_collector_batches_sent', "Batches acknowledged by the central aggregator")
+SEND_FAILURES = metrics.counter('autoreport_collector_send_failures', "Failed attempts to push a batch to the central aggregator")
+SPOOL_PENDING = metrics.gauge('autoreport_collector_spool_batches', "Batches waiting in the on-disk spool")
+
+
+class RemoteAggregator:
+    """
+    采集端使用的 DataAggregator 替代品：add_data 只把数据点放入内存缓冲，
+    后台线程按 batch_size / flush_interval 把缓冲封装成带序号的压缩批次写入磁盘暂存目录 (spool)，
+    再按序号顺序推送到中心节点 (core.ingest)。中心节点不可达时批次留在磁盘上，恢复后按指数退避重试，
+    进程重启后继续推送。每个批次的序号严格递增，中心节点据此对重发的批次去重。
+    """
+
+    def __init__(self, config):
+        self.collector_id = config['collector_id']
+        self.central_url = config.get('central_url', 'http://127.0.0.1:9110/ingest')
+        self.token = config.get('token')
+        self.spool_dir = config.get('spool_dir', './data/spool')
+        self.rejected_dir = os.path.join(self.spool_dir, 'rejected')
+        self.batch_size = config.get('batch_size', 500)
+        self.flush_interval = config.get('flush_interval', 5)  # 缓冲最长停留时间 (秒)
+        self.retry_backoff = config.get('retry_backoff', 5)
+        self.max_backoff = config.get('max_backoff', 300)
+        self.max_spool_batches = config.get('max_spool_batches', 10000)  # 超出后丢弃最旧的批次
+        self.timeout = config.get('timeout', 30)
+        os.makedirs(self.rejected_dir, exist_ok=True)
+
+        self._state_file = os.path.join(self.spool_dir, 'state.json')
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()  # 发送线程与 flush/stop 不并发推送同一批次
+        self._buffer = []
+        self._buffer_since = None
+        self._next_seq = self._load_next_seq()
+        self._listeners = []
+        self._session = requests.Session()
+        self._failures = 0
+        self._retry_at = 0
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        SPOOL_PENDING.set_function(self.pending_batches)
+        logger.info(f"RemoteAggregator initialized: collector '{self.collector_id}' -> {self.central_url}")
+
+    # --- 与 DataAggregator 一致的写入接口 ---
+
+    def add_listener(self, listener):
+        """注册本地监听器，每次 add_data 后以 listener(source, data_point, ts) 调用"""
+        self._listeners.append(listener)
+
+    def add_data(self, source, data_point, timestamp=None, notify=True):
+        ts = (timestamp or datetime.now()).timestamp()
+        with self._lock:
+            if not self._buffer:
+                self._buffer_since = time.monotonic()
+            self._buffer.append((source, ts, data_point))
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+        for listener in (self._listeners if notify else ()):
+            try:
+                listener(source, data_point, ts)
+            except Exception as e:
+                logger.error(f"Error in data listener {listener}: {e}")
+
+    # --- 生命周期 ---
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='collector-sender', daemon=True)
+        self._thread.start()
+        logger.info("Collector sender started.")
+
+    def stop(self, timeout=10):
+        """停止发送线程；缓冲中的数据写入暂存目录，并尽力推送一次"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._seal()
+        self._retry_at = 0
+        self._send_pending()
+        self._session.close()
+        logger.info(f"Collector sender stopped, {self.pending_batches()} batch(es) left in spool.")
+
+    def flush(self):
+        """立即封装缓冲中的数据并推送所有暂存批次，返回是否已全部送达"""
+        self._seal()
+        self._retry_at = 0
+        return self._send_pending()
+
+    def pending_batches(self):
+        return len(self._list_spool())
+
+    # --- 内部实现 ---
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                with self._lock:
+                    due = self._buffer and (len(self._buffer) >= self.batch_size
+                                            or time.monotonic() - self._buffer_since >= self.flush_interval)
+                if due:
+                    self._seal()
+                self._send_pending()
+            except Exception as e:
+                logger.error(f"Unexpected error in collector sender: {e}")
+            self._wakeup.wait(min(self.flush_interval, 1.0))
+            self._wakeup.clear()
+
+    def _load_next_seq(self):
+        try:
+            with open(self._state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)['next_seq']
+        except (OSError, ValueError, KeyError):
+            # 没有状态文件 (首次运行或暂存目录被清空)：以当前毫秒时间戳起编号，
+            # 保证新序号仍大于中心节点已记录的高水位
+            return int(time.time() * 1000)
+
+    @staticmethod
+    def _write_atomic(path, data, mode='wb'):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _seal(self):
+        """把当前缓冲封装为下一个序号的批次写入暂存目录"""
+        with self._lock:
+            if not self._buffer:
+                return
+            points, self._buffer = self._buffer, []
+            seq = self._next_seq
+            self._next_seq += 1
+            # 先持久化下一个序号再写批次：崩溃时最多跳过一个序号，不会重复使用
+            self._write_atomic(self._state_file, json.dumps({'next_seq': self._next_seq}), 'w')
+        body = encode_batch(self.collector_id, seq, points)
+        self._write_atomic(os.path.join(self.spool_dir, f"{seq:016d}.json.gz"), body)
+        self._trim_spool()
+        self._wakeup.set()
+
+    def _list_spool(self):
+        try:
+            names = os.listdir(self.spool_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(os.path.join(self.spool_dir, n) for n in names if n.endswith('.json.gz'))
+
+    def _trim_spool(self):
+        batches = self._list_spool()
+        for path in batches[:max(0, len(batches) - self.max_spool_batches)]:
+            logger.error(f"Spool is full ({self.max_spool_batches} batches), dropping oldest batch {path}")
+            os.remove(path)
+
+    def _send_pending(self):
+        """按序号顺序推送暂存批次，遇到失败即停止并等待退避；返回是否已全部送达"""
+        with self._send_lock:
+            if time.time() < self._retry_at:
+                return False
+            return self._send_spool()
+
+    def _send_spool(self):
+        headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        for path in self._list_spool():
+            try:
+                with open(path, 'rb') as f:
+                    body = f.read()
+            except FileNotFoundError:
+                continue  # 暂存目录已满时被丢弃
+            try:
+                response = self._session.post(self.central_url, data=body, headers=headers, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                self._backoff(e)
+                return False
+            if response.status_code == 200:
+                os.remove(path)
+                BATCHES_SENT.inc()
+                self._failures = 0
+            elif response.status_code in (400, 413):
+                # 中心节点无法解析的批次重发也不会成功，移走以免阻塞后续批次
+                logger.error(f"Central aggregator rejected batch {path}: {response.text[:200]}")
+                os.replace(path, os.path.join(self.rejected_dir, os.path.basename(path)))
+            else:
+                self._backoff(f"HTTP {response.status_code}: {response.text[:200]}")
+                return False
+        return True
+
+    def _backoff(self, error):
+        SEND_FAILURES.inc()
+        self._failures += 1
+        delay = min(self.retry_backoff * 2 ** (self._failures - 1), self.max_backoff)
+        self._retry_at = time.time() + delay
+        logger.warning(f"Error pushing batches to {self.central_url} (attempt {self._failures}), "
+                       f"retrying in {delay}s: {error}")
@@ -1,21 +1,84 @@
 # src/core/scheduler.py
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.triggers.base import BaseTrigger
+from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.date import DateTrigger
 
 logger = logging.getLogger(__name__)
 
+# 各类任务使用独立线程池，避免长时间的LLM调用/文档扫描阻塞截屏OCR
+DEFAULT_EXECUTORS = {
+    'capture': 1,  # 截屏与OCR
+    'io': 2,  # 文件系统扫描
+    'network': 2,  # 大模型/第三方API调用
+}
+
+# 默认的重叠与合并策略：同一任务不并发执行，积压的多次触发合并为一次
+DEFAULT_JOB_DEFAULTS = {
+    'max_instances': 1,
+    'coalesce': True,
+    'misfire_grace_time': 300,
+}
+
+
+class OffsetTrigger(BaseTrigger):
+    """
+    把另一个触发器的每次触发时间整体推后固定秒数。
+    多租户时为每个租户的报告任务设置不同的偏移量，避免所有人的日报都在 18:00 同时生成。
+    """
+
+    def __init__(self, trigger, offset_seconds):
+        self.trigger = trigger
+        self.offset = timedelta(seconds=offset_seconds)
+        self.timezone = getattr(trigger, 'timezone', None)
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        inner_previous = previous_fire_time - self.offset if previous_fire_time else None
+        next_fire_time = self.trigger.get_next_fire_time(inner_previous, now - self.offset)
+        return next_fire_time + self.offset if next_fire_time else None
+
+    def __str__(self):
+        return f"{self.trigger} + {int(self.offset.total_seconds())}s"
+
+    def __repr__(self):
+        return f"<OffsetTrigger ({self.trigger!r}, offset={int(self.offset.total_seconds())}s)>"
 
-def setup_schedulers(scheduler, screen_agent, file_agent, document_agent, lark_agent, analyzer_agent, config):
-    """设置所有定时任务，根据配置开关决定是否启用"""
-    try:
-        # --- 启动数据采集任务 ---
-        if screen_agent:
-            screen_agent.start_periodic_capture(scheduler)
-            logger.info("Screen capture job scheduled.")
 
-        # file_agent 和 document_agent 的持续任务在 main.py 中启动
+def create_scheduler(config, scheduler_class=BlockingScheduler):
+    """根据配置创建调度器，为每类任务创建独立的线程池"""
+    scheduler_config = config.get('core', {}).get('scheduler', {})
+
+    pool_sizes = dict(DEFAULT_EXECUTORS, **scheduler_config.get('executors', {}))
+    logger.info(f"Scheduler executor pools: {pool_sizes}")
+    executors = {'default': ThreadPoolExecutor(pool_sizes.pop('default', 4))}
+    for name, size in pool_sizes.items():
+        executors[name] = ThreadPoolExecutor(size)
+
+    job_defaults = dict(DEFAULT_JOB_DEFAULTS, **scheduler_config.get('job_defaults', {}))
+    return scheduler_class(executors=executors, job_defaults=job_defaults)
+
+
+def job_options(config, job_id, executor):
+    """
+    返回添加任务时使用的参数：所属线程池，以及 config.yaml 中 core.scheduler.jobs.<job_id>
+    下按任务覆盖的 max_instances / coalesce / misfire_grace_time。
+    """
+    options = {'executor': executor}
+    options.update(config.get('core', {}).get('scheduler', {}).get('jobs', {}).get(job_id, {}))
+    return options
+
+
+def setup_schedulers(scheduler, analyzer_agent, config, job_prefix='', stagger_seconds=0):
+    """
+    设置报告分析定时任务，根据配置开关决定是否启用。
+    多租户时 job_prefix 区分各租户的任务，stagger_seconds 为该租户报告任务的错峰偏移。
+    """
+    try:
+        # 数据采集Agent的持续任务由 agents.registry.start_agents 启动
 
         # --- 启动报告分析和发送任务 ---
         report_types_config = config.get('analysis', {}).get('report_types', {})
@@ -29,15 +92,20 @@ def setup_schedulers(scheduler, screen_agent, file_agent, document_agent, lark_a
                     continue
 
                 job_id = f'{report_type}_analysis_job'
+                trigger = CronTrigger(minute=cron_parts[0], hour=cron_parts[1], day=cron_parts[2],
+                                      month=cron_parts[3], day_of_week=cron_parts[4])
+                if stagger_seconds:
+                    trigger = OffsetTrigger(trigger, stagger_seconds)
                 job_args = [report_type, report_config.get('description', report_type)]  # 传递类型和描述
+                job_kwargs = {'topic': report_config['topic']} if report_config.get('topic') else None
                 # 为每个启用的报告类型添加一个调度任务
                 scheduler.add_job(
                     # 调用 analyzer_agent 的通用分析方法，并传入报告类型
-                    analyzer_agent.analyze_and_report, 'cron',
-                    minute=cron_parts[0], hour=cron_parts[1], day=cron_parts[2],
-                    month=cron_parts[3], day_of_week=cron_parts[4],
-                    id=job_id,
-                    args=job_args
+                    analyzer_agent.analyze_and_report, trigger,
+                    id=f'{job_prefix}{job_id}',
+                    args=job_args,
+                    kwargs=job_kwargs,
+                    **job_options(config, job_id, 'network')
                 )
                 # 启动进行日报、周报、月报...数据分析
                 # scheduler.add_job(
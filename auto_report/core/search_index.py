@@ -0,0 +1,258 @@
+# src/core/search_index.py
+import os
+import re
+import json
+import math
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_CJK = '㐀-䶿一-鿿豈-﫿'
+_TOKEN_RE = re.compile(rf'[{_CJK}]+|[^\W_{_CJK}]+')
+_CJK_RE = re.compile(rf'[{_CJK}]')
+
+# 各来源参与索引的文本字段
+TEXT_FIELDS = {
+    'screen': ('extracted_text_snippet',),
+    'file': ('src_path',),
+    'document': ('filename', 'content_snippet'),
+    'lark_calendar': ('summary', 'description'),
+    'lark_message': ('chat_name', 'content'),
+}
+
+
+def tokenize(text):
+    """
+    分词：英文/数字按单词切分并转小写，中文按相邻两字 (bigram) 切分，单个汉字保留为一个词。
+    索引与查询使用同一套规则，中文项目名等无需额外分词库即可检索。
+    """
+    text = text.lower()
+    if not _CJK_RE.search(text):
+        return _TOKEN_RE.findall(text)
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        # 汉字都在 U+3400 之后，先做字符比较，绝大多数英文单词无需再走正则
+        if len(token) > 1 and token[0] >= '\u3400' and _CJK_RE.match(token):
+            tokens.extend([a + b for a, b in zip(token, token[1:])])
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def extract_text(source, data_point):
+    """提取数据点中用于检索的文本"""
+    if not isinstance(data_point, dict):
+        return str(data_point)
+    fields = TEXT_FIELDS.get(source)
+    if fields is None:
+        return ' '.join(str(v) for v in data_point.values() if isinstance(v, str))
+    return ' '.join(str(data_point.get(field) or '') for field in fields)
+
+
+class ActivityIndex:
+    """
+    基于 SQLite FTS5 的活动数据全文索引。
+    通过 DataAggregator.add_listener 增量写入 (批量提交)，提供按主题检索与按词项显著性打分的查询接口。
+    数据点保存在普通表 activity_points 中 (按 ts、(source, ts) 建索引，时间窗口查询不随历史增长而变慢)，
+    activity 为以其为外部内容的 FTS5 表，只索引分词结果；没有可检索文本的数据点 (如 OCR 为空的截图) 同样保存。
+    """
+
+    def __init__(self, path=':memory:', batch_size=256):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS activity_points ("
+            "id INTEGER PRIMARY KEY, source TEXT NOT NULL, ts REAL NOT NULL, tokens TEXT NOT NULL, payload TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS activity_points_ts ON activity_points(ts);"
+            "CREATE INDEX IF NOT EXISTS activity_points_source_ts ON activity_points(source, ts);"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS activity USING fts5("
+            "tokens, content='activity_points', content_rowid='id', tokenize='unicode61 remove_diacritics 0');"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS activity_vocab USING fts5vocab(activity, 'row');"
+        )
+        self._conn.commit()
+        logger.info(f"ActivityIndex initialized at {path}")
+
+    # --- 写入 ---
+
+    def add(self, source, data_point, ts):
+        """索引一个数据点 (ts 为浮点时间戳)，可直接作为 DataAggregator 的监听器"""
+        tokens = ' '.join(tokenize(extract_text(source, data_point)))
+        row = (source, ts, tokens, json.dumps(data_point, ensure_ascii=False, default=str))
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        last_id = self._conn.execute("SELECT coalesce(max(id), 0) FROM activity_points").fetchone()[0]
+        self._conn.executemany("INSERT INTO activity_points(source, ts, tokens, payload) VALUES (?, ?, ?, ?)",
+                               self._pending)
+        # 外部内容表需要手动同步全文索引，只索引有文本的数据点
+        self._conn.execute("INSERT INTO activity(rowid, tokens) "
+                           "SELECT id, tokens FROM activity_points WHERE id > ? AND tokens != ''", (last_id,))
+        self._conn.commit()
+        self._pending = []
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+    # --- 查询 ---
+
+    @staticmethod
+    def _match_expression(query, match_all=True):
+        """把用户输入的主题转成 FTS5 MATCH 表达式：每个英文单词为一项，中文连续片段为一个短语"""
+        terms = []
+        for match in _TOKEN_RE.finditer(query.lower()):
+            token = match.group()
+            if _CJK_RE.match(token):
+                if len(token) == 1:
+                    terms.append(f'"{token}"*')
+                else:
+                    terms.append('"' + ' '.join(token[i:i + 2] for i in range(len(token) - 1)) + '"')
+            else:
+                terms.append(f'"{token}"')
+        return (' AND ' if match_all else ' OR ').join(terms)
+
+    @staticmethod
+    def _window_clause(since, until, sources):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since.timestamp())
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until.timestamp())
+        if sources:
+            clauses.append(f"source IN ({','.join('?' * len(sources))})")
+            params.extend(sources)
+        return clauses, params
+
+    @staticmethod
+    def _to_item(source, ts, payload, score=None):
+        item = {'source': source, 'timestamp': datetime.fromtimestamp(ts).isoformat(), 'data': json.loads(payload)}
+        if score is not None:
+            item['score'] = score
+        return item
+
+    def search(self, query, since=None, until=None, sources=None, limit=50, match_all=True):
+        """按主题检索最相关的数据点 (BM25 排序)，返回 [{'source', 'timestamp', 'data', 'score'}]"""
+        expression = self._match_expression(query, match_all)
+        if not expression:
+            return []
+        clauses, params = self._window_clause(since, until, sources)
+        sql = ("SELECT source, ts, payload, bm25(activity) AS rank FROM activity "
+               "JOIN activity_points ON activity_points.id = activity.rowid WHERE activity MATCH ?")
+        if clauses:
+            sql += " AND " + " AND ".join(clauses)
+        sql += " ORDER BY rank LIMIT ?"
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(sql, [expression] + params + [limit]).fetchall()
+        # bm25() 越小越相关，转成越大越相关的分数
+        return [self._to_item(source, ts, payload, -rank) for source, ts, payload, rank in rows]
+
+    def _window_rows(self, since, until, sources):
+        clauses, params = self._window_clause(since, until, sources)
+        sql = "SELECT tokens, source, ts, payload FROM activity_points"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            self._flush()
+            return self._conn.execute(sql, params).fetchall()
+
+    def iter_range(self, since=None, until=None, sources=None):
+        """按时间顺序遍历窗口内已索引的数据点 (source, ts, data_point)，用于从索引恢复历史数据"""
+        clauses, params = self._window_clause(since, until, sources)
+        sql = "SELECT source, ts, payload FROM activity_points"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts"
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(sql, params).fetchall()
+        for source, ts, payload in rows:
+            yield source, ts, json.loads(payload)
+
+    def _idf(self, terms):
+        """根据全部已索引数据计算词项的逆文档频率"""
+        with self._lock:
+            total = self._conn.execute("SELECT count(*) FROM activity_points").fetchone()[0] or 1
+            df = {}
+            terms = list(terms)
+            for i in range(0, len(terms), 500):
+                chunk = terms[i:i + 500]
+                df.update(self._conn.execute(
+                    f"SELECT term, doc FROM activity_vocab WHERE term IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall())
+        return {term: math.log((1 + total) / (1 + df.get(term, 0))) for term in terms}
+
+    @staticmethod
+    def _weight(count, idf):
+        # 次线性词频：避免路径前缀等在每条数据中都出现的词项压过真正有区分度的词
+        return (1 + math.log(count)) * idf
+
+    def salient_terms(self, since=None, until=None, sources=None, top_n=20):
+        """时间窗口内的显著词项：(1 + log 窗口内词频) × 全局逆文档频率，返回 [(term, weight)]"""
+        rows = self._window_rows(since, until, sources)
+        tf = Counter()
+        for tokens, _, _, _ in rows:
+            tf.update(set(tokens.split()))
+        if not tf:
+            return []
+        idf = self._idf(tf)
+        weights = {term: self._weight(count, idf[term]) for term, count in tf.items()
+                   if len(term) > 1 and not term.isdigit()}
+        return sorted(weights.items(), key=lambda kv: kv[1], reverse=True)[:top_n]
+
+    def top_items(self, since=None, until=None, sources=None, limit_per_source=50, top_terms=200):
+        """
+        按词项显著性为窗口内数据点打分，每个来源保留得分最高的 limit_per_source 条 (按时间排序返回)。
+        返回 {source: [{'timestamp', 'data'}]}，与 DataAggregator.get_raw_data_since 的结构一致。
+        """
+        rows = self._window_rows(since, until, sources)
+        tf = Counter()
+        row_terms = []
+        for tokens, _, _, _ in rows:
+            terms = set(tokens.split())
+            row_terms.append(terms)
+            tf.update(terms)
+        if not rows:
+            return {}
+        idf = self._idf(tf)
+        salient = dict(sorted(((t, self._weight(c, idf[t])) for t, c in tf.items()),
+                              key=lambda kv: kv[1], reverse=True)[:top_terms])
+
+        scored = {}
+        for (tokens, source, ts, payload), terms in zip(rows, row_terms):
+            score = sum(salient.get(t, 0.0) for t in terms) / math.sqrt(len(terms) or 1)
+            scored.setdefault(source, []).append((score, ts, payload))
+
+        selected = {}
+        for source, items in scored.items():
+            best = sorted(items, key=lambda item: item[0], reverse=True)[:limit_per_source]
+            best.sort(key=lambda item: item[1])
+            selected[source] = [
+                {'timestamp': datetime.fromtimestamp(ts).isoformat(), 'data': json.loads(payload)}
+                for _, ts, payload in best
+            ]
+        return selected
@@ -0,0 +1,206 @@
+# src/core/tenancy.py
+"""
+多租户模式：一个进程同时运行多个用户的采集与报告流水线。
+每个租户拥有独立的 DataAggregator (数据按租户分片，各自加锁) 和各自的 Agent 实例；
+以下资源由所有租户共享并有上限：调度器及其线程池、OCR 进程池、大模型客户端 (全局并发与速率限制)、
+邮件发件箱 (按发件账号复用 SMTP 连接) 以及文件监控的 Observer 线程。
+各租户的报告任务按租户ID确定性地错峰，避免所有人的报告在同一时刻生成。
+"""
+import os
+import re
+import copy
+import glob
+import hashlib
+import logging
+
+import yaml
+
+from core.data_aggregator import DataAggregator
+from core.llm_client import LLMClient
+from core.mail_outbox import EmailOutbox
+from core.ocr_pool import OCRPool
+from core.scheduler import setup_schedulers
+from core.search_index import ActivityIndex
+from agents.registry import create_agents, start_agents, stop_agents
+from agents.analyzer_agent import AnalyzerAgent
+
+logger = logging.getLogger(__name__)
+
+_TENANT_ID_RE = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+# 租户配置未显式指定时，按租户ID分目录存放的路径配置项
+TENANT_PATHS = (
+    ('core', 'report_output_dir'),
+    ('data_sources', 'screen_capture', 'output_dir'),
+    ('analysis', 'search_index', 'path'),
+    ('data_sources', 'file_monitor', 'snapshot_dir'),
+)
+
+
+def merge_config(base, override):
+    """深度合并两个配置字典，override 中的值优先"""
+    merged = copy.deepcopy(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def _get_path(config, keys):
+    for key in keys:
+        if not isinstance(config, dict) or key not in config:
+            return None
+        config = config[key]
+    return config
+
+
+def _namespace_path(path, tenant_id):
+    """./reports -> ./reports/<tenant>；./data/index/activity.db -> ./data/index/<tenant>/activity.db"""
+    directory, name = os.path.split(path)
+    if os.path.splitext(name)[1]:
+        return os.path.join(directory, tenant_id, name)
+    return os.path.join(path, tenant_id)
+
+
+def tenant_config(base_config, tenant_id, overrides):
+    """生成租户的完整配置：公共配置 + 租户配置，未在租户配置中指定的数据/报告目录按租户ID隔离"""
+    config = merge_config(base_config, overrides)
+    config.get('core', {}).pop('tenancy', None)
+    for keys in TENANT_PATHS:
+        base_value = _get_path(base_config, keys)
+        if base_value and _get_path(overrides, keys) is None:
+            section = config
+            for key in keys[:-1]:
+                section = section[key]
+            section[keys[-1]] = _namespace_path(base_value, tenant_id)
+    return config
+
+
+def load_tenant_configs(tenants_dir):
+    """读取 tenants_dir 下的 <tenant_id>.yaml，返回 {tenant_id: 租户配置}"""
+    tenants = {}
+    for path in sorted(glob.glob(os.path.join(tenants_dir, '*.yaml'))):
+        tenant_id = os.path.splitext(os.path.basename(path))[0]
+        if not _TENANT_ID_RE.match(tenant_id):
+            logger.error(f"Invalid tenant id '{tenant_id}' ({path}), skipping.")
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            tenants[tenant_id] = yaml.safe_load(f) or {}
+    return tenants
+
+
+def stagger_offset(tenant_id, window):
+    """根据租户ID得到 [0, window) 秒内的固定偏移量，重启或增减租户时不变"""
+    if window <= 0:
+        return 0
+    digest = hashlib.blake2b(tenant_id.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % int(window)
+
+
+class Tenant:
+    """单个租户的数据聚合器、全文索引、采集Agent与分析Agent"""
+
+    def __init__(self, tenant_id, config, resources):
+        self.tenant_id = tenant_id
+        self.config = config
+        self.job_prefix = f"{tenant_id}:"
+        self.data_aggregator = DataAggregator()
+
+        index_config = config.get('analysis', {}).get('search_index', {})
+        self.search_index = None
+        if index_config.get('enabled', False):
+            self.search_index = ActivityIndex(index_config.get('path', f'./data/index/{tenant_id}/activity.db'))
+            self.data_aggregator.add_listener(self.search_index.add)
+
+        # 先创建分析Agent：大模型配置有误时在创建采集Agent之前就失败
+        self.analyzer = AnalyzerAgent(config, self.data_aggregator, resources.get('outbox'), self.search_index,
+                                      resources.get('llm_client'))
+        self.agents = create_agents(config, self.data_aggregator, resources)
+
+    def start(self, scheduler, stagger_seconds=0):
+        setup_schedulers(scheduler, self.analyzer, self.config, self.job_prefix, stagger_seconds)
+        start_agents(self.agents, scheduler, self.config, self.job_prefix)
+
+    def stop(self):
+        stop_agents(self.agents)
+        if self.search_index:
+            self.search_index.close()
+
+
+class TenantManager:
+    """
+    加载并运行所有租户。
+    config.yaml 中 core.tenancy 的配置：
+      tenants_dir: 租户配置目录，每个 <tenant_id>.yaml 覆盖公共配置中的对应项
+      stagger_window: 报告任务错峰窗口 (秒)
+      ocr_workers: 共享OCR进程数
+    大模型并发与速率上限读取 llm.max_concurrency / llm.requests_per_minute。
+    """
+
+    def __init__(self, config):
+        self.config = config
+        tenancy_config = config.get('core', {}).get('tenancy', {})
+        self.tenants_dir = tenancy_config.get('tenants_dir', '../config/tenants')
+        self.stagger_window = tenancy_config.get('stagger_window', 1800)
+        self.ocr_workers = tenancy_config.get('ocr_workers', 2)
+        self.tenants = {}
+        self.resources = {}
+
+    def _create_resources(self, configs):
+        """只为至少一个租户用到的功能创建共享资源"""
+        def any_enabled(*keys):
+            return any((_get_path(config, keys) or {}).get('enabled', False) for config in configs)
+
+        resources = {'llm_client': LLMClient(self.config.get('llm', {}))}
+        if any_enabled('notifications', 'email'):
+            resources['outbox'] = EmailOutbox(self.config.get('notifications', {}).get('email', {}))
+            resources['outbox'].start()
+        if any_enabled('data_sources', 'screen_capture'):
+            resources['ocr_pool'] = OCRPool(self.ocr_workers)
+        if any_enabled('data_sources', 'file_monitor'):
+            from watchdog.observers import Observer
+            resources['observer'] = Observer()
+        return resources
+
+    def load(self):
+        """读取租户配置并创建各租户；单个租户配置有误时跳过该租户，不影响其他租户"""
+        overrides = load_tenant_configs(self.tenants_dir)
+        if not overrides:
+            logger.warning(f"No tenant configs found in {self.tenants_dir}.")
+        configs = {tenant_id: tenant_config(self.config, tenant_id, override)
+                   for tenant_id, override in overrides.items()}
+        self.resources = self._create_resources(configs.values())
+        for tenant_id, config in configs.items():
+            try:
+                self.tenants[tenant_id] = Tenant(tenant_id, config, self.resources)
+            except Exception as e:
+                logger.error(f"Error initializing tenant '{tenant_id}', skipping: {e}")
+        logger.info(f"Loaded {len(self.tenants)} of {len(overrides)} tenants from {self.tenants_dir}.")
+        return self.tenants
+
+    def start(self, scheduler):
+        if 'observer' in self.resources:
+            # 先启动共用的 Observer，各租户添加监控时即可发现 inotify 上限等错误并各自降级
+            self.resources['observer'].start()
+        for tenant_id, tenant in self.tenants.items():
+            offset = stagger_offset(tenant_id, self.stagger_window)
+            tenant.start(scheduler, offset)
+            logger.debug(f"Tenant '{tenant_id}' started, report jobs offset by {offset}s.")
+
+    def stop(self):
+        for tenant_id, tenant in self.tenants.items():
+            try:
+                tenant.stop()
+            except Exception as e:
+                logger.error(f"Error stopping tenant '{tenant_id}': {e}")
+        if 'observer' in self.resources:
+            self.resources['observer'].stop()
+            self.resources['observer'].join()
+        if 'ocr_pool' in self.resources:
+            self.resources['ocr_pool'].shutdown()
+        if 'outbox' in self.resources:
+            self.resources['outbox'].stop()
+        if 'llm_client' in self.resources:
+            self.resources['llm_client'].close()
@@ -0,0 +1,271 @@
+# src/core/topic_clustering.py
+"""
+本地主题聚类：在调用大模型之前压缩活动数据。
+把时间窗口内的数据点转成 TF-IDF 向量 (稀疏 CSR 结构，纯 NumPy 实现)，用加权球面 k-means 聚成若干主题，
+每个主题用最接近质心的数据点作为代表，并给出时间跨度、各来源数量和关键词。
+没有任何词表内词项的数据点 (如 OCR 为空的截图) TF-IDF 向量为零，与所有质心都不相似，
+不参与聚类，单独归入一个"未归类"分组。
+"""
+import math
+import logging
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from core.records import RecordView, unpack_record
+from core.search_index import tokenize, extract_text
+
+logger = logging.getLogger(__name__)
+
+
+class TopicCluster:
+    """一个主题簇的摘要"""
+    __slots__ = ('exemplar', 'start', 'end', 'count', 'sources', 'keywords', 'unclustered')
+
+    def __init__(self, exemplar, start, end, count, sources, keywords, unclustered=False):
+        self.exemplar = exemplar  # (source, timestamp, data)
+        self.start = start
+        self.end = end
+        self.count = count
+        self.sources = sources  # Counter {source: count}
+        self.keywords = keywords
+        self.unclustered = unclustered  # 没有可聚类文本的数据点
+
+
+class _Documents:
+    """去重后的文档集合：完全相同的文本只向量化一次，以出现次数作为权重"""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.index = {}  # (source, text) -> doc id
+        self.tokens = []
+        self.weights = []
+        self.sources = []
+        self.start = []
+        self.end = []
+        self.exemplars = []
+
+    def add(self, source, ts, data):
+        key = (source, extract_text(source, data))
+        doc_id = self.index.get(key)
+        if doc_id is None:
+            doc_id = self.index[key] = len(self.tokens)
+            # 主题通常在文本开头就能体现，长文本 (OCR、文档片段) 只取前 max_chars 个字符分词
+            self.tokens.append(tokenize(key[1][:self.max_chars]))
+            self.weights.append(1)
+            self.sources.append(source)
+            self.start.append(ts)
+            self.end.append(ts)
+            self.exemplars.append((ts, data))
+            return
+        self.weights[doc_id] += 1
+        if ts < self.start[doc_id]:
+            self.start[doc_id] = ts
+        if ts > self.end[doc_id]:
+            self.end[doc_id] = ts
+
+    def __len__(self):
+        return len(self.tokens)
+
+
+def _iter_points(items):
+    """遍历 (浮点时间戳, 数据) ；RecordView 直接读取时间戳列，避免逐条生成 ISO 字符串"""
+    if isinstance(items, RecordView):
+        for ts, record in zip(items.timestamps, items.records):
+            yield ts, unpack_record(record)
+        return
+    for item in items:
+        timestamp = item.get('timestamp')
+        try:
+            ts = datetime.fromisoformat(timestamp).timestamp()
+        except (TypeError, ValueError):
+            continue
+        yield ts, item.get('data', {})
+
+
+def _vectorize(token_lists, sources, max_features, min_df=2, max_source_df=0.5):
+    """构建 L2 归一化的 TF-IDF 稀疏矩阵，返回 (indptr, indices, values, vocabulary)"""
+    df = Counter()
+    source_df = {}
+    for tokens, source in zip(token_lists, sources):
+        terms = set(tokens)
+        df.update(terms)
+        source_df.setdefault(source, Counter()).update(terms)
+    n_docs = len(token_lists)
+
+    # 在某个来源的大多数数据点中都出现的词 (监控目录的路径前缀、扩展名等) 没有区分度
+    source_sizes = Counter(sources)
+    common = set()
+    for source, counts in source_df.items():
+        n_source = source_sizes[source]
+        if n_source >= 20:
+            common.update(term for term, count in counts.items() if count > max_source_df * n_source)
+    candidates = [(count, term) for term, count in df.items()
+                  if (count >= min_df or n_docs < 50) and term not in common and not term.isdigit()]
+    candidates.sort(reverse=True)
+    vocabulary = [term for _, term in candidates[:max_features]]
+    term_ids = {term: i for i, term in enumerate(vocabulary)}
+    idf = np.array([math.log((1 + n_docs) / (1 + df[term])) + 1 for term in vocabulary], dtype=np.float32)
+
+    indptr = np.zeros(n_docs + 1, dtype=np.int64)
+    indices, counts = [], []
+    for i, tokens in enumerate(token_lists):
+        tf = Counter(term_ids[t] for t in tokens if t in term_ids)
+        indices.extend(tf.keys())
+        counts.extend(tf.values())
+        indptr[i + 1] = len(indices)
+    indices = np.asarray(indices, dtype=np.int64)
+    values = (1 + np.log(np.asarray(counts, dtype=np.float32))) * idf[indices] if len(indices) else \
+        np.zeros(0, dtype=np.float32)
+
+    rows = np.repeat(np.arange(n_docs), np.diff(indptr))
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=n_docs)).astype(np.float32)
+    values = values / np.maximum(norms[rows], 1e-12)
+    return indptr, indices, values.astype(np.float32), vocabulary
+
+
+def _similarities(indptr, indices, values, centroids, batch_nnz=1 << 18):
+    """稀疏文档矩阵与稠密质心矩阵的余弦相似度 (n_docs × k)，按非零元分批计算以限制内存"""
+    n_docs = len(indptr) - 1
+    sims = np.zeros((n_docs, centroids.shape[0]), dtype=np.float32)
+    centroids_t = centroids.T  # V × k
+    start_row = 0
+    while start_row < n_docs:
+        # 选取非零元总数不超过 batch_nnz 的一批行
+        end_row = int(np.searchsorted(indptr, indptr[start_row] + batch_nnz, side='right')) - 1
+        end_row = min(max(end_row, start_row + 1), n_docs)
+        lo, hi = indptr[start_row], indptr[end_row]
+        if hi > lo:
+            contrib = values[lo:hi, None] * centroids_t[indices[lo:hi]]
+            # 行在 CSR 中连续存放，用 reduceat 按行求和 (空行跳过，保持为0)
+            lengths = np.diff(indptr[start_row:end_row + 1])
+            nonempty = np.flatnonzero(lengths)
+            offsets = indptr[start_row:end_row][nonempty] - lo
+            sims[start_row + nonempty] = np.add.reduceat(contrib, offsets, axis=0)
+        start_row = end_row
+    return sims
+
+
+def _centroids(indptr, indices, values, labels, weights, k, n_features):
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    flat = labels[rows] * n_features + indices
+    centroids = np.bincount(flat, weights=values * weights[rows], minlength=k * n_features)
+    centroids = centroids.reshape(k, n_features).astype(np.float32)
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    return centroids / np.maximum(norms, 1e-12)
+
+
+def _subset(indptr, indices, values, rows):
+    """取 CSR 矩阵的若干行"""
+    lengths = np.diff(indptr)[rows]
+    sub_indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=sub_indptr[1:])
+    positions = np.repeat(indptr[rows] - sub_indptr[:-1], lengths) + np.arange(sub_indptr[-1])
+    return sub_indptr, indices[positions], values[positions]
+
+
+def _kmeans(indptr, indices, values, weights, k, n_features, iterations, rng):
+    """加权球面 k-means，返回质心 (k × V，行已 L2 归一化)"""
+    n_docs = len(indptr) - 1
+    # 初始化：按权重随机选取 k 个不同的文档作为初始质心
+    initial = rng.choice(n_docs, size=k, replace=False, p=weights / weights.sum())
+    labels = np.zeros(n_docs, dtype=np.int64)
+    labels[initial] = np.arange(k)
+    seed_weights = np.zeros(n_docs, dtype=np.float32)
+    seed_weights[initial] = 1.0
+    centroids = _centroids(indptr, indices, values, labels, seed_weights, k, n_features)
+
+    for _ in range(iterations):
+        new_labels = _similarities(indptr, indices, values, centroids).argmax(axis=1)
+        changed = int((new_labels != labels).sum())
+        labels = new_labels
+        centroids = _centroids(indptr, indices, values, labels, weights, k, n_features)
+        if changed <= n_docs // 1000:
+            break
+    return centroids
+
+
+def cluster_activity(filtered_data, max_clusters=30, max_features=8192, iterations=12, sample_size=20000,
+                     max_chars=240, seed=0, top_keywords=8):
+    """
+    对 {source: [{'timestamp', 'data'}]} 形式的数据做主题聚类，返回按数据量降序排列的 TopicCluster 列表；
+    没有可聚类文本的数据点归入排在最后的一个 unclustered 分组。
+    不同文本超过 sample_size 条时，先在按权重抽取的样本上迭代求质心，再对全部文本做一次归类。
+    """
+    docs = _Documents(max_chars)
+    for source, items in filtered_data.items():
+        for ts, data in _iter_points(items):
+            docs.add(source, ts, data)
+    n_docs = len(docs)
+    if n_docs == 0:
+        return []
+
+    indptr, indices, values, vocabulary = _vectorize(docs.tokens, docs.sources, max_features)
+    weights = np.asarray(docs.weights, dtype=np.float32)
+    # 零向量与所有质心的相似度都为 0，argmax 会把它们全部归入第一个簇
+    has_terms = np.diff(indptr) > 0
+    empty = np.flatnonzero(~has_terms)
+    clusters = []
+    if has_terms.any():
+        rows = np.flatnonzero(has_terms)
+        if len(empty):
+            indptr, indices, values = _subset(indptr, indices, values, rows)
+        clusters = _cluster_rows(docs, rows, indptr, indices, values, weights[rows], vocabulary, max_clusters,
+                                 iterations, sample_size, seed, top_keywords)
+    clusters.sort(key=lambda cluster: cluster.count, reverse=True)
+    if len(empty):
+        exemplar = empty[int(weights[empty].argmax())]  # 出现次数最多的一条
+        clusters.append(_summary(docs, empty, exemplar, weights, [], unclustered=True))
+    logger.info(f"Clustered {int(weights.sum())} data points ({n_docs} unique, {len(empty)} without terms) "
+                f"into {len(clusters)} topics.")
+    return clusters
+
+
+def _cluster_rows(docs, rows, indptr, indices, values, weights, vocabulary, max_clusters, iterations, sample_size,
+                  seed, top_keywords):
+    """对有词项的文档 (rows 为其在 docs 中的编号，矩阵只含这些行) 做 k-means 并生成各簇摘要"""
+    n_docs = len(rows)
+    n_features = max(len(vocabulary), 1)
+    k = max(1, min(max_clusters, n_docs, int(math.sqrt(n_docs / 2)) + 1))
+
+    rng = np.random.default_rng(seed)
+    if n_docs > sample_size:
+        sample = np.sort(rng.choice(n_docs, size=sample_size, replace=False, p=weights / weights.sum()))
+        sub_indptr, sub_indices, sub_values = _subset(indptr, indices, values, sample)
+        centroids = _kmeans(sub_indptr, sub_indices, sub_values, weights[sample], k, n_features, iterations, rng)
+    else:
+        centroids = _kmeans(indptr, indices, values, weights, k, n_features, iterations, rng)
+    sims = _similarities(indptr, indices, values, centroids)
+    labels = sims.argmax(axis=1)
+    best_sim = sims[np.arange(n_docs), labels]
+
+    all_weights = np.asarray(docs.weights, dtype=np.float32)
+    vocabulary = np.asarray(vocabulary, dtype=object)
+    clusters = []
+    for c in range(k):
+        members = np.flatnonzero(labels == c)
+        if len(members) == 0:
+            continue
+        exemplar = rows[members[int(best_sim[members].argmax())]]
+        top_terms = np.argsort(centroids[c])[::-1][:top_keywords]
+        keywords = [vocabulary[t] for t in top_terms if centroids[c, t] > 0] if len(vocabulary) else []
+        clusters.append(_summary(docs, rows[members], exemplar, all_weights, keywords))
+    return clusters
+
+
+def _summary(docs, members, exemplar, weights, keywords, unclustered=False):
+    """由成员文档编号生成 TopicCluster"""
+    source_counts = Counter()
+    for member in members:
+        source_counts[docs.sources[member]] += int(weights[member])
+    exemplar_ts, exemplar_data = docs.exemplars[exemplar]
+    return TopicCluster(
+        exemplar=(docs.sources[exemplar], datetime.fromtimestamp(exemplar_ts).isoformat(), exemplar_data),
+        start=datetime.fromtimestamp(min(docs.start[member] for member in members)).isoformat(),
+        end=datetime.fromtimestamp(max(docs.end[member] for member in members)).isoformat(),
+        count=int(weights[members].sum()),
+        sources=source_counts,
+        keywords=keywords,
+        unclustered=unclustered,
+    )
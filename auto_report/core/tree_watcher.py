@@ -0,0 +1,435 @@
+# src/core/tree_watcher.py
+"""
+超大目录树的文件监控 (data_sources.file_monitor.mode: scalable)。
+Linux 上 inotify 按目录计数 (fs.inotify.max_user_watches)，对整个 monorepo 递归监控会耗尽上限，
+启动时逐个目录注册监控也很慢；而且 watchdog 的每个监控都占用一个 inotify 实例和一个线程。
+本模块在后台线程中按优先级分配监控：
+  - 先处理 priority_paths，再处理根目录；子树的目录数不超过剩余额度时整体递归监控，
+    否则拆分为"轮询该目录下的文件 + 依次处理各子目录 (最近修改的优先)"；
+  - 额度、监控数用尽或注册监控失败 (达到系统上限) 后，其余子树改用基于 scandir 的快照比对轮询，
+    快照持久化到磁盘，重启后可发现停机期间的变化；
+  - 运行中持续调整：轮询发现被拆分目录下新建的子目录时，额度允许则为其添加监控，否则递归轮询；
+    有变化的递归轮询子树在额度允许时升级为监控；被删除的子目录释放其额度；
+  - 通过指标和 health() 报告监控/轮询的目录数。
+"""
+import os
+import gzip
+import json
+import hashlib
+import time
+import logging
+import threading
+from collections import deque
+
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileModifiedEvent
+from watchdog.observers.api import ObservedWatch
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+WATCHED_DIRS = metrics.gauge('autoreport_file_watched_dirs', "Directories covered by native filesystem watches", ['root'])
+POLLED_DIRS = metrics.gauge('autoreport_file_polled_dirs', "Directories covered by the snapshot poller", ['root'])
+POLLED_FILES = metrics.gauge('autoreport_file_polled_files', "Files tracked by the snapshot poller", ['root'])
+WATCH_FALLBACKS = metrics.counter('autoreport_file_watch_fallbacks', "Subtrees polled because a watch could not be registered", ['root'])
+POLL_DURATION = metrics.histogram('autoreport_file_poll_seconds', "Snapshot poll duration", ['root'])
+
+DEFAULT_EXCLUDE = ('.git', '.hg', '.svn', 'node_modules', '__pycache__', '.venv', '.tox', '.mypy_cache', '.idea')
+
+
+def _read_limit(name, default):
+    try:
+        with open(f'/proc/sys/fs/inotify/{name}', 'r') as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return default
+
+
+def default_watch_budget():
+    """默认最多使用系统 inotify 目录监控上限的一半，给其他程序 (IDE、构建工具) 留出余量"""
+    return max(_read_limit('max_user_watches', 16384) // 2, 1)
+
+
+def default_watch_units():
+    """每个递归监控占用一个 inotify 实例 (fs.inotify.max_user_instances，通常为 128)"""
+    return max(min(_read_limit('max_user_instances', 128) // 4, 64), 1)
+
+
+def count_dirs(path, limit):
+    """统计 path 子树中的目录数 (含 path 本身，不跟随符号链接)，超过 limit 时提前返回 limit + 1"""
+    count = 0
+    stack = [path]
+    while stack:
+        count += 1
+        if count > limit:
+            return count
+        try:
+            with os.scandir(stack.pop()) as entries:
+                stack.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+        except OSError:
+            continue
+    return count
+
+
+def _is_under(path, parent):
+    return path == parent or path.startswith(parent.rstrip(os.sep) + os.sep)
+
+
+class TreeWatcher:
+    """
+    config 为 data_sources.file_monitor：
+      priority_paths: 优先监控的子目录 (相对 watch_path 或绝对路径)
+      max_watches: 原生监控最多覆盖的目录数，默认为系统上限的一半
+      max_watch_units: 最多注册的递归监控数
+      min_split_budget: 剩余额度低于该值时不再拆分子树，直接轮询
+      poll_interval: 轮询间隔 (秒)
+      exclude: 轮询时跳过的目录名
+      snapshot_dir: 轮询快照的保存目录
+    """
+
+    def __init__(self, root, observer, handler, config, shared_observer=False):
+        self.root = os.path.normpath(root)
+        self.observer = observer
+        self.handler = handler
+        self.shared_observer = shared_observer
+        self.priority_paths = [os.path.normpath(os.path.join(self.root, path))
+                               for path in config.get('priority_paths') or []]
+        self.max_watches = config.get('max_watches') or default_watch_budget()
+        self.max_watch_units = config.get('max_watch_units') or default_watch_units()
+        self.min_split_budget = config.get('min_split_budget', 64)
+        self.poll_interval = config.get('poll_interval', 120)
+        self.exclude = set(config.get('exclude', DEFAULT_EXCLUDE))
+        # 快照文件按监控根目录区分
+        snapshot_name = f"{hashlib.blake2b(self.root.encode('utf-8'), digest_size=8).hexdigest()}.json.gz"
+        self.snapshot_file = os.path.join(config.get('snapshot_dir', './data/file_monitor'), snapshot_name)
+
+        self.watches = []  # [(path, ObservedWatch, 目录数)]
+        self.polled = []  # [(path, 是否递归)]
+        self.watch_limit_hit = False
+        self._remaining = self.max_watches  # 剩余的监控目录额度
+        self._split = {}  # {被拆分的目录: 已处理的子目录集合}
+        self.ready = threading.Event()  # 监控分配完成且已建立首次快照
+        self._snapshots = {}  # {path: {文件路径: 签名}}
+        self._polled_dirs = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # --- 生命周期 ---
+
+    def start(self):
+        """在后台分配监控并开始轮询；调用前 observer 应已启动，以便注册失败时立即发现"""
+        self._thread = threading.Thread(target=self._run, name='tree-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self.shared_observer:
+            # 共用的 Observer 由所有者停止，这里只移除自己的处理器
+            for _, watch, _ in self.watches:
+                try:
+                    self.observer.remove_handler_for_watch(self.handler, watch)
+                except KeyError:
+                    pass
+        self.watches = []
+
+    def health(self):
+        return {
+            'watched_dirs': sum(n_dirs for _, _, n_dirs in self.watches),
+            'watch_units': len(self.watches),
+            'polled_dirs': self._polled_dirs,
+            'polled_units': len(self.polled),
+            'polled_files': sum(len(files) for files in self._snapshots.values()),
+            'watch_budget': self.max_watches,
+            'watch_limit_hit': self.watch_limit_hit,
+        }
+
+    def _run(self):
+        try:
+            started = time.perf_counter()
+            self._plan()
+            self._initial_poll()
+            health = self.health()
+            logger.info(f"File monitor on {self.root} ready in {time.perf_counter() - started:.1f}s: "
+                        f"{health['watched_dirs']} dirs watched in {health['watch_units']} subtrees, "
+                        f"{health['polled_dirs']} dirs polled every {self.poll_interval}s"
+                        f"{' (watch limit reached)' if self.watch_limit_hit else ''}.")
+        except Exception as e:
+            logger.error(f"Error setting up file monitoring for {self.root}: {e}")
+        finally:
+            self.ready.set()
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error polling {self.root} for changes: {e}")
+
+    # --- 监控分配 ---
+
+    def _children(self, path):
+        """子目录，最近修改的 (通常是正在工作的) 优先"""
+        children = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.name not in self.exclude and entry.is_dir(follow_symlinks=False):
+                            children.append((entry.stat(follow_symlinks=False).st_mtime, entry.path))
+                    except OSError:
+                        continue
+        except OSError:
+            return []
+        children.sort(reverse=True)
+        return [path for _, path in children]
+
+    def _can_watch(self, n_dirs):
+        return not self.watch_limit_hit and len(self.watches) < self.max_watch_units and n_dirs <= self._remaining
+
+    def _watch(self, path, n_dirs):
+        try:
+            watch = self.observer.schedule(self.handler, path, recursive=True)
+        except OSError as e:
+            # 达到系统上限 (ENOSPC/EMFILE)：移除注册了一半的处理器，其余子树全部改为轮询
+            try:
+                self.observer.remove_handler_for_watch(self.handler, ObservedWatch(path, recursive=True))
+            except KeyError:
+                pass
+            self.watch_limit_hit = True
+            WATCH_FALLBACKS.labels(self.root).inc()
+            # watchdog 的 inotify 后端不会释放失败前已注册的目录监控，它们在进程重启前一直占用系统额度
+            logger.warning(f"Could not watch {path} ({e}), polling it and remaining subtrees instead. "
+                           f"Watches registered before the failure stay in use until restart.")
+            return False
+        self.watches.append((path, watch, n_dirs))
+        self._remaining -= n_dirs
+        WATCHED_DIRS.labels(self.root).set(sum(n for _, _, n in self.watches))
+        return True
+
+    def _unwatch(self, path):
+        """移除 path 及其下的监控 (目录已被删除)，释放额度"""
+        kept = []
+        for watch_path, watch, n_dirs in self.watches:
+            if not _is_under(watch_path, path):
+                kept.append((watch_path, watch, n_dirs))
+                continue
+            try:
+                if self.shared_observer:
+                    self.observer.remove_handler_for_watch(self.handler, watch)
+                else:
+                    self.observer.unschedule(watch)
+            except (KeyError, OSError):
+                pass
+            self._remaining += n_dirs
+        self.watches = kept
+        WATCHED_DIRS.labels(self.root).set(sum(n for _, _, n in self.watches))
+
+    def _plan(self):
+        """按优先级为各子树选择 递归监控 / 拆分 / 递归轮询"""
+        covered = []  # 已被递归监控或递归轮询覆盖的子树
+        planned = set()  # 已处理的目录：被拆分的优先目录还会作为其父目录的子目录再次入队
+        queue = deque(path for path in self.priority_paths if _is_under(path, self.root) and os.path.isdir(path))
+        queue.append(self.root)
+        while queue and not self._stop_event.is_set():
+            path = queue.popleft()
+            if path in planned or any(_is_under(path, parent) for parent in covered):
+                continue
+            planned.add(path)
+            # 子树中已有单独处理的优先目录：只能拆分，不能整体监控或轮询
+            nested = any(_is_under(parent, path) for parent in covered)
+            can_watch = self._can_watch(1)
+            if not nested and can_watch:
+                n_dirs = count_dirs(path, self._remaining)
+                if self._can_watch(n_dirs) and self._watch(path, n_dirs):
+                    covered.append(path)
+                    continue
+                can_watch = not self.watch_limit_hit
+            if nested or (can_watch and self._remaining >= self.min_split_budget):
+                children = self._children(path)
+                self.polled.append((path, False))
+                self._split[path] = set(children)
+                queue.extend(children)
+            else:
+                self.polled.append((path, True))
+                covered.append(path)
+
+    # --- 快照轮询 ---
+
+    def _scan(self, path, recursive):
+        """
+        返回 ({文件路径: 签名}, 目录数, 子目录集合)；签名由 mtime 与大小组成 (整数元组的 hash 不随进程变化)。
+        子目录集合只在非递归扫描 (被拆分的目录) 时收集，用于发现新建的子目录。
+        """
+        files = {}
+        children = set()
+        n_dirs = 0
+        stack = [path]
+        while stack:
+            n_dirs += 1
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name in self.exclude:
+                                continue
+                            if recursive:
+                                stack.append(entry.path)
+                            else:
+                                children.add(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            files[entry.path] = hash((stat.st_mtime_ns, stat.st_size))
+                    except OSError:
+                        continue
+        return files, n_dirs, children
+
+    def _diff(self, old, current):
+        """比对快照并分发事件，返回事件数"""
+        n_events = 0
+        for file_path, signature in current.items():
+            old_signature = old.get(file_path)
+            if old_signature is None:
+                self.handler.dispatch(FileCreatedEvent(file_path))
+                n_events += 1
+            elif old_signature != signature:
+                self.handler.dispatch(FileModifiedEvent(file_path))
+                n_events += 1
+        for file_path in old.keys() - current.keys():
+            self.handler.dispatch(FileDeletedEvent(file_path))
+            n_events += 1
+        return n_events
+
+    def poll(self, previous=None):
+        """扫描所有轮询的子树，与上次快照比对后分发 created/modified/deleted 事件，并按变化调整监控"""
+        started = time.perf_counter()
+        previous = previous if previous is not None else self._snapshots
+        snapshots, n_dirs, n_events = {}, 0, 0
+        added, removed, active = [], [], []
+        for path, recursive in self.polled:
+            if self._stop_event.is_set():
+                return
+            current, unit_dirs, children = self._scan(path, recursive)
+            snapshots[path] = current
+            n_dirs += unit_dirs
+            if not recursive and path in self._split:
+                known = self._split[path]
+                added.extend(sorted(children - known))
+                removed.extend(known - children)
+                self._split[path] = children
+            old = previous.get(path)
+            if old is None:
+                continue  # 首次扫描只建立基准
+            unit_events = self._diff(old, current)
+            n_events += unit_events
+            if recursive and unit_events:
+                active.append((path, unit_dirs))
+
+        for path in removed:
+            self._forget(path, snapshots)
+        for path in added:
+            n_dirs, n_events = self._place_new(path, snapshots, n_dirs, n_events)
+        for path, unit_dirs in active:
+            if self._promote(path, snapshots):
+                n_dirs -= unit_dirs
+
+        changed = n_events or snapshots.keys() != self._snapshots.keys()
+        self._snapshots = snapshots
+        self._polled_dirs = n_dirs
+        POLLED_DIRS.labels(self.root).set(n_dirs)
+        POLLED_FILES.labels(self.root).set(sum(len(files) for files in snapshots.values()))
+        POLL_DURATION.labels(self.root).observe(time.perf_counter() - started)
+        if changed:
+            self._save_snapshots()
+        if n_events:
+            logger.info(f"Poller found {n_events} file change(s) under {self.root}.")
+
+    # --- 运行中调整 ---
+
+    def _place_new(self, path, snapshots, n_dirs, n_events):
+        """
+        被拆分目录下新建的子目录：额度允许时添加监控，否则递归轮询。
+        目录是新建的，其中已有的文件 (在监控生效或首次扫描之前创建) 都作为 created 事件分发。
+        """
+        count = count_dirs(path, self._remaining)
+        if self._can_watch(count) and self._watch(path, count):
+            current, _, _ = self._scan(path, True)
+            logger.debug("Watching new directory %s (%d dirs).", path, count)
+        else:
+            self.polled.append((path, True))
+            current, unit_dirs, _ = self._scan(path, True)
+            snapshots[path] = current
+            n_dirs += unit_dirs
+            logger.debug("Polling new directory %s.", path)
+        return n_dirs, n_events + self._diff({}, current)
+
+    def _promote(self, path, snapshots):
+        """有变化的递归轮询子树在额度允许时改为监控 (本轮扫描已分发了此前的变化)"""
+        if not self._can_watch(1):
+            return False
+        n_dirs = count_dirs(path, self._remaining)  # 监控覆盖轮询时跳过的目录 (如 node_modules)
+        if not self._can_watch(n_dirs) or not self._watch(path, n_dirs):
+            return False
+        self.polled.remove((path, True))
+        snapshots.pop(path, None)
+        logger.info(f"Promoted active subtree {path} ({n_dirs} dirs) from polling to a native watch.")
+        return True
+
+    def _forget(self, path, snapshots):
+        """子目录已被删除：移除其下的监控、轮询单元与拆分记录 (删除事件已由监控或本轮扫描分发)"""
+        self._unwatch(path)
+        self.polled = [(unit, recursive) for unit, recursive in self.polled if not _is_under(unit, path)]
+        for unit in [unit for unit in snapshots if _is_under(unit, path)]:
+            del snapshots[unit]
+        for unit in [unit for unit in self._split if _is_under(unit, path)]:
+            del self._split[unit]
+
+    def _load_snapshots(self):
+        """读取上次保存的快照，返回 {path: {'recursive', 'files'}}"""
+        try:
+            with gzip.open(self.snapshot_file, 'rt', encoding='utf-8') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable file monitor snapshot {self.snapshot_file}: {e}")
+            return {}
+        if saved.get('root') != self.root:
+            return {}
+        return saved.get('units', {})
+
+    def _initial_poll(self):
+        """
+        首次轮询：本次同样以相同方式轮询的子树与上次快照比对；
+        其余保存过快照的子树 (如停机期间有变化、重启后因最近修改而改为监控的目录) 按上次的方式扫描一次，
+        分发停机期间的变化后丢弃其快照。
+        """
+        units = self._load_snapshots()
+        polled = set(self.polled)
+        previous, n_events = {}, 0
+        for path, unit in units.items():
+            recursive = unit.get('recursive')
+            if (path, recursive) in polled:
+                previous[path] = unit['files']
+            elif os.path.isdir(path) and not self._stop_event.is_set():
+                current, _, _ = self._scan(path, recursive)
+                n_events += self._diff(unit['files'], current)
+        if n_events:
+            logger.info(f"Found {n_events} file change(s) under {self.root} made while monitoring was stopped.")
+        self.poll(previous)
+
+    def _save_snapshots(self):
+        recursive = dict(self.polled)
+        payload = {'root': self.root, 'units': {path: {'recursive': recursive[path], 'files': files}
+                                                for path, files in self._snapshots.items()}}
+        os.makedirs(os.path.dirname(self.snapshot_file) or '.', exist_ok=True)
+        tmp_path = self.snapshot_file + '.tmp'
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=1) as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_file)
+        except OSError as e:
+            logger.error(f"Error saving file monitor snapshot {self.snapshot_file}: {e}")
@@ -3,13 +3,13 @@ import os
 import logging
 import signal
 import sys
-from apscheduler.schedulers.blocking import BlockingScheduler
-from core.scheduler import setup_schedulers
+from core.scheduler import setup_schedulers, create_scheduler
+from core.job_tracker import JobTracker
 from core.data_aggregator import DataAggregator
-from agents.screen_agent import ScreenCaptureAgent
-from agents.file_agent import FileMonitorAgent
-from agents.document_agent import DocumentReaderAgent
-from agents.api_agent import LarkDataAgent
+from core.mail_outbox import EmailOutbox
+from core.metrics import start_metrics_server
+from core.search_index import ActivityIndex
+from agents.registry import create_agents, start_agents, stop_agents
 from agents.analyzer_agent import AnalyzerAgent  # 新增导入
 from utils.logger import setup_logger
 import yaml
@@ -30,6 +30,62 @@ def signal_handler(sig, frame):
     sys.exit(0)
 
 
+def start_single_user(config, scheduler):
+    """单用户模式：创建数据聚合器、采集Agent与分析Agent并添加调度任务，返回停机时依次调用的清理函数"""
+    data_aggregator = DataAggregator()
+    shutdown_hooks = []
+
+    # --- 全文索引 (可选)：随 add_data 增量更新，用于按主题/显著性选取数据 ---
+    index_config = config.get('analysis', {}).get('search_index', {})
+    search_index = None
+    if index_config.get('enabled', False):
+        search_index = ActivityIndex(index_config.get('path', './data/index/activity.db'))
+        data_aggregator.add_listener(search_index.add)
+
+    # --- 按模块化配置初始化各数据采集Agent (仅导入已启用数据源的依赖) ---
+    agents = create_agents(config, data_aggregator)
+    shutdown_hooks.append(lambda: stop_agents(agents))
+
+    # --- 初始化邮件发件箱 (后台异步发送) ---
+    email_config = config.get('notifications', {}).get('email', {})
+    outbox = EmailOutbox(email_config) if email_config.get('enabled', False) else None
+    if outbox:
+        outbox.start()
+        shutdown_hooks.append(outbox.stop)
+    if search_index:
+        shutdown_hooks.append(search_index.close)
+
+    # --- 初始化核心分析Agent ---
+    analyzer_agent = AnalyzerAgent(config, data_aggregator, outbox, search_index)
+    setup_schedulers(scheduler, analyzer_agent, config)
+
+    # --- 启动需要持续运行的采集/监控/扫描任务 ---
+    start_agents(agents, scheduler, config)
+    return data_aggregator, shutdown_hooks
+
+
+def start_collector(config, scheduler):
+    """采集端模式：只运行数据采集Agent，数据批量推送到中心节点 (core.collector)，不生成报告"""
+    from core.remote_aggregator import RemoteAggregator
+    remote_aggregator = RemoteAggregator(config.get('core', {}).get('collector', {}))
+    remote_aggregator.start()
+    agents = create_agents(config, remote_aggregator)
+    start_agents(agents, scheduler, config)
+    return [lambda: stop_agents(agents), remote_aggregator.stop]
+
+
+def start_ingest(config, resolve):
+    """中心节点：重放接入日志后启动 /ingest 端点，resolve(collector_id) 返回对应的 DataAggregator"""
+    from core.ingest import IngestStore, start_ingest_server
+    ingest_config = config.get('core', {}).get('ingest', {})
+    store = IngestStore(resolve, ingest_config.get('journal_dir', './data/ingest'), ingest_config.get('fsync', False),
+                        ingest_config.get('segment_bytes', 64 * 1024 * 1024), ingest_config.get('segment_hours', 24),
+                        ingest_config.get('retention_days', 400))
+    store.replay()
+    server = start_ingest_server(ingest_config, store)
+    return [server.shutdown]
+
+
 def main():
     """主函数"""
     config = load_config()
@@ -39,62 +95,56 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
-    data_aggregator = DataAggregator()
-
-    # --- 按模块化配置初始化各数据采集Agent ---
-    data_sources_config = config.get('data_sources', {})
-
-    screen_agent = ScreenCaptureAgent(
-        data_sources_config.get('screen_capture', {}),
-        data_aggregator
-    ) if data_sources_config.get('screen_capture', {}).get('enabled', False) else None
-
-    file_agent = FileMonitorAgent(
-        data_sources_config.get('file_monitor', {}),
-        data_aggregator
-    ) if data_sources_config.get('file_monitor', {}).get('enabled', False) else None
-
-    document_agent = DocumentReaderAgent(
-        data_sources_config.get('document_reader', {}),
-        data_aggregator
-    ) if data_sources_config.get('document_reader', {}).get('enabled', False) else None
-
-    lark_agent = LarkDataAgent(
-        data_sources_config.get('third_party_apis', {}).get('lark', {}),
-        data_aggregator
-    ) if data_sources_config.get('third_party_apis', {}).get('lark', {}).get('enabled', False) else None
-
-    # --- 初始化核心分析Agent ---
-    analyzer_agent = AnalyzerAgent(config, data_aggregator)
-
-    scheduler = BlockingScheduler()
-    # 传递所有Agent给调度器
-    setup_schedulers(
-        scheduler,
-        screen_agent,
-        file_agent,
-        document_agent,
-        lark_agent,
-        analyzer_agent,  # 传递 analyzer_agent
-        config
-    )
-
-    # --- 启动需要持续运行的监控/扫描任务 ---
-    if file_agent:
-        file_agent.start_monitoring()
-    if document_agent:
-        document_agent.start_periodic_scan(scheduler)
+    # --- 本地指标端点 (Prometheus 格式) ---
+    start_metrics_server(config.get('core', {}).get('metrics', {}))
+
+    # --- 运行角色：standalone (单机)、collector (只采集并推送)、central (接收采集端数据并生成报告) ---
+    role = config.get('core', {}).get('role', 'standalone')
+    scheduler = create_scheduler(config)
+    if role == 'collector':
+        shutdown_hooks = start_collector(config, scheduler)
+    elif config.get('core', {}).get('tenancy', {}).get('enabled', False):
+        # --- 多租户模式：一个进程运行 core.tenancy.tenants_dir 下所有用户的流水线 ---
+        from core.tenancy import TenantManager
+        tenant_manager = TenantManager(config)
+        tenants = tenant_manager.load()
+        tenant_manager.start(scheduler)
+        shutdown_hooks = [tenant_manager.stop]
+        if role == 'central':
+            # 采集端ID即租户ID
+            resolve = lambda collector_id: getattr(tenants.get(collector_id), 'data_aggregator', None)
+            shutdown_hooks = start_ingest(config, resolve) + shutdown_hooks
+    else:
+        data_aggregator, shutdown_hooks = start_single_user(config, scheduler)
+        if role == 'central':
+            # 单用户中心节点：所有采集端的数据汇入同一个聚合器
+            shutdown_hooks = start_ingest(config, lambda collector_id: data_aggregator) + shutdown_hooks
+
+    # --- 任务运行统计与停机期间错过任务的补跑 ---
+    scheduler_config = config.get('core', {}).get('scheduler', {})
+    job_tracker = JobTracker(scheduler_config.get('state_file', './data/scheduler/job_state.json'),
+                             scheduler_config.get('save_interval', 60))
+    job_tracker.attach(scheduler, scheduler_config.get('catch_up_grace', 86400))
+    shutdown_hooks.append(job_tracker.stop)
+
+    # --- 按需剖析任务 (控制文件 / SIGUSR1 / 配置)，须在所有任务添加完成后启用 ---
+    profiling_config = config.get('core', {}).get('profiling', {})
+    if profiling_config.get('enabled', False):
+        from core.profiling import JobProfiler
+        profiler = JobProfiler(profiling_config, lambda: load_config().get('core', {}).get('profiling', {}))
+        profiler.attach(scheduler)
+        shutdown_hooks.append(profiler.stop)
 
     try:
         logger.info("AutoReport Agent is running. Press Ctrl+C to exit.")
         scheduler.start()
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, SystemExit):
         logger.info("Shutting down AutoReport Agent...")
         scheduler.shutdown()
-        if file_agent:
-            file_agent.stop_monitoring()
+        for hook in shutdown_hooks:
+            hook()
         logger.info("AutoReport Agent shut down.")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,6 @@
+# auto_report/tests/conftest.py
+import os
+import sys
+
+# 与 main.py 相同，模块以 auto_report 目录为根导入 (from core import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,97 @@
+# src/tests/test_activity_stats.py
+import time
+from datetime import datetime
+
+import pytest
+
+from core.activity_stats import compute_activity_stats
+from core.data_aggregator import DataAggregator
+from agents.analyzer_agent import AnalyzerAgent
+
+# 报告窗口跨越 2026-03-29 02:00 的夏令时切换 (CET -> CEST)
+SINCE = datetime(2026, 3, 16)  # 星期一
+UNTIL = datetime(2026, 4, 1, 12, 0)  # 星期三
+POINTS = [
+    (datetime(2026, 3, 17, 9, 0), '/repo/billing/api/invoice.py'),
+    (datetime(2026, 3, 17, 9, 5), '/repo/billing/api/invoice.py'),
+    (datetime(2026, 3, 17, 9, 10), '/repo/billing/api/tax.py'),
+    (datetime(2026, 3, 18, 14, 0), '/repo/search/core/query.py'),
+    (datetime(2026, 3, 24, 9, 0), '/repo/billing/api/invoice.py'),
+    (datetime(2026, 3, 24, 9, 2), '/repo/billing/api/refund.py'),  # 与上一条在同一个 5 分钟分箱
+    (datetime(2026, 3, 29, 1, 30), '/repo/search/core/ranking.py'),  # 切换前 (UTC 00:30)
+    (datetime(2026, 3, 29, 10, 0), '/repo/billing/db/schema.sql'),  # 切换后
+    (datetime(2026, 3, 31, 10, 0), '/repo/billing/api/invoice.py'),
+]
+BIN_HOURS = 5 / 60
+
+
+@pytest.fixture(autouse=True)
+def berlin_time(monkeypatch):
+    monkeypatch.setenv('TZ', 'Europe/Berlin')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def file_events():
+    aggregator = DataAggregator()
+    for local_time, path in POINTS:
+        aggregator.add_data('file', {'event_type': 'modified', 'src_path': path}, timestamp=local_time)
+    return aggregator.get_raw_data_since(SINCE, UNTIL)
+
+
+def test_hour_of_day_across_dst_change():
+    stats = compute_activity_stats(file_events(), SINCE, UNTIL)
+    assert stats.total == 9
+    assert stats.active_hours == pytest.approx(8 * BIN_HOURS)
+    expected = [0.0] * 24
+    expected[1] = BIN_HOURS  # 01:30 仍在冬令时，不能被算到 02 点
+    expected[9] = 4 * BIN_HOURS
+    expected[10] = 2 * BIN_HOURS
+    expected[14] = BIN_HOURS
+    assert stats.hour_of_day == pytest.approx(expected)
+    assert stats.active_days == 5
+    assert stats.weekday_hours[1] == pytest.approx(5 * BIN_HOURS)  # 星期二：3/17、3/24、3/31
+
+
+def test_directory_labels_and_recent_window():
+    stats = compute_activity_stats(file_events(), SINCE, UNTIL, directory_depth=2)
+    rows = {row['directory']: row for row in stats.directories}
+    assert [row['directory'] for row in stats.directories] == ['billing/api', 'search/core', 'billing/db']
+    assert rows['billing/api']['events'] == 6 and rows['billing/api']['days'] == 3
+    assert rows['billing/api']['share'] == pytest.approx(6 / 9)
+    assert rows['billing/api']['hours'] == pytest.approx(5 * BIN_HOURS)
+    assert stats.recent_window
+    # 最近 7 天从 3/25 12:00 起 (本地时间)，之前 7 天从 3/18 12:00 起
+    assert (rows['billing/api']['recent'], rows['billing/api']['previous']) == (1, 2)
+    assert (rows['search/core']['recent'], rows['search/core']['previous']) == (1, 1)
+    assert (rows['billing/db']['recent'], rows['billing/db']['previous']) == (1, 0)
+
+    by_depth = compute_activity_stats(file_events(), SINCE, UNTIL, directory_depth=1)
+    assert [(row['directory'], row['events']) for row in by_depth.directories] == [('billing', 7), ('search', 2)]
+
+
+def test_weeks_and_partial_week_deltas(tmp_path):
+    stats = compute_activity_stats(file_events(), SINCE, UNTIL)
+    assert [(str(week['start']), week['partial'], week['events']) for week in stats.weeks] == [
+        ('2026-03-16', False, 4), ('2026-03-23', False, 4), ('2026-03-30', True, 1)]
+    assert [week['active_hours'] for week in stats.weeks] == pytest.approx([4 * BIN_HOURS, 3 * BIN_HOURS, BIN_HOURS])
+
+    analyzer = AnalyzerAgent({'core': {'report_output_dir': str(tmp_path)},
+                              'llm': {'enabled': True, 'api_key': 'test'},
+                              'analysis': {'stats': {'enabled': True}}}, DataAggregator())
+    text = analyzer._build_stats(file_events(), SINCE, UNTIL)
+    week_rows = [line.strip() for line in text.splitlines() if ' | ' in line and line.strip().startswith('2026-03-')]
+    assert week_rows == [
+        '2026-03-16 | 0.3 | - | 4 | - | 0.0 | 2',
+        '2026-03-23 | 0.2 | -25% | 4 | +0% | 0.0 | 3',
+        '2026-03-30* | 0.1 | - | 1 | - | 0.0 | 1',  # 不完整的周不与完整的周比较
+    ]
+    assert '最活跃时段: 01:00, 09:00, 10:00' in text
+
+
+def test_partial_first_week_not_compared():
+    since = datetime(2026, 3, 18)  # 星期三开始
+    stats = compute_activity_stats(file_events(), since, UNTIL)
+    assert stats.weeks[0]['partial'] and not stats.weeks[1]['partial']
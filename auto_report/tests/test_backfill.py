@@ -0,0 +1,97 @@
+# src/tests/test_backfill.py
+import os
+from datetime import datetime, timedelta
+
+import yaml
+
+import backfill
+from core.ingest import IngestStore
+from core.search_index import ActivityIndex
+from benchmarks.stubs import LLMStub
+
+START = datetime(2026, 6, 1)
+
+
+def write_config(tmp_path, llm_url, **core):
+    config = {
+        'core': dict({'report_output_dir': str(tmp_path / 'reports'), 'logging': {'level': 'WARNING'}}, **core),
+        'llm': {'enabled': True, 'api_key': 'test', 'base_url': llm_url, 'timeout': 30},
+        'analysis': {
+            'search_index': {'enabled': True, 'path': str(tmp_path / 'index' / 'activity.db')},
+            'report_types': {'daily': {'schedule': '0 18 * * *', 'description': '日报'}},
+        },
+    }
+    path = tmp_path / 'config.yaml'
+    path.write_text(yaml.safe_dump(config, allow_unicode=True), encoding='utf-8')
+    return str(path)
+
+
+def fill_journal(journal_dir):
+    store = IngestStore(lambda collector_id: None, str(journal_dir))
+    store.resolve = lambda collector_id: backfill.DataAggregator()
+    for day in range(3):
+        ts = (START + timedelta(days=day, hours=10)).timestamp()
+        store.ingest('alice', day + 1, [['file', ts, {'event_type': 'modified', 'src_path': '/work/alice_project/a.py'}]])
+        store.ingest('bob', day + 1, [['file', ts, {'event_type': 'modified', 'src_path': '/work/bob_project/b.py'}]])
+
+
+def run(config_path, *extra):
+    return backfill.main(['daily', '--start', START.isoformat(), '--end', (START + timedelta(days=3)).isoformat(),
+                          '--config', config_path, '--concurrency', '2', '--retries', '0', *extra])
+
+
+def test_journal_backfill_merges_collectors_for_single_user(tmp_path):
+    journal_dir = tmp_path / 'ingest'
+    fill_journal(journal_dir)
+    with LLMStub(record_prompts=True) as llm:
+        config_path = write_config(tmp_path, llm.url, role='central', ingest={'journal_dir': str(journal_dir)})
+        assert run(config_path) == 0
+
+    # 单用户中心节点把所有采集端汇入同一个聚合器，补跑的报告与之一致
+    output_dir = tmp_path / 'reports' / 'backfill' / 'daily'
+    assert sorted(os.listdir(output_dir)) == [f'daily_202606{day:02d}_1800.txt' for day in (1, 2, 3)]
+    assert len(llm.prompts) == 3
+    assert all('alice_project' in prompt and 'bob_project' in prompt for prompt in llm.prompts)
+
+
+def test_journal_backfill_one_report_set_per_tenant(tmp_path):
+    journal_dir = tmp_path / 'ingest'
+    fill_journal(journal_dir)
+    with LLMStub(record_prompts=True) as llm:
+        config_path = write_config(tmp_path, llm.url, role='central', ingest={'journal_dir': str(journal_dir)},
+                                   tenancy={'enabled': True})
+        assert run(config_path) == 0
+
+    output_dir = tmp_path / 'reports' / 'backfill' / 'daily'
+    for collector in ('alice', 'bob'):
+        assert sorted(os.listdir(output_dir / collector)) == [f'daily_202606{day:02d}_1800.txt' for day in (1, 2, 3)]
+    assert len(llm.prompts) == 6
+    # 每份报告只包含一个采集端的数据
+    assert all(('alice_project' in prompt) != ('bob_project' in prompt) for prompt in llm.prompts)
+
+
+def test_journal_backfill_single_collector(tmp_path):
+    journal_dir = tmp_path / 'ingest'
+    fill_journal(journal_dir)
+    with LLMStub(record_prompts=True) as llm:
+        config_path = write_config(tmp_path, llm.url, role='central', ingest={'journal_dir': str(journal_dir)})
+        assert run(config_path, '--collector', 'bob') == 0
+        assert run(config_path, '--collector', 'carol') == 2
+
+    output_dir = tmp_path / 'reports' / 'backfill' / 'daily'
+    assert os.listdir(output_dir) == ['bob']
+    assert all('bob_project' in prompt and 'alice_project' not in prompt for prompt in llm.prompts)
+
+
+def test_index_backfill_includes_empty_text_points(tmp_path):
+    with LLMStub(record_prompts=True) as llm:
+        config_path = write_config(tmp_path, llm.url)
+        index = ActivityIndex(str(tmp_path / 'index' / 'activity.db'))
+        for day in range(3):
+            ts = (START + timedelta(days=day, hours=10)).timestamp()
+            index.add('screen', {'filename': f'blank_{day}.png', 'extracted_text_snippet': ''}, ts)
+        index.close()
+        assert run(config_path) == 0
+
+    assert len(llm.prompts) == 3
+    assert all('blank_' in prompt for prompt in llm.prompts)
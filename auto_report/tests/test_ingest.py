@@ -0,0 +1,162 @@
+# src/tests/test_ingest.py
+import os
+import gzip
+import json
+import time
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from core.data_aggregator import DataAggregator
+import pytest
+
+from core import ingest
+from core.ingest import BatchTooLarge, IngestStore, decode_batch, encode_batch, start_ingest_server
+
+NOW = time.time()
+
+
+def points(seq, n=3):
+    return [['file', NOW - 60 + i, {'event_type': 'modified', 'src_path': f'/work/{seq}_{i}.py'}] for i in range(n)]
+
+
+def stored(aggregator):
+    return sorted(item['data']['src_path'] for items in aggregator.get_raw_data_since(datetime(1970, 1, 2)).values()
+                  for item in items)
+
+
+def test_duplicates_acknowledged_without_rewrite(tmp_path):
+    aggregator = DataAggregator()
+    store = IngestStore({'alice': aggregator}.get, str(tmp_path))
+    assert store.ingest('alice', 1, points(1)) == (False, 1)
+    assert store.ingest('alice', 1, points(1)) == (True, 1)
+    assert len(stored(aggregator)) == 3
+
+
+def test_torn_tail_truncated_before_next_batch(tmp_path):
+    store = IngestStore({'alice': DataAggregator()}.get, str(tmp_path))
+    store.ingest('alice', 1, points(1))
+    with open(store._journal_path('alice'), 'a', encoding='utf-8') as f:
+        f.write('{"seq": 2, "points": [["file", ')  # 写批次 2 时进程崩溃，未确认
+
+    restarted = IngestStore({'alice': DataAggregator()}.get, str(tmp_path))
+    assert restarted.replay() == 3
+    assert restarted.ingest('alice', 2, points(2)) == (False, 2)
+
+    aggregator = DataAggregator()
+    assert IngestStore({'alice': aggregator}.get, str(tmp_path)).replay() == 6
+    assert stored(aggregator) == sorted(point[2]['src_path'] for point in points(1) + points(2))
+
+
+def test_torn_tail_truncated_without_replay(tmp_path):
+    store = IngestStore({'alice': DataAggregator()}.get, str(tmp_path))
+    store.ingest('alice', 1, points(1))
+    with open(store._journal_path('alice'), 'a', encoding='utf-8') as f:
+        f.write('{"seq": 2, "po')
+    restarted = IngestStore({'alice': DataAggregator()}.get, str(tmp_path))
+    restarted._high_watermarks['alice'] = 1
+    restarted.ingest('alice', 2, points(2))
+    assert [seq for seq, _ in restarted.iter_journal('alice')] == [1, 2]
+
+
+def test_decompressed_size_limited(tmp_path, monkeypatch):
+    body = encode_batch('alice', 1, points(1, 1000))
+    assert decode_batch(body)['seq'] == 1
+    with pytest.raises(BatchTooLarge):
+        decode_batch(body, max_bytes=1000)
+    with pytest.raises(ValueError):
+        decode_batch(body[:len(body) // 2])
+    with pytest.raises(ValueError):
+        decode_batch(json.dumps({'collector_id': 'alice'}).encode('utf-8'))
+
+    monkeypatch.setattr(ingest, 'MAX_DECODED_BYTES', 1024 * 1024)
+    bomb = gzip.compress(b' ' * (16 * 1024 * 1024))  # 几十 KB 的请求体解压为 16MB
+    store = IngestStore({'alice': DataAggregator()}.get, str(tmp_path))
+    server = start_ingest_server({'port': 0, 'workers': 1}, store)
+    try:
+        request = urllib.request.Request(f"http://127.0.0.1:{server.server_port}/ingest", data=bomb)
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(request, timeout=10)
+        assert excinfo.value.code == 413
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_rotation_keeps_high_watermark_after_segments_removed(tmp_path):
+    aggregator = DataAggregator()
+    store = IngestStore({'alice': aggregator}.get, str(tmp_path), segment_bytes=1)
+    for seq in range(1, 5):
+        store.ingest('alice', seq, points(seq))
+    # 每个批次写入后都轮转
+    assert [os.path.basename(path) for path in store._segments('alice')] == [f"{seq:016d}.jsonl" for seq in range(1, 5)]
+    assert not os.path.exists(store._journal_path('alice'))
+
+    for path in store._segments('alice'):
+        os.remove(path)
+    restarted = IngestStore({'alice': DataAggregator()}.get, str(tmp_path))
+    restarted.replay()
+    assert restarted.high_watermark('alice') == 4
+    assert restarted.ingest('alice', 3, points(3)) == (True, 4)
+
+
+def test_replay_restores_segments_and_active_journal(tmp_path):
+    store = IngestStore({'alice': DataAggregator()}.get, str(tmp_path), segment_bytes=2000)
+    for seq in range(1, 21):
+        store.ingest('alice', seq, points(seq))
+    assert store._segments('alice') and os.path.exists(store._journal_path('alice'))
+
+    aggregator = DataAggregator()
+    restarted = IngestStore({'alice': aggregator}.get, str(tmp_path), segment_bytes=2000)
+    assert restarted.collectors() == ['alice']
+    assert restarted.replay() == 60
+    assert len(stored(aggregator)) == 60
+    assert restarted.high_watermark('alice') == 20
+
+
+def test_retention_prunes_old_segments_and_points(tmp_path):
+    store = IngestStore({'alice': DataAggregator()}.get, str(tmp_path), segment_bytes=1, retention_days=30)
+    old = [['file', NOW - 40 * 86400, {'src_path': '/work/old.py'}]]
+    store.ingest('alice', 1, old)
+    old_segment = store._segments('alice')[0]
+    os.utime(old_segment, (NOW - 40 * 86400, NOW - 40 * 86400))
+    store.ingest('alice', 2, old + points(2))  # 同一批次中既有过期数据点也有新数据点
+
+    assert old_segment not in store._segments('alice')
+    aggregator = DataAggregator()
+    restarted = IngestStore({'alice': aggregator}.get, str(tmp_path), retention_days=30)
+    restarted.replay()
+    assert stored(aggregator) == sorted(point[2]['src_path'] for point in points(2))
+    assert restarted.high_watermark('alice') == 2
+
+
+def test_server_uses_bounded_worker_pool(tmp_path):
+    aggregators = {f'c{i}': DataAggregator() for i in range(4)}
+    store = IngestStore(aggregators.get, str(tmp_path))
+    server = start_ingest_server({'port': 0, 'workers': 2}, store)
+    url = f"http://127.0.0.1:{server.server_port}/ingest"
+    threads_before = threading.active_count()
+    try:
+        def push(collector_id):
+            for seq in range(1, 26):
+                request = urllib.request.Request(url, data=encode_batch(collector_id, seq, points(seq, 2)),
+                                                 headers={'Content-Encoding': 'gzip'})
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    assert response.status == 200
+
+        clients = [threading.Thread(target=push, args=(collector_id,)) for collector_id in aggregators]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        # 100 个请求只用了至多 2 个工作线程，而不是每个请求一个线程
+        workers = [t for t in threading.enumerate() if t.name.startswith('ingest-worker')]
+        assert len(workers) <= 2
+        assert threading.active_count() <= threads_before + 2
+    finally:
+        server.shutdown()
+        server.server_close()
+    for collector_id, aggregator in aggregators.items():
+        assert len(stored(aggregator)) == 50
+        assert store.high_watermark(collector_id) == 25
@@ -0,0 +1,76 @@
+# src/tests/test_job_tracker.py
+import os
+import json
+from datetime import datetime
+
+from apscheduler.events import JobExecutionEvent, JobSubmissionEvent, EVENT_JOB_EXECUTED, EVENT_JOB_SUBMITTED
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+from core.job_tracker import JobTracker
+
+
+def noop():
+    pass
+
+
+def make_scheduler():
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(noop, IntervalTrigger(seconds=10), id='screen_capture_job')
+    scheduler.add_job(noop, CronTrigger(hour=18), id='daily_analysis_job')
+    return scheduler
+
+
+def executed(job_id):
+    return JobExecutionEvent(EVENT_JOB_EXECUTED, job_id, 'default', datetime.now().astimezone())
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_interval_job_stats_written_on_flush(tmp_path):
+    state_file = tmp_path / 'job_state.json'
+    tracker = JobTracker(str(state_file), save_interval=0)
+    tracker.attach(make_scheduler(), catch_up_grace=0)
+
+    mtime = os.stat(state_file).st_mtime_ns if state_file.exists() else None
+    for _ in range(100):
+        tracker._on_event(JobSubmissionEvent(EVENT_JOB_SUBMITTED, 'screen_capture_job', 'default',
+                                             [datetime.now().astimezone()]))
+        tracker._on_event(executed('screen_capture_job'))
+    # 高频任务的事件只更新内存
+    assert (os.stat(state_file).st_mtime_ns if state_file.exists() else None) == mtime
+    assert tracker.get_stats()['screen_capture_job']['runs'] == 100
+
+    tracker.stop()
+    assert load(state_file)['screen_capture_job']['runs'] == 100
+
+
+def test_cron_job_last_run_written_immediately(tmp_path):
+    state_file = tmp_path / 'job_state.json'
+    tracker = JobTracker(str(state_file), save_interval=0)
+    tracker.attach(make_scheduler(), catch_up_grace=0)
+
+    event = executed('daily_analysis_job_catch_up')  # 补跑任务归入原任务
+    tracker._on_event(event)
+    entry = load(state_file)['daily_analysis_job']
+    assert entry['runs'] == 1
+    assert entry['last_scheduled_run'] == event.scheduled_run_time.isoformat()
+
+
+def test_periodic_save(tmp_path):
+    state_file = tmp_path / 'job_state.json'
+    tracker = JobTracker(str(state_file), save_interval=0.05)
+    tracker.attach(make_scheduler(), catch_up_grace=0)
+    try:
+        tracker._on_event(executed('screen_capture_job'))
+        for _ in range(100):
+            if state_file.exists() and 'screen_capture_job' in load(state_file):
+                break
+            tracker._stop_event.wait(0.05)
+        assert load(state_file)['screen_capture_job']['runs'] == 1
+    finally:
+        tracker.stop()
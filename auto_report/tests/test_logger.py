@@ -0,0 +1,97 @@
+# src/tests/test_logger.py
+import json
+import logging
+
+import pytest
+
+from utils import logger as log_setup
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / 'autoreport.log'
+    yield path
+    log_setup._stop()
+    logging.getLogger().removeHandler(log_setup._queue_handler)
+    log_setup._queue_handler = log_setup._sampling_filter = None
+
+
+def setup(log_file, **sampling):
+    log_setup.setup_logger({'level': 'INFO', 'file': str(log_file), 'format': 'json',
+                            'sampling': dict({'window': 60, 'max_per_window': 3}, **sampling)})
+
+
+def read(log_file):
+    """等待监听线程写出队列中的日志后读取"""
+    log_setup._queue_handler.queue.join()
+    return [json.loads(line) for line in log_file.read_text(encoding='utf-8').splitlines()]
+
+
+def test_only_hot_path_loggers_sampled(log_file):
+    setup(log_file)
+    for i in range(10):
+        logging.getLogger('agents.file_agent').info("File event logged to aggregator: %s", i)
+        logging.getLogger('core.scheduler').info("Job %s added", i)
+    entries = read(log_file)
+    file_events = [e for e in entries if e['logger'] == 'agents.file_agent']
+    scheduler = [e for e in entries if e['logger'] == 'core.scheduler']
+    assert [e['message'] for e in file_events] == [f"File event logged to aggregator: {i}" for i in range(3)]
+    assert len(scheduler) == 10
+
+
+def test_warnings_never_sampled(log_file):
+    setup(log_file)
+    for i in range(10):
+        logging.getLogger('agents.file_agent').warning("Slow event %s", i)
+    assert len([e for e in read(log_file) if e['logger'] == 'agents.file_agent']) == 10
+
+
+def test_suppressed_count_reported_on_stop(log_file):
+    setup(log_file)
+    for i in range(50):
+        logging.getLogger('core.data_aggregator').info("Data added from %s", i)
+    log_setup._stop()
+    entries = [json.loads(line) for line in log_file.read_text(encoding='utf-8').splitlines()]
+    summary = [e for e in entries if e.get('suppressed')]
+    assert summary == [dict(summary[0], logger='core.data_aggregator', message='Data added from %s', suppressed=47)]
+
+
+def test_suppressed_count_reported_after_window(log_file, monkeypatch):
+    setup(log_file, window=0.2)
+    for i in range(10):
+        logging.getLogger('agents.file_agent').info("File event %s", i)
+    # 之后不再有同类日志：窗口结束后由后台线程报告
+    for _ in range(50):
+        if not log_setup._sampling_filter._counters:
+            break
+        log_setup._reporter_stop.wait(0.1)
+    entries = read(log_file)
+    assert [e['suppressed'] for e in entries if e.get('suppressed')] == [7]
+
+
+def test_arguments_formatted_in_calling_thread(log_file):
+    setup(log_file)
+    data_point = {'src_path': '/work/a.py'}
+    logging.getLogger('core.scheduler').info("Data added: %s", data_point)
+    data_point['src_path'] = '/work/b.py'  # 监听线程写出之前修改参数
+    data_point.update({f'key_{i}': i for i in range(100)})
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        logging.getLogger('core.scheduler').exception("Job %s failed", 'daily')
+    entries = [e for e in read(log_file) if e['logger'] == 'core.scheduler']
+    assert entries[0]['message'] == "Data added: {'src_path': '/work/a.py'}"
+    assert entries[1]['message'] == "Job daily failed"
+    assert 'RuntimeError: boom' in entries[1]['exception']
+
+
+def test_disabled_levels_not_formatted(log_file):
+    setup(log_file)
+
+    class Expensive:
+        def __str__(self):
+            raise AssertionError("debug arguments formatted while DEBUG is disabled")
+
+    logging.getLogger('core.scheduler').debug("State: %s", Expensive())
+    logging.getLogger('core.scheduler').info("done")
+    assert [e['message'] for e in read(log_file) if e['logger'] == 'core.scheduler'] == ['done']
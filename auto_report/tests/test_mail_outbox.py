@@ -0,0 +1,261 @@
+# auto_report/tests/test_mail_outbox.py
+import os
+import json
+import email
+import socket
+
+import pytest
+
+from core import mail_outbox
+from core.mail_outbox import EmailOutbox, account_key
+from core.data_aggregator import DataAggregator
+from agents.analyzer_agent import AnalyzerAgent
+from benchmarks.stubs import LLMStub, SMTPStub
+
+
+def email_config(port, outbox_dir, **overrides):
+    config = {
+        'enabled': True, 'smtp_server': '127.0.0.1', 'smtp_port': port, 'use_tls': False,
+        'sender_email': 'reports@localhost', 'recipient_email': 'user@localhost',
+        'outbox_dir': str(outbox_dir), 'retry_backoff': 30, 'max_backoff': 3600, 'max_retries': 3,
+    }
+    config.update(overrides)
+    return config
+
+
+def pending_files(outbox_dir):
+    return sorted(name for name in os.listdir(outbox_dir) if name.endswith('.json'))
+
+
+def free_port():
+    """返回一个当前没有服务监听的端口"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class FakeClock:
+    """替换 mail_outbox 中的 time 模块，控制重试时间"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+def test_default_outbox_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    outbox = EmailOutbox({})
+    assert outbox.outbox_dir == './data/outbox'
+    assert os.path.isdir(tmp_path / 'data' / 'outbox' / 'failed')
+
+
+def test_enqueue_persists_and_survives_restart(tmp_path):
+    outbox_dir = tmp_path / 'outbox'
+    with SMTPStub() as smtp:
+        config = email_config(smtp.port, outbox_dir)
+        outbox = EmailOutbox(config)
+        account = outbox.register_account(config)
+        assert outbox.enqueue(account, 'user@localhost', '日报', '报告内容')
+
+        # 未启动发送线程：邮件只写入磁盘
+        files = pending_files(outbox_dir)
+        assert len(files) == 1
+        with open(outbox_dir / files[0], encoding='utf-8') as f:
+            message = json.load(f)
+        assert message['subject'] == '日报'
+        assert message['recipients'] == ['user@localhost']
+        assert 'sender_password' not in json.dumps(message)
+        assert smtp.messages == []
+
+        # 模拟重启：新的发件箱实例从同一目录恢复并发送
+        restarted = EmailOutbox(config)
+        assert restarted.pending_count() == 1
+        restarted.flush()  # 账户未注册前不发送
+        assert smtp.messages == []
+        restarted.register_account(config)
+        restarted.flush()
+        restarted.stop()
+
+    assert len(smtp.messages) == 1
+    mail_from, rcpt_to, _ = smtp.messages[0]
+    assert 'reports@localhost' in mail_from
+    assert rcpt_to == ['<user@localhost>']
+    assert pending_files(outbox_dir) == []
+
+
+def test_background_sender_delivers(tmp_path):
+    with SMTPStub() as smtp:
+        config = email_config(smtp.port, tmp_path / 'outbox', poll_interval=0.05)
+        outbox = EmailOutbox(config)
+        account = outbox.register_account(config)
+        outbox.start()
+        try:
+            outbox.enqueue(account, ['user@localhost'], 'weekly', 'body')
+            for _ in range(100):
+                if smtp.messages:
+                    break
+                outbox._stop_event.wait(0.05)
+        finally:
+            outbox.stop()
+    assert len(smtp.messages) == 1
+    assert outbox.pending_count() == 0
+
+
+def test_sessions_reused_per_account(tmp_path):
+    with SMTPStub() as smtp:
+        first = email_config(smtp.port, tmp_path / 'outbox')
+        second = email_config(smtp.port, tmp_path / 'outbox', sender_email='other@localhost')
+        outbox = EmailOutbox(first)
+        accounts = [outbox.register_account(first), outbox.register_account(second)]
+        assert accounts[0] != accounts[1]
+        for i in range(3):
+            for account in accounts:
+                outbox.enqueue(account, 'user@localhost', f'report {i}', 'body')
+        outbox.flush()
+        outbox.stop()
+
+    assert len(smtp.messages) == 6
+    assert smtp.connections == 2  # 每个账户一个连接，6 封邮件复用
+
+
+def test_idle_session_closed_and_reopened(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(mail_outbox, 'time', clock)
+    with SMTPStub() as smtp:
+        config = email_config(smtp.port, tmp_path / 'outbox', smtp_idle_timeout=60)
+        outbox = EmailOutbox(config)
+        account = outbox.register_account(config)
+        outbox.enqueue(account, 'user@localhost', 'first', 'body')
+        outbox.flush()
+        outbox._close_sessions()
+        assert account in outbox._sessions  # 未超过空闲时间，保留连接
+
+        clock.now += 61
+        outbox._close_sessions()
+        assert account not in outbox._sessions
+        outbox.enqueue(account, 'user@localhost', 'second', 'body')
+        outbox.flush()
+        outbox.stop()
+
+    assert len(smtp.messages) == 2
+    assert smtp.connections == 2
+
+
+def test_exponential_backoff_then_failed(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(mail_outbox, 'time', clock)
+    outbox_dir = tmp_path / 'outbox'
+    config = email_config(free_port(), outbox_dir, retry_backoff=30, max_retries=3)
+    outbox = EmailOutbox(config)
+    account = outbox.register_account(config)
+    outbox.enqueue(account, 'user@localhost', 'unreachable', 'body')
+    (name,) = pending_files(outbox_dir)
+
+    def load():
+        with open(outbox_dir / name, encoding='utf-8') as f:
+            return json.load(f)
+
+    outbox.flush()  # 连接被拒绝
+    message = load()
+    assert message['attempts'] == 1
+    assert message['last_error']
+    assert message['next_attempt'] == clock.now + 30
+
+    clock.now += 29
+    outbox.flush()  # 未到重试时间，不尝试
+    assert load()['attempts'] == 1
+
+    clock.now += 1
+    outbox.flush()
+    message = load()
+    assert message['attempts'] == 2
+    assert message['next_attempt'] == clock.now + 60  # 间隔加倍
+
+    clock.now += 60
+    outbox.flush()  # 第 3 次失败，达到 max_retries
+    assert pending_files(outbox_dir) == []
+    with open(outbox_dir / 'failed' / name, encoding='utf-8') as f:
+        failed = json.load(f)
+    assert failed['attempts'] == 3
+    assert outbox.pending_count() == 0
+
+
+def test_backoff_capped(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(mail_outbox, 'time', clock)
+    outbox_dir = tmp_path / 'outbox'
+    config = email_config(free_port(), outbox_dir, retry_backoff=30, max_backoff=100, max_retries=10)
+    outbox = EmailOutbox(config)
+    outbox.enqueue(outbox.register_account(config), 'user@localhost', 'unreachable', 'body')
+    delays = []
+    for _ in range(4):
+        clock.now += 1000
+        outbox.flush()
+        (name,) = pending_files(outbox_dir)
+        with open(outbox_dir / name, encoding='utf-8') as f:
+            delays.append(json.load(f)['next_attempt'] - clock.now)
+    assert delays == [30, 60, 100, 100]
+
+
+def test_missing_attachment_fails_permanently_after_retries(tmp_path):
+    with SMTPStub() as smtp:
+        config = email_config(smtp.port, tmp_path / 'outbox', max_retries=1)
+        outbox = EmailOutbox(config)
+        account = outbox.register_account(config)
+        outbox.enqueue(account, 'user@localhost', 'report', 'body', [str(tmp_path / 'missing.txt')])
+        outbox.flush()
+        outbox.stop()
+    assert smtp.messages == []
+    assert len(pending_files(tmp_path / 'outbox' / 'failed')) == 1
+
+
+def attachments_of(raw):
+    message = email.message_from_bytes(raw)
+    return {part.get_filename(): part.get_payload(decode=True)
+            for part in message.walk() if part.get_filename()}
+
+
+def test_attachments_delivered(tmp_path):
+    report = tmp_path / 'weekly_report.txt'
+    report.write_text('本周完成了 X 和 Y。', encoding='utf-8')
+    with SMTPStub() as smtp:
+        config = email_config(smtp.port, tmp_path / 'outbox')
+        outbox = EmailOutbox(config)
+        outbox.enqueue(outbox.register_account(config), 'user@localhost', 'weekly', 'body', [str(report)])
+        outbox.flush()
+        outbox.stop()
+
+    (_, _, raw), = smtp.messages
+    assert attachments_of(raw) == {'weekly_report.txt': report.read_bytes()}
+
+
+@pytest.mark.parametrize('attach_report', [True, False])
+def test_attach_report_end_to_end(tmp_path, attach_report):
+    aggregator = DataAggregator()
+    aggregator.add_data('file', {'event_type': 'modified', 'src_path': '/work/project/main.py'})
+    with LLMStub(reply='周报内容') as llm, SMTPStub() as smtp:
+        email_settings = email_config(smtp.port, tmp_path / 'outbox', attach_report=attach_report)
+        outbox = EmailOutbox(email_settings)
+        config = {
+            'core': {'report_output_dir': str(tmp_path / 'reports')},
+            'llm': {'enabled': True, 'api_key': 'test', 'base_url': llm.url, 'timeout': 30},
+            'notifications': {'email': email_settings},
+        }
+        analyzer = AnalyzerAgent(config, aggregator, outbox)
+        assert analyzer.email_account == account_key(email_settings)
+        analyzer.analyze_and_report('weekly', '周报')
+        outbox.flush()
+        outbox.stop()
+
+    (_, _, raw), = smtp.messages
+    attachments = attachments_of(raw)
+    if attach_report:
+        (report_name,) = os.listdir(tmp_path / 'reports')
+        assert attachments == {report_name: (tmp_path / 'reports' / report_name).read_bytes()}
+    else:
+        assert attachments == {}
@@ -0,0 +1,110 @@
+# src/tests/test_metrics.py
+import gc
+import socket
+import threading
+
+import pytest
+import requests
+
+from core.data_aggregator import STORE_SIZE, DataAggregator
+from core.metrics import Counter, Histogram, MetricsRegistry
+from agents.analyzer_agent import LLM_FAILURES, LLM_LATENCY, AnalyzerAgent
+
+
+def run_threads(target, n, concurrent=50):
+    for start in range(0, n, concurrent):
+        threads = [threading.Thread(target=target) for _ in range(min(concurrent, n - start))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+def test_counter_sums_threads():
+    counter = Counter('test_counter', "doc")
+    run_threads(lambda: [counter.inc() for _ in range(100)], 20)
+    counter.inc(5)
+    assert counter.value == 2005
+
+
+def test_short_lived_thread_cells_reclaimed():
+    counter = Counter('test_requests', "doc", ['path'])
+    histogram = Histogram('test_latency', "doc", buckets=(0.1, 1))
+
+    def request():
+        counter.labels('/ingest').inc()
+        histogram.observe(0.5)
+
+    run_threads(request, 5000)
+    gc.collect()
+    child = counter.labels('/ingest')
+    assert len(child._cells) == 0
+    assert len(histogram._cells) == 0
+    assert child.value == 5000
+    counts, total, count = histogram.snapshot()
+    assert counts == [0, 5000, 0]
+    assert count == 5000
+    assert total == 2500.0
+
+
+def test_long_lived_thread_keeps_cell():
+    counter = Counter('test_worker', "doc")
+    started, release = threading.Event(), threading.Event()
+
+    def worker():
+        counter.inc(3)
+        started.set()
+        release.wait()
+        counter.inc(4)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    started.wait()
+    assert len(counter._cells) == 1
+    assert counter.value == 3
+    release.set()
+    thread.join()
+    gc.collect()
+    assert len(counter._cells) == 0
+    assert counter.value == 7
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter('test_events', "Events", ['source']).labels('file').inc(2)
+    registry.histogram('test_seconds', "Seconds", buckets=(1,)).observe(0.5)
+    registry.gauge('test_pending', "Pending").set(3)
+    text = registry.render()
+    assert 'test_events_total{source="file"} 2' in text
+    assert 'test_seconds_bucket{le="1.0"} 1' in text
+    assert 'test_seconds_bucket{le="+Inf"} 1' in text
+    assert 'test_pending 3' in text
+
+
+def test_store_size_sums_aggregators():
+    tenants = [DataAggregator() for _ in range(3)]
+    before = STORE_SIZE.labels('test_source').value
+    for i, aggregator in enumerate(tenants):
+        for _ in range(i + 1):
+            aggregator.add_data('test_source', {'n': i})
+    # 每个租户一个聚合器：指标为所有聚合器之和，而不是最后写入的那个
+    assert STORE_SIZE.labels('test_source').value == before + 6
+    del tenants[2], aggregator
+    gc.collect()
+    assert STORE_SIZE.labels('test_source').value == before + 3
+
+
+def test_llm_latency_observed_for_failed_requests(tmp_path):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]  # 没有服务监听的端口
+    analyzer = AnalyzerAgent({'core': {'report_output_dir': str(tmp_path)},
+                              'llm': {'enabled': True, 'api_key': 'test', 'timeout': 5,
+                                      'base_url': f'http://127.0.0.1:{port}/v1/chat/completions'}},
+                             DataAggregator())
+    _, _, count = LLM_LATENCY.snapshot()
+    failures = LLM_FAILURES.value
+    with pytest.raises(requests.exceptions.ConnectionError):
+        analyzer._request_llm("prompt")
+    assert LLM_LATENCY.snapshot()[2] == count + 1
+    assert LLM_FAILURES.value == failures + 1
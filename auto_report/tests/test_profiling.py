@@ -0,0 +1,52 @@
+# src/tests/test_profiling.py
+import os
+import threading
+from datetime import datetime
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+
+from core.profiling import JobProfiler
+
+
+def scan_and_aggregate(done):
+    sum(i * i for i in range(10000))
+    done.set()
+
+
+def test_control_file_request_profiles_next_run(tmp_path):
+    done = threading.Event()
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(scan_and_aggregate, IntervalTrigger(hours=1), id='document_scan_job', args=[done])
+    scheduler.start()
+    profile_dir = tmp_path / 'profiles'
+    profiler = JobProfiler({'profile_dir': str(profile_dir), 'poll_interval': 0, 'top': 5})
+    try:
+        profiler.attach(scheduler)
+        job = scheduler.get_job('document_scan_job')
+        assert job.func is scan_and_aggregate  # 未请求剖析时不包装
+
+        os.makedirs(profile_dir, exist_ok=True)
+        (profile_dir / 'request').write_text("scan_and_aggregate 1  # 按函数名匹配\n", encoding='utf-8')
+        profiler.check_requests()
+        assert not (profile_dir / 'request').exists()
+        job = scheduler.get_job('document_scan_job')
+        assert job.func is not scan_and_aggregate and job.func.__wrapped__ is scan_and_aggregate
+
+        job.modify(next_run_time=datetime.now().astimezone())
+        assert done.wait(10)
+        for _ in range(100):
+            if scheduler.get_job('document_scan_job').func is scan_and_aggregate:
+                break
+            profiler._stop_event.wait(0.05)
+        # 剖析次数用完后恢复原函数
+        assert scheduler.get_job('document_scan_job').func is scan_and_aggregate
+    finally:
+        profiler.stop()
+        scheduler.shutdown()
+
+    names = sorted(os.listdir(profile_dir))
+    assert [os.path.splitext(name)[1] for name in names] == ['.prof', '.snapshot', '.txt']
+    summary = (profile_dir / next(name for name in names if name.endswith('.txt'))).read_text(encoding='utf-8')
+    assert summary.startswith('Job: document_scan_job\n') and 'Result: ok' in summary
+    assert 'scan_and_aggregate' in summary
@@ -0,0 +1,74 @@
+# src/tests/test_records.py
+from datetime import datetime, timedelta, timezone
+
+from core.data_aggregator import DataAggregator
+from core.records import DocumentRecord, FileRecord, RecordView, ScreenRecord
+
+BASE = datetime(2026, 6, 1, 9, 0)
+
+
+def at(minutes):
+    return BASE + timedelta(minutes=minutes)
+
+
+def file_event(minutes, path):
+    return {'event_type': 'modified', 'src_path': path, 'is_directory': False,
+            'timestamp': at(minutes).isoformat()}
+
+
+def test_round_trip_with_out_of_order_points():
+    aggregator = DataAggregator()
+    # 分钟偏移 -> 数据点，按打乱的顺序写入 (导入的历史数据、采集端补发的批次)
+    points = {
+        0: file_event(0, '/work/app/main.py'),
+        30: file_event(30, '/work/app/models.py'),
+        10: file_event(10, '/work/app/main.py'),
+        20: {'event_type': 'moved', 'src_path': '/work/app/a.py', 'dest_path': '/work/app/b.py'},  # 字段不同，原样保存
+        5: file_event(5, 'relative/path.py'),
+        25: file_event(25, '/work/app/main.py'),
+    }
+    for minutes, data_point in points.items():
+        aggregator.add_data('file', data_point, timestamp=at(minutes))
+    aggregator.add_data('file', file_event(10, '/work/app/late.py'), timestamp=at(10))  # 时间相同的后到数据排在后面
+
+    column = aggregator.data_store['file']
+    assert list(column.timestamps) == sorted(column.timestamps)
+    assert sum(isinstance(record, FileRecord) for record in column.records) == 6
+
+    view = aggregator.get_raw_data_since(at(5), at(25))['file']
+    assert isinstance(view, RecordView)
+    assert list(view) == [
+        {'timestamp': at(5).isoformat(), 'data': points[5]},
+        {'timestamp': at(10).isoformat(), 'data': points[10]},
+        {'timestamp': at(10).isoformat(), 'data': file_event(10, '/work/app/late.py')},
+        {'timestamp': at(20).isoformat(), 'data': points[20]},
+    ]
+    assert view[-1]['data'] is points[20]
+    assert [item['data']['src_path'] for item in view[1:3]] == ['/work/app/main.py', '/work/app/late.py']
+    assert aggregator.get_data_since('file', at(25)) == [points[25], points[30]]
+    # 转换出的字典与写入时相同 (键的顺序也相同)，可直接序列化
+    assert [list(item['data']) for item in view[:2]] == [list(points[5]), list(points[10])]
+
+
+def test_all_record_types_round_trip():
+    aggregator = DataAggregator()
+    screen = {'filename': '/shots/screen_1.png', 'timestamp': at(1).isoformat(), 'extracted_text_snippet': 'hello'}
+    document = {'filename': 'notes.md', 'full_path': '/docs/notes.md', 'size': 42,
+                'last_modified': at(2).isoformat(), 'content_snippet': '# notes'}
+    aware = {'filename': '/shots/screen_2.png', 'timestamp': at(3).replace(tzinfo=timezone.utc).isoformat(),
+             'extracted_text_snippet': ''}
+    lark = {'summary': 'standup', 'start_time': '09:00'}
+    for minutes, (source, data_point) in enumerate([('screen', screen), ('document', document),
+                                                    ('screen', aware), ('lark_calendar', lark)], 1):
+        aggregator.add_data(source, data_point, timestamp=at(minutes))
+
+    assert isinstance(aggregator.data_store['screen'].records[0], ScreenRecord)
+    assert isinstance(aggregator.data_store['document'].records[0], DocumentRecord)
+    assert aggregator.data_store['screen'].records[1] is aware  # 带时区的时间无法无损压缩
+    raw = {source: list(view) for source, view in aggregator.get_raw_data_since(BASE).items()}
+    assert raw == {
+        'screen': [{'timestamp': at(1).isoformat(), 'data': screen}, {'timestamp': at(3).isoformat(), 'data': aware}],
+        'document': [{'timestamp': at(2).isoformat(), 'data': document}],
+        'lark_calendar': [{'timestamp': at(4).isoformat(), 'data': lark}],
+    }
+    assert aggregator.get_raw_data_since(at(5)) == {}
@@ -0,0 +1,64 @@
+# src/tests/test_search_index.py
+from datetime import datetime, timedelta
+
+from core.search_index import ActivityIndex
+
+BASE = datetime(2026, 6, 1, 9, 0)
+
+
+def make_index(path=':memory:'):
+    index = ActivityIndex(path)
+    for day in range(10):
+        ts = (BASE + timedelta(days=day)).timestamp()
+        index.add('file', {'event_type': 'modified', 'src_path': f'/work/项目{day % 2}/module_{day}.py'}, ts)
+        index.add('screen', {'filename': f'shot_{day}.png', 'extracted_text_snippet': ''}, ts + 60)
+    index.flush()
+    return index
+
+
+def test_empty_text_points_are_stored():
+    index = make_index()
+    points = list(index.iter_range(BASE, BASE + timedelta(days=1)))
+    assert [source for source, _, _ in points] == ['file', 'screen']
+    assert points[1][2] == {'filename': 'shot_0.png', 'extracted_text_snippet': ''}
+    assert len(index.top_items(BASE, BASE + timedelta(days=10), sources=['screen'])['screen']) == 10
+
+
+def test_window_queries():
+    index = make_index()
+    since, until = BASE + timedelta(days=2), BASE + timedelta(days=5)
+    points = list(index.iter_range(since, until, sources=['file']))
+    assert [data['src_path'] for _, _, data in points] == [f'/work/项目{d % 2}/module_{d}.py' for d in (2, 3, 4)]
+    assert [ts for _, ts, _ in points] == sorted(ts for _, ts, _ in points)
+
+    results = index.search('module_3', since=since, until=until)
+    assert [item['data']['src_path'] for item in results] == ['/work/项目1/module_3.py']
+    assert index.search('module_7', since=since, until=until) == []
+    assert len(index.search('项目', since=since, until=until)) == 3
+
+
+def test_window_queries_use_index():
+    index = make_index()
+    for sql, params in (
+        ("SELECT tokens, source, ts, payload FROM activity_points WHERE ts >= ? AND ts < ?", (0, 1)),
+        ("SELECT source, ts, payload FROM activity_points WHERE ts >= ? AND source IN (?) ORDER BY ts", (0, 'file')),
+    ):
+        plan = ' '.join(row[-1] for row in index._conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        assert 'USING INDEX' in plan
+        assert 'SCAN activity_points' not in plan
+
+
+def test_reopened_index_keeps_points_and_fts(tmp_path):
+    path = str(tmp_path / 'activity.db')
+    index = ActivityIndex(path)
+    data_point = {'src_path': '/work/persisted/readme.md'}
+    index.add('file', data_point, BASE.timestamp())
+    index.close()
+
+    reopened = ActivityIndex(path)
+    assert list(reopened.iter_range()) == [('file', BASE.timestamp(), data_point)]
+    reopened.add('file', {'src_path': '/work/persisted/new.md'}, BASE.timestamp() + 1)
+    reopened.flush()
+    assert len(reopened.search('persisted')) == 2
+    assert 'persisted' in dict(reopened.salient_terms())
+    reopened.close()
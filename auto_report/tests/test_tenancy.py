@@ -0,0 +1,179 @@
+# src/tests/test_tenancy.py
+import os
+import time
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+
+import yaml
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from core import llm_client as llm_module
+from core import ocr_pool as ocr_module
+from core.llm_client import LLMClient
+from core.ocr_pool import OCRPool
+from core.scheduler import OffsetTrigger
+from core.tenancy import TenantManager, stagger_offset, tenant_config
+from benchmarks.stubs import LLMStub
+
+BASE_CONFIG = {
+    'core': {'report_output_dir': './reports', 'tenancy': {'enabled': True}},
+    'llm': {'enabled': True, 'api_key': 'test'},
+    'data_sources': {
+        'screen_capture': {'enabled': False, 'output_dir': './data/screenshots'},
+        'file_monitor': {'enabled': False, 'snapshot_dir': './data/file_monitor'},
+    },
+    'analysis': {
+        'search_index': {'enabled': False, 'path': './data/index/activity.db'},
+        'report_types': {'daily': {'enabled': True, 'schedule': '0 18 * * *', 'description': '日报'}},
+    },
+}
+
+
+class FakeClock:
+    """替换 llm_client 中的 time 模块，sleep 直接推进时间"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_tenant_paths_namespaced_unless_overridden():
+    config = tenant_config(BASE_CONFIG, 'alice', {
+        'analysis': {'search_index': {'path': '/srv/alice/index.db'}},
+        'data_sources': {'screen_capture': {'enabled': True}},
+    })
+    assert config['core']['report_output_dir'] == os.path.join('./reports', 'alice')
+    assert config['data_sources']['screen_capture'] == {'enabled': True,
+                                                        'output_dir': os.path.join('./data/screenshots', 'alice')}
+    assert config['data_sources']['file_monitor']['snapshot_dir'] == os.path.join('./data/file_monitor', 'alice')
+    # 带扩展名的文件路径在文件名之前插入租户目录；租户配置中显式指定的路径保持不变
+    assert tenant_config(BASE_CONFIG, 'bob', {})['analysis']['search_index']['path'] == \
+        os.path.join('./data/index', 'bob', 'activity.db')
+    assert config['analysis']['search_index']['path'] == '/srv/alice/index.db'
+    assert 'tenancy' not in config['core']
+    assert BASE_CONFIG['core']['report_output_dir'] == './reports'  # 公共配置不被修改
+
+
+def test_stagger_offset_stable_and_within_window():
+    offsets = {tenant_id: stagger_offset(tenant_id, 1800) for tenant_id in (f'user{i}' for i in range(50))}
+    assert all(0 <= offset < 1800 for offset in offsets.values())
+    assert offsets == {tenant_id: stagger_offset(tenant_id, 1800) for tenant_id in offsets}
+    assert len(set(offsets.values())) > 40
+    assert stagger_offset('user1', 0) == 0
+
+
+def test_tenants_share_resources_with_staggered_jobs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tenants_dir = tmp_path / 'tenants'
+    tenants_dir.mkdir()
+    for tenant_id in ('alice', 'bob'):
+        (tenants_dir / f'{tenant_id}.yaml').write_text(yaml.safe_dump({'llm': {'model': f'model-{tenant_id}'}}),
+                                                       encoding='utf-8')
+    (tenants_dir / 'bad name.yaml').write_text('{}', encoding='utf-8')
+    config = dict(BASE_CONFIG, core={'report_output_dir': './reports',
+                                     'tenancy': {'enabled': True, 'tenants_dir': str(tenants_dir)}})
+    manager = TenantManager(config)
+    tenants = manager.load()
+    assert sorted(tenants) == ['alice', 'bob']
+    assert tenants['alice'].analyzer.llm_client is tenants['bob'].analyzer.llm_client is manager.resources['llm_client']
+    assert tenants['alice'].analyzer.llm_model == 'model-alice'
+    assert tenants['alice'].data_aggregator is not tenants['bob'].data_aggregator
+    assert 'ocr_pool' not in manager.resources  # 没有租户开启截屏
+
+    scheduler = BackgroundScheduler()
+    manager.start(scheduler)
+    try:
+        now = datetime(2026, 6, 1, 12, 0).astimezone()
+        for tenant_id in ('alice', 'bob'):
+            job = scheduler.get_job(f'{tenant_id}:daily_analysis_job')
+            assert isinstance(job.trigger, OffsetTrigger)
+            offset = stagger_offset(tenant_id, 1800)
+            fire_time = job.trigger.get_next_fire_time(None, now)
+            assert fire_time.replace(tzinfo=None) == datetime(2026, 6, 1, 18, offset // 60, offset % 60)
+    finally:
+        manager.stop()
+
+
+def test_llm_token_bucket_shared_by_callers(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_module, 'time', clock)
+    client = LLMClient({'requests_per_minute': 3})
+    for _ in range(3):
+        client._acquire_rate()  # 桶满时立即放行
+    assert clock.sleeps == []
+    client._acquire_rate()
+    assert clock.now == 20.0  # 每分钟 3 个令牌：等待 20 秒补充一个
+    clock.now += 60
+    for _ in range(3):
+        client._acquire_rate()
+    assert clock.now == 80.0  # 桶容量为每分钟请求数，空闲再久也只积累 3 个
+    client._acquire_rate()
+    assert clock.now == 100.0
+    client.close()
+
+
+def test_llm_concurrency_limited_across_threads():
+    client = LLMClient({'max_concurrency': 2})
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+    track = client._track
+
+    def tracked(delta):
+        track(delta)
+        with lock:
+            in_flight[0] += delta
+            peak[0] = max(peak[0], in_flight[0])
+
+    client._track = tracked
+    with LLMStub(delay=0.05) as llm:
+        threads = [threading.Thread(target=lambda: client.post(llm.url, json={'messages': []}, timeout=10))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    client.close()
+    assert peak[0] == 2
+
+
+def test_ocr_pool_created_once_under_concurrent_calls(monkeypatch):
+    created = []
+
+    class FakeExecutor:
+        def __init__(self, max_workers, mp_context):
+            time.sleep(0.05)  # 放大并发创建的时间窗口
+            created.append(mp_context.get_start_method())
+
+        def submit(self, fn, filename):
+            future = Future()
+            future.set_result(f'text of {filename}')
+            return future
+
+        def shutdown(self, wait, cancel_futures):
+            pass
+
+    monkeypatch.setattr(ocr_module, 'ProcessPoolExecutor', FakeExecutor)
+    pool = OCRPool(2)
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(pool.image_to_string(f'shot_{i}.png')))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1 and len(results) == 8
+    # 不从已运行调度器、watchdog 与 HTTP 线程的进程 fork 工作进程
+    assert created[0] in ('forkserver', 'spawn')
+    pool.shutdown()
+    assert pool._executor is None
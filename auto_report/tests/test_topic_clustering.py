@@ -0,0 +1,52 @@
+# src/tests/test_topic_clustering.py
+from datetime import datetime, timedelta
+
+from core.topic_clustering import cluster_activity
+
+BASE = datetime(2026, 6, 1, 9, 0)
+
+
+def point(minutes, data):
+    return {'timestamp': (BASE + timedelta(minutes=minutes)).isoformat(), 'data': data}
+
+
+def two_topics():
+    billing = [point(i, {'event_type': 'modified', 'src_path': f'/work/billing/invoice_{name}.py'})
+               for i, name in enumerate(['tax', 'total', 'export', 'refund', 'pdf', 'currency'])]
+    search = [point(60 + i, {'event_type': 'modified', 'src_path': f'/work/search/query_{name}.py'})
+              for i, name in enumerate(['parser', 'ranking', 'tokenizer', 'cache', 'filter', 'facets'])]
+    return {'file': billing + search}
+
+
+def test_two_obvious_topics_and_empty_document():
+    data = two_topics()
+    data['screen'] = [point(30, {'filename': 'blank.png', 'extracted_text_snippet': ''}),
+                      point(90, {'filename': 'blank.png', 'extracted_text_snippet': ''})]
+    clusters = cluster_activity(data, max_clusters=2, seed=0)
+
+    topics = [cluster for cluster in clusters if not cluster.unclustered]
+    assert len(topics) == 2
+    assert sorted(cluster.count for cluster in topics) == [6, 6]
+    by_keyword = {('billing' if 'billing' in cluster.keywords else 'search'): cluster for cluster in topics}
+    assert 'invoice' in by_keyword['billing'].keywords and 'query' in by_keyword['search'].keywords
+    assert by_keyword['billing'].sources == {'file': 6}
+    assert by_keyword['search'].exemplar[2]['src_path'].startswith('/work/search/')
+    assert by_keyword['search'].start == (BASE + timedelta(minutes=60)).isoformat()
+
+    # 空文本不会被悄悄并入第一个主题，而是单独成组排在最后
+    unclustered = clusters[-1]
+    assert unclustered.unclustered
+    assert unclustered.count == 2 and unclustered.sources == {'screen': 2} and unclustered.keywords == []
+    assert unclustered.start == (BASE + timedelta(minutes=30)).isoformat()
+    assert unclustered.end == (BASE + timedelta(minutes=90)).isoformat()
+
+
+def test_deterministic_for_fixed_seed():
+    summary = [[(cluster.count, tuple(cluster.keywords), cluster.exemplar[1]) for cluster in cluster_activity(
+        two_topics(), max_clusters=2, seed=7)] for _ in range(2)]
+    assert summary[0] == summary[1]
+
+
+def test_only_empty_documents():
+    clusters = cluster_activity({'screen': [point(i, {'extracted_text_snippet': ''}) for i in range(3)]})
+    assert len(clusters) == 1 and clusters[0].unclustered and clusters[0].count == 3
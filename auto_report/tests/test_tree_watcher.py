@@ -0,0 +1,166 @@
+# src/tests/test_tree_watcher.py
+import os
+import time
+import threading
+
+import pytest
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from agents.file_agent import FileMonitorAgent
+from core.data_aggregator import DataAggregator
+from core.tree_watcher import TreeWatcher
+
+
+class Recorder(FileSystemEventHandler):
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def on_any_event(self, event):
+        if not event.is_directory:
+            with self._lock:
+                self.events.append((event.event_type, event.src_path))
+
+    def wait_for(self, event_type, path, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if (event_type, path) in self.events:
+                    return True
+            time.sleep(0.02)
+        return False
+
+
+def make_dirs(root, *paths):
+    for path in paths:
+        os.makedirs(os.path.join(root, path), exist_ok=True)
+
+
+def write(path, text='x'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+@pytest.fixture
+def observer():
+    observer = Observer()
+    observer.start()
+    yield observer
+    observer.stop()
+    observer.join()
+
+
+def planned(root, observer, tmp_path, **config):
+    recorder = Recorder()
+    config = dict({'snapshot_dir': str(tmp_path / 'snapshots'), 'min_split_budget': 1, 'poll_interval': 3600}, **config)
+    watcher = TreeWatcher(str(root), observer, recorder, config)
+    watcher._plan()
+    watcher._initial_poll()
+    return watcher, recorder
+
+
+def test_new_subdirectory_under_split_directory_watched(tmp_path, observer):
+    root = tmp_path / 'repo'
+    make_dirs(root, 'a', 'node_modules/p1', 'node_modules/p2', 'node_modules/p3')
+    write(str(root / 'top.py'))
+    watcher, recorder = planned(root, observer, tmp_path, max_watches=4)
+    assert watcher.polled == [(str(root), False)]  # node_modules 使整体超出额度，根目录被拆分
+    assert [path for path, _, _ in watcher.watches] == [str(root / 'a')]
+
+    write(str(root / 'c' / 'new.py'))
+    write(str(root / 'top.py'), 'changed')
+    watcher.poll()
+    assert ('created', str(root / 'c' / 'new.py')) in recorder.events
+    assert ('modified', str(root / 'top.py')) in recorder.events
+    assert str(root / 'c') in [path for path, _, _ in watcher.watches]
+
+    # 新目录已有原生监控，之后的变化无需等待轮询
+    write(str(root / 'c' / 'later.py'))
+    assert recorder.wait_for('created', str(root / 'c' / 'later.py'))
+
+
+def test_split_priority_path_planned_once(tmp_path, observer):
+    root = tmp_path / 'repo'
+    make_dirs(root, 'svc/a', 'svc/b', 'svc/c', 'web')
+    write(str(root / 'svc' / 'f.py'))
+    watcher, recorder = planned(root, observer, tmp_path, priority_paths=['svc'], max_watches=3)
+    assert watcher.polled.count((str(root / 'svc'), False)) == 1
+    assert len(watcher.polled) == len(set(watcher.polled))
+
+    write(str(root / 'svc' / 'f.py'), 'changed')
+    watcher.poll()
+    assert recorder.events.count(('modified', str(root / 'svc' / 'f.py'))) == 1
+
+
+def test_new_subdirectory_polled_without_budget(tmp_path, observer):
+    root = tmp_path / 'repo'
+    make_dirs(root, 'a', 'b')
+    watcher, recorder = planned(root, observer, tmp_path, max_watches=2)
+    assert watcher.health()['watched_dirs'] == 2
+
+    write(str(root / 'c' / 'deep' / 'new.py'))
+    watcher.poll()
+    assert ('created', str(root / 'c' / 'deep' / 'new.py')) in recorder.events
+    assert (str(root / 'c'), True) in watcher.polled
+
+    write(str(root / 'c' / 'deep' / 'new.py'), 'changed')
+    watcher.poll()
+    assert ('modified', str(root / 'c' / 'deep' / 'new.py')) in recorder.events
+
+
+def test_removed_directory_frees_budget_for_promotion(tmp_path, observer):
+    root = tmp_path / 'repo'
+    make_dirs(root, 'a', 'b')
+    watcher, recorder = planned(root, observer, tmp_path, max_watches=2)
+    write(str(root / 'c' / 'new.py'))
+    watcher.poll()
+    assert (str(root / 'c'), True) in watcher.polled
+
+    for name in os.listdir(root / 'b'):
+        os.remove(root / 'b' / name)
+    os.rmdir(root / 'b')
+    write(str(root / 'c' / 'new.py'), 'changed')
+    watcher.poll()
+    # b 的额度被释放，有变化的 c 升级为原生监控
+    assert ('modified', str(root / 'c' / 'new.py')) in recorder.events
+    assert sorted(path for path, _, _ in watcher.watches) == [str(root / 'a'), str(root / 'c')]
+    assert (str(root / 'c'), True) not in watcher.polled
+    write(str(root / 'c' / 'watched.py'))
+    assert recorder.wait_for('created', str(root / 'c' / 'watched.py'))
+
+
+def test_polled_changes_found_after_restart(tmp_path, observer):
+    root = tmp_path / 'repo'
+    make_dirs(root, 'a', 'b', 'c')
+    write(str(root / 'c' / 'old.py'))
+    watcher, _ = planned(root, observer, tmp_path, max_watches=2, max_watch_units=1)
+    assert any(recursive for _, recursive in watcher.polled)
+    watcher.stop()
+
+    polled_file = next(os.path.join(path, 'offline.py') for path, recursive in watcher.polled if recursive)
+    write(polled_file)
+    _, recorder = planned(root, observer, tmp_path, max_watches=2, max_watch_units=1)
+    assert ('created', polled_file) in recorder.events
+
+
+@pytest.mark.parametrize('max_watches, scalable', [(3, True), (100, False)])
+def test_recursive_mode_checks_budget_before_scheduling(tmp_path, monkeypatch, max_watches, scalable):
+    monkeypatch.chdir(tmp_path)
+    root = tmp_path / 'repo'
+    make_dirs(root, 'a/x', 'b', 'c')
+    agent = FileMonitorAgent({'watch_path': str(root), 'max_watches': max_watches,
+                              'snapshot_dir': str(tmp_path / 'snapshots')}, DataAggregator())
+    scheduled = []
+    monkeypatch.setattr(agent.observer, 'schedule',
+                        lambda handler, path, recursive: scheduled.append((path, recursive)) or object())
+    agent.start_monitoring()
+    try:
+        # 目录树超出额度时不对根目录注册递归监控 (注册失败会遗留已添加的监控)
+        assert (agent.tree_watcher is not None) == scalable
+        assert ((str(root), True) in scheduled) == (not scalable)
+        if scalable:
+            assert agent.tree_watcher.ready.wait(5)
+    finally:
+        agent.stop_monitoring()
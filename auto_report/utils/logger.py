@@ -1,33 +1,265 @@
 # src/utils/logger.py
-import logging
+"""
+日志配置。
+业务线程 (watchdog 监听线程、调度器线程池) 只把日志记录放入有界内存队列，
+由单独的 QueueListener 线程负责格式化并写入控制台和按大小轮转的日志文件，写日志不会阻塞业务线程；
+队列满时丢弃新记录并计数。热点路径的高频日志 (如文件事件) 按 "logger + 消息模板" 限流采样，
+被抑制的条数在窗口结束、日志刷新或停止时输出。
+"""
 import os
+import copy
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# 默认限流的热点路径 logger：文件事件、数据写入、文档扫描、接入与指标端点的请求日志
+DEFAULT_SAMPLED_LOGGERS = ('agents.file_agent', 'core.data_aggregator', 'agents.document_agent',
+                           'core.ingest', 'core.metrics')
+
+_listener = None
+_queue_handler = None
+_sampling_filter = None
+_reporter_stop = None
+
+
+class SamplingFilter(logging.Filter):
+    """
+    限流采样：loggers 中的 logger (含其子 logger) 的同一消息模板 (record.msg，使用 %-格式时与参数无关)
+    在每个 window 秒内最多放行 max_per_window 条，其余丢弃并计数。其他 logger 及 WARNING 及以上级别不采样。
+    """
+
+    def __init__(self, max_per_window=20, window=60.0, loggers=DEFAULT_SAMPLED_LOGGERS, max_keys=10000):
+        super().__init__()
+        self.max_per_window = max_per_window
+        self.window = window
+        self.loggers = tuple(loggers)
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._counters = {}  # {(logger, msg): [窗口开始时间, 已放行数, 已抑制数, 级别]}
+        self._sampled = {}  # {logger 名称: 是否采样}
+
+    def _is_sampled(self, name):
+        sampled = self._sampled.get(name)
+        if sampled is None:
+            sampled = self._sampled[name] = any(name == prefix or name.startswith(prefix + '.')
+                                                for prefix in self.loggers)
+        return sampled
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.max_per_window <= 0 or not self._is_sampled(record.name):
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                if len(self._counters) >= self.max_keys:
+                    # 大量不同的消息 (如未改为 %-格式的 f-string 日志)：清空计数，避免无限增长
+                    self._counters.clear()
+                counter = self._counters[key] = [now, 0, 0, record.levelno]
+            elif now - counter[0] >= self.window:
+                if counter[2]:
+                    record.suppressed = counter[2]
+                counter[:] = [now, 0, 0, record.levelno]
+            if counter[1] < self.max_per_window:
+                counter[1] += 1
+                return True
+            counter[2] += 1
+            return False
+
+    def pending(self, expired_only=True):
+        """
+        取出尚未报告的抑制计数 (默认只取窗口已结束的)，返回报告用的日志记录列表。
+        窗口已结束的计数同时被移除，没有新日志的消息模板不会一直占用内存。
+        """
+        now = time.monotonic()
+        records = []
+        with self._lock:
+            for key, counter in list(self._counters.items()):
+                expired = now - counter[0] >= self.window
+                if not expired and expired_only:
+                    continue
+                if counter[2]:
+                    name, msg = key
+                    record = logging.LogRecord(name, counter[3], '', 0, str(msg), None, None)
+                    record.suppressed = counter[2]
+                    records.append(record)
+                    counter[2] = 0
+                if expired:
+                    del self._counters[key]
+        return records
+
+
+class TextFormatter(logging.Formatter):
+    """文本格式，附带被采样抑制的条数"""
+
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        return f"{text} [{suppressed} similar messages suppressed]" if suppressed else text
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行 JSON，便于日志系统采集"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:  # 经过日志队列的记录只带有预先格式化的异常文本
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    队列满时丢弃记录而不是阻塞或报错。
+    消息参数在调用线程中代入 (参数可能是之后会被修改的 dict 等可变对象)，其余格式化留给监听线程完成；
+    未开启的级别在 prepare 之前就被过滤，这些日志的参数仍不会被格式化。
+    """
+
+    _exception_formatter = logging.Formatter()
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 与默认实现一样复制记录并代入参数，但不套用格式 (时间、级别等由监听线程中的格式化器添加)
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = record.exc_text or self._exception_formatter.formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _DropReporter(logging.Filter):
+    """在监听线程输出的下一条记录上报告因队列已满而丢弃的条数"""
+
+    def __init__(self, queue_handler):
+        super().__init__()
+        self.queue_handler = queue_handler
+        self.reported = 0
+
+    def filter(self, record):
+        dropped = self.queue_handler.dropped
+        if dropped > self.reported:
+            record.msg = f"{record.msg} [log queue full, {dropped - self.reported} records dropped]"
+            self.reported = dropped
+        return True
+
+
+def flush_suppressed(expired_only=False):
+    """输出尚未报告的限流抑制计数 (绕过采样，直接放入日志队列)"""
+    if _sampling_filter is None or _queue_handler is None:
+        return
+    for record in _sampling_filter.pending(expired_only):
+        _queue_handler.enqueue(record)
+
+
+def _report_suppressed(stop_event, interval):
+    # 一轮高频日志之后不再有同类日志时，由这里在窗口结束后报告被抑制的条数
+    while not stop_event.wait(interval):
+        flush_suppressed(expired_only=True)
+
+
+def _stop():
+    """停止限流报告线程，输出剩余的抑制计数，再停止监听线程 (写出队列中剩余的日志)"""
+    global _listener
+    if _reporter_stop is not None:
+        _reporter_stop.set()
+    flush_suppressed()
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
 
 def setup_logger(config):
-    """设置日志"""
+    """
+    设置日志。config 为 core.logging：
+      level, file: 日志级别与文件路径
+      max_bytes, backup_count: 日志文件按大小轮转 (默认 10MB × 5 个备份)
+      format: text | json
+      queue_size: 日志队列容量，满时丢弃新记录
+      sampling: {max_per_window, window, loggers} 热点路径高频日志限流，max_per_window 为 0 时关闭
+    """
+    global _listener, _queue_handler, _sampling_filter, _reporter_stop
     log_level = getattr(logging, config.get('level', 'INFO').upper(), logging.INFO)
     log_file = config.get('file')
 
     # 创建日志记录器
     logger = logging.getLogger()
     logger.setLevel(log_level)
+    if _queue_handler is not None:
+        # 重复配置 (如 backfill 调用)：先停止之前的监听线程
+        _stop()
+        logger.removeHandler(_queue_handler)
 
     # 创建格式化器
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    if config.get('format', 'text') == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = TextFormatter(TEXT_FORMAT)
 
     # 添加控制台处理器
     console_handler = logging.StreamHandler()
     console_handler.setLevel(log_level)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers = [console_handler]
 
-    # 如果配置了文件路径，则添加文件处理器
+    # 如果配置了文件路径，则添加按大小轮转的文件处理器
     if log_file:
-        os.makedirs(os.path.dirname(log_file), exist_ok=True)
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        file_handler = RotatingFileHandler(log_file, maxBytes=config.get('max_bytes', 10 * 1024 * 1024),
+                                           backupCount=config.get('backup_count', 5), encoding='utf-8')
         file_handler.setLevel(log_level)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    _queue_handler = _NonBlockingQueueHandler(queue.Queue(config.get('queue_size', 10000)))
+    sampling = config.get('sampling', {})
+    _sampling_filter = SamplingFilter(sampling.get('max_per_window', 20), sampling.get('window', 60),
+                                      sampling.get('loggers', DEFAULT_SAMPLED_LOGGERS))
+    _queue_handler.addFilter(_sampling_filter)
+    drop_reporter = _DropReporter(_queue_handler)
+    for handler in handlers:
+        handler.addFilter(drop_reporter)
+    logger.addHandler(_queue_handler)
+
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _reporter_stop = threading.Event()
+    if _sampling_filter.max_per_window > 0:
+        threading.Thread(target=_report_suppressed, args=(_reporter_stop, max(_sampling_filter.window, 1)),
+                         name='log-sampling', daemon=True).start()
+    logging.info("Logger configured.")
+    return _listener
+
 
-    logging.info("Logger configured.")
\ No newline at end of file
+@atexit.register
+def _stop_listener():
+    # 进程退出前输出剩余的抑制计数和队列中剩余的日志
+    _stop()